@@ -7,6 +7,7 @@ const Lessons = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const [selectedLesson, setSelectedLesson] = useState(null);
+  const [detailLoading, setDetailLoading] = useState(false);
 
   useEffect(() => {
     const fetchLessons = async () => {
@@ -35,6 +36,20 @@ const Lessons = () => {
     fetchLessons();
   }, []);
 
+  // The list is compact (no content); load the full lesson when it is opened.
+  const openLesson = async (lesson) => {
+    setSelectedLesson(lesson);
+    setDetailLoading(true);
+    try {
+      const res = await axiosInstance.get(`lessons/${lesson.id}/`);
+      setSelectedLesson((current) => (current && current.id === lesson.id ? res.data : current));
+    } catch (err) {
+      console.error("Error fetching lesson:", err);
+    } finally {
+      setDetailLoading(false);
+    }
+  };
+
   if (loading) return <p className="loading">⏳ Loading lessons...</p>;
   if (error) return <p className="error">{error}</p>;
   if (lessons.length === 0) return <p className="no-data">No lessons found.</p>;
@@ -48,7 +63,7 @@ const Lessons = () => {
             <h3>{lesson.title || lesson.topic || "Untitled Lesson"}</h3>
             <p>{lesson.objective || lesson.description || "No objective provided."}</p>
             <button
-              onClick={() => setSelectedLesson(lesson)}
+              onClick={() => openLesson(lesson)}
               className="bg-blue-500 text-white px-3 py-1 rounded hover:bg-blue-600 mt-2"
             >
               View Details
@@ -81,9 +96,13 @@ const Lessons = () => {
             </p>
             <div>
               <strong>Content:</strong>
-              <pre className="bg-gray-100 p-2 rounded overflow-x-auto">
-                {JSON.stringify(selectedLesson.content, null, 2)}
-              </pre>
+              {detailLoading ? (
+                <p>⏳ Loading content...</p>
+              ) : (
+                <pre className="bg-gray-100 p-2 rounded overflow-x-auto">
+                  {JSON.stringify(selectedLesson.content, null, 2)}
+                </pre>
+              )}
             </div>
           </div>
         </div>
@@ -44,6 +44,17 @@ function TeacherLessons() {
     }
   };
 
+  // Edit: the list is compact, so load the full lesson (with content) for the form
+  const handleEdit = async (lesson) => {
+    try {
+      const response = await axiosInstance.get(`lessons/${lesson.id}/`);
+      setEditLesson(response.data);
+      setShowForm(true);
+    } catch (err) {
+      setError("Failed to load lesson");
+    }
+  };
+
   // Delete
   const handleDelete = async (id) => {
     if (!window.confirm("Are you sure you want to delete this lesson?")) return;
@@ -92,7 +103,7 @@ function TeacherLessons() {
                 <td className="p-2 border">{lesson.date}</td>
                 <td className="p-2 border space-x-2">
                   <button
-                    onClick={() => { setEditLesson(lesson); setShowForm(true); }}
+                    onClick={() => handleEdit(lesson)}
                     className="bg-blue-500 text-white px-3 py-1 rounded hover:bg-blue-600"
                   >
                     Edit
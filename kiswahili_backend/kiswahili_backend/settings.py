@@ -18,12 +18,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "lessons.metrics.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "lessons.replicas.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -41,13 +43,40 @@ TEMPLATES = [{
 }]
 WSGI_APPLICATION = "kiswahili_backend.wsgi.application"
 
-# Dev DB (SQLite). For Postgres, set DATABASE_URL or env vars and swap.
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# Databases come from DB_* variables (SQLite file by default). Setting
+# REPLICA_DB_NAME adds a read replica used for reports, dashboards and list
+# GETs (see lessons/replicas.py). To try it locally with two SQLite files,
+# migrate, copy db.sqlite3 to replica.sqlite3 and set REPLICA_DB_NAME to it.
+def _database(prefix, **defaults):
+    config = {
+        "ENGINE": os.getenv(f"{prefix}ENGINE", defaults.get("ENGINE", "django.db.backends.sqlite3")),
+        "NAME": os.getenv(f"{prefix}NAME", defaults.get("NAME")),
+    }
+    for key in ("USER", "PASSWORD", "HOST", "PORT"):
+        if os.getenv(f"{prefix}{key}"):
+            config[key] = os.getenv(f"{prefix}{key}")
+    return config
+
+
+DATABASES = {"default": _database("DB_", NAME=BASE_DIR / "db.sqlite3")}
+if os.getenv("REPLICA_DB_NAME"):
+    DATABASES["replica"] = {
+        **_database("REPLICA_DB_", ENGINE=DATABASES["default"]["ENGINE"]),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["lessons.replicas.ReplicaRouter"]
+# Reads stay on the primary this long after a client's own write.
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", "5"))
+
+# In-process cache by default. Set REDIS_URL when running several workers so
+# cached data (answer keys etc.) is shared and invalidated everywhere.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
     }
-}
 
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -68,7 +97,7 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "lessons.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
@@ -78,4 +107,24 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=2),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    # Role, school and profile id travel in the token (see lessons/authentication.py).
+    "TOKEN_OBTAIN_SERIALIZER": "lessons.authentication.RoleTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "lessons.authentication.RoleTokenRefreshSerializer",
 }
+
+# Reject tokens issued before a user's account or profile last changed.
+# Costs one cache read per request; needs a shared cache (REDIS_URL) across processes.
+JWT_REVOCATION_CHECK = os.getenv("JWT_REVOCATION_CHECK", "0") == "1"
+
+# Progress heartbeats are buffered per process and written in batches.
+PROGRESS_HEARTBEAT_FLUSH_SECONDS = int(os.getenv("PROGRESS_HEARTBEAT_FLUSH_SECONDS", "5"))
+PROGRESS_HEARTBEAT_MAX_PENDING = int(os.getenv("PROGRESS_HEARTBEAT_MAX_PENDING", "500"))
+
+# Per-route metrics at /api/metrics (Prometheus text); scrapers send the token
+# as a bearer token. Requests slower than the threshold are logged with their SQL.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_SLOW_REQUEST_MS = int(os.getenv("METRICS_SLOW_REQUEST_MS", "1000"))
+
+# Oral/upload answers are uploaded in chunks and post-processed in a small pool.
+SUBMISSION_MEDIA_MAX_BYTES = int(os.getenv("SUBMISSION_MEDIA_MAX_BYTES", str(50 * 1024 * 1024)))
+SUBMISSION_MEDIA_WORKERS = int(os.getenv("SUBMISSION_MEDIA_WORKERS", "2"))
@@ -5,6 +5,7 @@ from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from lessons.metrics import metrics_view
 from lessons.views import (
     StrandViewSet,
     SubStrandViewSet,
@@ -12,6 +13,7 @@ from lessons.views import (
     QuestionViewSet,
     AssignmentViewSet,
     SubmissionViewSet,
+    SubmissionMediaViewSet,
     ProgressViewSet,
     MeViewSet,
     dashboard_data,
@@ -22,6 +24,9 @@ from lessons.views import (
     AttendanceViewSet,
     LessonPlanViewSet,
     StudentViewSet,
+    ChangeFeedViewSet,
+    GradebookViewSet,
+    SearchViewSet,
 )
 
 router = DefaultRouter()
@@ -35,6 +40,7 @@ router.register(r"lessons", LessonViewSet, basename="lesson")
 router.register(r"questions", QuestionViewSet, basename="question")
 router.register(r"assignments", AssignmentViewSet, basename="assignment")
 router.register(r"submissions", SubmissionViewSet, basename="submission")
+router.register(r"submission-media", SubmissionMediaViewSet, basename="submissionmedia")
 router.register(r"progress", ProgressViewSet, basename="progress")
 router.register(r"tests", TestViewSet, basename="test")
 router.register(r"results", ResultViewSet, basename="result")
@@ -42,6 +48,9 @@ router.register(r"attendance", AttendanceViewSet, basename="attendance")
 router.register(r"lesson-plans", LessonPlanViewSet, basename="lessonplan")
 router.register(r"students", StudentViewSet, basename="student")
 router.register(r"me", MeViewSet, basename="me")
+router.register(r"changes", ChangeFeedViewSet, basename="changes")
+router.register(r"gradebook", GradebookViewSet, basename="gradebook")
+router.register(r"search", SearchViewSet, basename="search")
 
 # -------------------------
 # URL Patterns
@@ -59,6 +68,9 @@ urlpatterns = [
     # Dashboard
     path("api/dashboard-data/", dashboard_data, name="dashboard-data"),
     path("api/teacher/dashboard-stats/", teacher_dashboard_stats, name="teacher-dashboard-stats"),
+
+    # Monitoring
+    path("api/metrics", metrics_view, name="metrics"),
 ]
 
 # Serve media files (development only)
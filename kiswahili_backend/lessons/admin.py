@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Profile, Strand, LessonPlan, SubStrand, Lesson, Question, Assignment, Submission, Progress, Test, Result, Attendance, Student
+from .models import Profile, Strand, LessonPlan, SubStrand, Lesson, Question, Assignment, Submission, Progress, Test, Result, Attendance, Student, DashboardCounter, Tombstone, AttendanceRollup, SubmissionMedia, SearchEntry, RegradeJob
 
 admin.site.register(Profile)
 admin.site.register(Strand)
@@ -14,3 +14,9 @@ admin.site.register(Result)
 admin.site.register(Attendance)
 admin.site.register(Student)
 admin.site.register(LessonPlan)
+admin.site.register(DashboardCounter)
+admin.site.register(Tombstone)
+admin.site.register(AttendanceRollup)
+admin.site.register(SubmissionMedia)
+admin.site.register(SearchEntry)
+admin.site.register(RegradeJob)
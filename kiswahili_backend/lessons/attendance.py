@@ -0,0 +1,200 @@
+"""
+Attendance analytics backed by monthly rollups.
+
+``AttendanceRollup`` holds one row per student per month with status counts
+and the absence runs needed to stitch streaks across months: the run at the
+start of the month, the run at the end, and the longest run inside it. When
+an attendance row is written, only that student-month is recomputed, which
+is at most ~23 rows read through the (student, date) unique index.
+
+A query over an arbitrary window combines whole months from the rollups
+with raw rows for the partial months at either end.
+"""
+import datetime
+from collections import defaultdict
+from itertools import groupby
+
+from django.db.models import Q
+
+from .models import Attendance, AttendanceRollup, Student
+
+CHRONIC_THRESHOLD = 0.9  # attending fewer than 90% of recorded days
+STAT_FIELDS = ("days", "present", "absent", "late", "lead_absent", "trail_absent", "longest_absent")
+
+
+class Stats:
+    """Attendance over a run of consecutive recorded days; combine with ``+`` in date order."""
+    __slots__ = STAT_FIELDS
+
+    def __init__(self, days=0, present=0, absent=0, late=0, lead_absent=0, trail_absent=0, longest_absent=0):
+        self.days, self.present, self.absent, self.late = days, present, absent, late
+        self.lead_absent, self.trail_absent, self.longest_absent = lead_absent, trail_absent, longest_absent
+
+    @classmethod
+    def from_statuses(cls, statuses):
+        stats = cls()
+        for status in statuses:
+            absent = status == "absent"
+            stats = stats + cls(
+                days=1, present=int(status == "present"), absent=int(absent), late=int(status == "late"),
+                lead_absent=int(absent), trail_absent=int(absent), longest_absent=int(absent),
+            )
+        return stats
+
+    def __add__(self, later):
+        return Stats(
+            days=self.days + later.days,
+            present=self.present + later.present,
+            absent=self.absent + later.absent,
+            late=self.late + later.late,
+            lead_absent=self.lead_absent + later.lead_absent if self.lead_absent == self.days else self.lead_absent,
+            trail_absent=later.trail_absent + self.trail_absent if later.trail_absent == later.days else later.trail_absent,
+            longest_absent=max(self.longest_absent, later.longest_absent, self.trail_absent + later.lead_absent),
+        )
+
+    @property
+    def attendance_rate(self):
+        return round((self.present + self.late) / self.days, 3) if self.days else None
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in STAT_FIELDS}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def refresh_rollups(pairs):
+    """Recompute the rollups for the given ``(student_id, month)`` pairs from their attendance rows."""
+    pairs = {(student_id, month_start(month)) for student_id, month in pairs}
+    if not pairs:
+        return
+    statuses = defaultdict(list)
+    rows = (
+        Attendance.objects.filter(
+            student_id__in={student_id for student_id, _ in pairs},
+            date__gte=min(month for _, month in pairs),
+            date__lt=_next_month(max(month for _, month in pairs)),
+        )
+        .order_by("student_id", "date")
+        .values_list("student_id", "date", "status")
+    )
+    for student_id, day, status in rows:
+        key = (student_id, month_start(day))
+        if key in pairs:
+            statuses[key].append(status)
+
+    AttendanceRollup.objects.bulk_create(
+        [
+            AttendanceRollup(student_id=student_id, month=month, **Stats.from_statuses(statuses[(student_id, month)]).as_dict())
+            for student_id, month in pairs
+        ],
+        update_conflicts=True,
+        unique_fields=["student", "month"],
+        update_fields=list(STAT_FIELDS),
+    )
+
+
+def rebuild_rollups(batch_size=2000):
+    """Recompute every rollup from the attendance table, streaming it in (student, date) order."""
+    AttendanceRollup.objects.all().delete()
+    rows = Attendance.objects.order_by("student_id", "date").values_list("student_id", "date", "status").iterator()
+    batch, written = [], 0
+    for (student_id, month), marks in groupby(rows, key=lambda r: (r[0], month_start(r[1]))):
+        stats = Stats.from_statuses(status for _, _, status in marks)
+        batch.append(AttendanceRollup(student_id=student_id, month=month, **stats.as_dict()))
+        if len(batch) >= batch_size:
+            written += len(AttendanceRollup.objects.bulk_create(batch))
+            batch = []
+    written += len(AttendanceRollup.objects.bulk_create(batch))
+    return written
+
+
+def _window_stats(start, end, class_name=None):
+    """Return {student_id: Stats} for the window, from rollups plus raw edge rows."""
+    scope = Q(student__enrolled_class=class_name) if class_name else Q()
+    first_full = start if start.day == 1 else _next_month(start)
+    after_full = month_start(end + datetime.timedelta(days=1))  # first day not covered by full months
+    pieces = defaultdict(list)  # student_id -> [(sort key, Stats)]
+
+    if first_full < after_full:
+        rollups = (
+            AttendanceRollup.objects.filter(scope, month__gte=first_full, month__lt=after_full)
+            .values_list("month", "student_id", *STAT_FIELDS)
+        )
+        for month, student_id, *values in rollups:
+            pieces[student_id].append((month, Stats(*values)))
+        edges = Q(date__gte=start, date__lt=first_full) | Q(date__gte=after_full, date__lte=end)
+    else:
+        edges = Q(date__gte=start, date__lte=end)
+
+    raw = defaultdict(list)
+    edge_rows = (
+        Attendance.objects.filter(edges, scope)
+        .order_by("student_id", "date").values_list("student_id", "date", "status")
+    )
+    for student_id, day, status in edge_rows:
+        segment = day if day < first_full else after_full
+        raw[(student_id, segment)].append(status)
+    for (student_id, segment), statuses in raw.items():
+        pieces[student_id].append((segment, Stats.from_statuses(statuses)))
+
+    totals = {}
+    for student_id, parts in pieces.items():
+        stats = Stats()
+        for _, part in sorted(parts, key=lambda p: p[0]):
+            stats = stats + part
+        totals[student_id] = stats
+    return totals
+
+
+def attendance_analytics(start, end, class_name=None, threshold=CHRONIC_THRESHOLD):
+    """
+    Attendance rates, late counts and absence streaks per student and per class.
+
+    Students below ``threshold`` are listed as chronic absentees, lowest rate
+    first. The per-student table is only included for a single class.
+    """
+    students = Student.objects.order_by("enrolled_class", "full_name", "id")
+    if class_name:
+        students = students.filter(enrolled_class=class_name)
+    students = list(students.values_list("id", "full_name", "enrolled_class"))
+    by_student = _window_stats(start, end, class_name)
+
+    classes, student_rows, chronic = {}, [], []
+    for student_id, name, enrolled_class in students:
+        stats = by_student.get(student_id, Stats())
+        rate = stats.attendance_rate
+        row = {
+            "student_id": student_id, "student": name, "class_name": enrolled_class,
+            "days": stats.days, "present": stats.present, "absent": stats.absent, "late": stats.late,
+            "attendance_rate": rate, "longest_absence_streak": stats.longest_absent,
+        }
+        student_rows.append(row)
+        summary = classes.setdefault(enrolled_class, {
+            "class_name": enrolled_class, "students": 0, "days": 0, "present": 0, "absent": 0, "late": 0,
+            "chronic_absentees": 0,
+        })
+        summary["students"] += 1
+        for field in ("days", "present", "absent", "late"):
+            summary[field] += row[field]
+        if rate is not None and rate < threshold:
+            summary["chronic_absentees"] += 1
+            chronic.append(row)
+
+    for summary in classes.values():
+        days = summary["days"]
+        summary["attendance_rate"] = round((summary["present"] + summary["late"]) / days, 3) if days else None
+
+    result = {
+        "start": start, "end": end, "class_name": class_name, "threshold": threshold,
+        "classes": list(classes.values()),
+        "chronic_absentees": sorted(chronic, key=lambda r: r["attendance_rate"]),
+    }
+    if class_name:
+        result["students"] = student_rows
+    return result
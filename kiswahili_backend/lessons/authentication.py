@@ -0,0 +1,99 @@
+"""
+JWT authentication that trusts the token's claims.
+
+Tokens issued at login carry the user's ``username``, ``role``, ``school``
+and ``profile_id``. ``ClaimsJWTAuthentication`` builds an unsaved ``User``
+with its ``Profile`` attached from those claims, so authenticating a request
+and checking ``IsTeacher``/``IsStudent`` costs no query. Tokens issued
+before the claims existed fall back to loading the user from the database.
+
+Claims are re-read from the database whenever an access token is refreshed.
+Changes that must take effect before the access token expires (a
+deactivated account, a role or school change) are enforced through
+revocation: such a save records a new revocation stamp for the user in the
+cache, every token carries the stamp current when it was issued (``rev``),
+and with ``JWT_REVOCATION_CHECK`` on, tokens with an older stamp are
+rejected. Stamps are compared for equality rather than against ``iat``,
+whose one-second resolution would also reject tokens issued right after the
+change.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Profile
+
+CLAIMS = ("username", "role", "school", "profile_id")
+REVOKED_TIMEOUT = 60 * 60 * 24 * 8  # longer than a refresh token lives
+
+
+def _revocation_key(user_id):
+    return f"jwt-revocation:{user_id}"
+
+
+def revoke_tokens(user_id):
+    """Reject every token issued to the user before now (when the check is enabled)."""
+    cache.set(_revocation_key(user_id), time.time_ns(), REVOKED_TIMEOUT)
+
+
+def is_revoked(token):
+    stamp = cache.get(_revocation_key(token.get(api_settings.USER_ID_CLAIM)))
+    return stamp is not None and token.get("rev") != stamp
+
+
+def add_claims(token, user):
+    token["rev"] = cache.get(_revocation_key(user.pk))
+    profile = Profile.objects.filter(user=user).only("id", "role", "school").first()
+    token["username"] = user.get_username()
+    token["role"] = profile.role if profile else None
+    token["school"] = profile.school if profile else ""
+    token["profile_id"] = profile.pk if profile else None
+    return token
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh that re-stamps the claims, so a role change reaches the next access token."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if getattr(settings, "JWT_REVOCATION_CHECK", False) and is_revoked(refresh):
+            raise InvalidToken(_("Token has been revoked"))
+        user = User.objects.filter(pk=refresh[api_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        access = add_claims(refresh.access_token, user)
+        return {"access": str(access)}
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if getattr(settings, "JWT_REVOCATION_CHECK", False) and is_revoked(token):
+            raise InvalidToken(_("Token has been revoked"))
+        return token
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIMS):
+            return super().get_user(validated_token)  # issued before claims existed
+        # The claim is a string in simplejwt 5.5; compare-by-id code needs the real pk type.
+        pk = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        user = User(pk=pk, username=validated_token["username"])
+        user._state.adding = False
+        if validated_token["profile_id"] is not None:
+            user.profile = Profile(
+                pk=validated_token["profile_id"], role=validated_token["role"], school=validated_token["school"],
+            )
+        return user
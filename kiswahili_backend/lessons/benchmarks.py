@@ -0,0 +1,227 @@
+"""
+Endpoint benchmarks through the Django test client.
+
+Every GET route on the API router (list, detail and extra actions) and the
+dashboard views is requested as a teacher, with query parameters filled in
+from the data (a class name, a date window). Detail routes use the first id
+their list returns; routes with nothing to show are skipped. Each endpoint
+is requested ``warmup`` times, then ``repeat`` times while recording the
+latency (including a streamed body), the SQL query count and the response
+size.
+
+Results are saved as JSON baselines; ``compare`` reports endpoints whose
+query count went up, whose status changed, or whose median latency grew by
+more than the tolerance (p95 is too noisy over a few dozen requests).
+Query counts do not depend on the machine, so they are the reliable signal
+in review; latencies are only comparable between runs on the same machine
+and dataset (see ``lessons/seeding.py``).
+
+The committed baseline (``benchmarks/baseline.json``) was made on a fresh
+SQLite database with::
+
+    python manage.py seed_school_data --until 2026-10-16
+    python manage.py benchmark_endpoints --output benchmarks/baseline.json
+
+and is checked with ``--compare benchmarks/baseline.json``.
+"""
+import datetime
+import json
+import platform
+import time
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+
+from .authentication import RoleTokenObtainPairSerializer
+from .metrics import QueryRecorder, record_queries
+from .models import (
+    Attendance, Lesson, Profile, Progress, Question, Result, Role, Student, Submission,
+)
+
+BASELINE_FORMAT = 1
+DEFAULT_REPEAT = 20
+DEFAULT_WARMUP = 2
+DEFAULT_TOLERANCE = 0.5
+LATENCY_FLOOR_MS = 5  # smaller changes are noise
+REPORT_WINDOW_DAYS = 90
+DASHBOARD_ROUTES = ("dashboard-data", "teacher-dashboard-stats")
+# Routes that write files as a side effect (the pack is built on first request).
+SKIPPED_ROUTES = ("lesson-pack",)
+DATASET_MODELS = (Student, Lesson, Question, Result, Attendance, Submission, Progress)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))]
+
+
+def route_params(class_name, end):
+    """Query parameters per URL name for routes that need them."""
+    window = {"class_name": class_name, "start": end - datetime.timedelta(days=REPORT_WINDOW_DAYS), "end": end}
+    return {
+        "attendance-register": window,
+        "attendance-analytics": window,
+        "gradebook-list": window,
+        "gradebook-export": window,
+        "search-list": {"q": "wanyama"},
+    }
+
+
+def _first_id(response):
+    if response.status_code != 200 or getattr(response, "streaming", False):
+        return None
+    try:
+        data = response.json()
+    except ValueError:
+        return None
+    if isinstance(data, dict):
+        data = data.get("results")
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        return data[0].get("id")
+    return None
+
+
+def endpoints(client, params):
+    """Yield ``(url name, path, query)`` for every GET route, in router order."""
+    from kiswahili_backend.urls import router
+
+    for name in DASHBOARD_ROUTES:
+        yield name, reverse(name), params.get(name, {})
+    for prefix, viewset, basename in router.registry:
+        pk = None
+        if hasattr(viewset, "list"):
+            name = f"{basename}-list"
+            yield name, reverse(name), params.get(name, {})
+            pk = _first_id(client.get(reverse(name), params.get(name, {})))
+        if pk is not None and hasattr(viewset, "retrieve"):
+            name = f"{basename}-detail"
+            yield name, reverse(name, kwargs={"pk": pk}), params.get(name, {})
+        for extra in viewset.get_extra_actions():
+            if "get" not in extra.mapping or (extra.detail and pk is None):
+                continue
+            name = f"{basename}-{extra.url_name}"
+            try:
+                path = reverse(name, kwargs={"pk": pk} if extra.detail else {})
+            except NoReverseMatch:
+                continue
+            yield name, path, params.get(name, {})
+
+
+def measure(client, path, query, cold_cache=False):
+    """Request ``path`` once; return ``(status, milliseconds, queries, bytes)``."""
+    if cold_cache:
+        cache.clear()
+    recorder = QueryRecorder()
+    start = time.perf_counter()
+    with record_queries(recorder):
+        response = client.get(path, query)
+        size = sum(len(chunk) for chunk in response.streaming_content) if response.streaming else len(response.content)
+    return response.status_code, (time.perf_counter() - start) * 1000, recorder.count, size
+
+
+def default_user():
+    profile = Profile.objects.filter(role=Role.TEACHER).select_related("user").order_by("id").first()
+    if profile is None:
+        raise ValueError("No teacher account to benchmark with; seed the database first.")
+    return profile.user
+
+
+def api_client(user):
+    token = RoleTokenObtainPairSerializer.get_token(user).access_token
+    return Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+def request_plan(client):
+    """The ``(url name, path, query)`` of every benchmarked request."""
+    class_name = Student.objects.order_by("id").values_list("enrolled_class", flat=True).first() or ""
+    # Report windows end at the last recorded day, so a seeded dataset gives the same requests on any day.
+    end = Attendance.objects.aggregate(last=Max("date"))["last"] or timezone.localdate()
+    return [plan for plan in endpoints(client, route_params(class_name, end)) if plan[0] not in SKIPPED_ROUTES]
+
+
+def run_benchmarks(user=None, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP, cold_cache=False, only=None, progress=None):
+    """Benchmark every endpoint as ``user`` (default: the first teacher) and return a baseline dict."""
+    user = user or default_user()
+    results = {}
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+        client = api_client(user)
+        for name, path, query in request_plan(client):
+            if only and name not in only:
+                continue
+            for _ in range(warmup):
+                measure(client, path, query, cold_cache)
+            runs = [measure(client, path, query, cold_cache) for _ in range(max(repeat, 1))]
+            latencies = [ms for _, ms, _, _ in runs]
+            results[name] = {
+                "path": path,
+                "query": {key: str(value) for key, value in query.items()},
+                "status": runs[-1][0],
+                "p50_ms": round(_percentile(latencies, 0.5), 2),
+                "p95_ms": round(_percentile(latencies, 0.95), 2),
+                "queries": max(queries for _, _, queries, _ in runs),
+                "bytes": runs[-1][3],
+            }
+            if progress:
+                progress(name, results[name])
+
+    return {
+        "format": BASELINE_FORMAT,
+        "meta": {
+            "created": timezone.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "repeat": repeat,
+            "warmup": warmup,
+            "cold_cache": cold_cache,
+            "user": user.username,
+            "rows": {model.__name__: model.objects.count() for model in DATASET_MODELS},
+        },
+        "endpoints": results,
+    }
+
+
+def same_dataset(baseline, current):
+    return baseline.get("meta", {}).get("rows") == current["meta"]["rows"]
+
+
+def compare(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return human-readable regressions of ``current`` against ``baseline``.
+
+    Latencies are only compared when both runs used the same dataset.
+    """
+    problems = []
+    check_latency = same_dataset(baseline, current)
+    for name, before in sorted(baseline.get("endpoints", {}).items()):
+        after = current["endpoints"].get(name)
+        if after is None:
+            problems.append(f"{name}: missing from this run")
+            continue
+        if after["status"] != before["status"]:
+            problems.append(f"{name}: status {before['status']} -> {after['status']}")
+        if after["queries"] > before["queries"]:
+            problems.append(f"{name}: queries {before['queries']} -> {after['queries']}")
+        if not check_latency:
+            continue
+        limit = max(before["p50_ms"] * (1 + tolerance), before["p50_ms"] + LATENCY_FLOOR_MS)
+        if after["p50_ms"] > limit:
+            problems.append(f"{name}: p50 {before['p50_ms']} ms -> {after['p50_ms']} ms")
+    return problems
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
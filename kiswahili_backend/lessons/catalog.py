@@ -0,0 +1,87 @@
+"""
+Response cache for the curriculum catalog (strands, sub-strands, grade lesson lists).
+
+Each resource has a generation token in the cache, and cached responses are
+keyed by the resource's current token plus the request's scheme, host, path
+and sorted query string (grade, page, expand, ...); the host matters because
+paginated responses embed absolute links. Saving or deleting a row replaces,
+once its transaction commits, the tokens of the resources whose responses
+embed it, so stale entries are never read again and simply expire. A
+missing token (evicted, or a fresh cache) is replaced by a new random one,
+which can never revive old entries.
+
+Works with the in-process cache; with several workers, set REDIS_URL so
+invalidation reaches every process.
+"""
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from .conditional import etag_matches, make_etag, not_modified
+
+CATALOG_TIMEOUT = 60 * 60 * 24
+STRANDS, SUB_STRANDS, LESSONS = "strands", "sub-strands", "lessons"
+
+# Resources whose responses include data from each model (sub-strands and
+# lessons show their strand's name, lessons their sub-strand's).
+DEPENDENT_RESOURCES = {
+    "Strand": (STRANDS, SUB_STRANDS, LESSONS),
+    "SubStrand": (SUB_STRANDS, LESSONS),
+    "Lesson": (LESSONS,),
+    "Question": (LESSONS,),
+}
+
+
+def _generation_key(resource):
+    return f"catalog-gen:{resource}"
+
+
+def generation(resource):
+    """The current token of ``resource``; changes whenever its cached responses are dropped."""
+    key = _generation_key(resource)
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        token = cache.get(key)
+    return token
+
+
+def invalidate(model_name):
+    """Drop every cached response that includes rows of ``model_name`` once the current transaction commits."""
+    resources = DEPENDENT_RESOURCES.get(model_name, ())
+    # Replacing the tokens before commit would let a request re-cache the old rows under the new token.
+    transaction.on_commit(lambda: cache.set_many({_generation_key(r): uuid.uuid4().hex for r in resources}, None))
+
+
+def _response_key(resource, request):
+    query = sorted(request.query_params.lists())
+    # Paginated responses carry absolute next/previous links, so the host is part of the key.
+    digest = hashlib.sha1(repr((request.build_absolute_uri(request.path), query)).encode()).hexdigest()
+    return f"catalog:{resource}:{generation(resource)}:{digest}"
+
+
+def cached_response(request, resource, build):
+    """Serve ``build()``'s response from the cache, storing successful ones."""
+    key = _response_key(resource, request)
+    entry = cache.get(key)
+    if entry is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+        entry = (response.data, response.get("ETag") or make_etag(key))
+        cache.set(key, entry, CATALOG_TIMEOUT)
+    data, etag = entry
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(data, headers={"ETag": etag})
+
+
+class CachedCatalogMixin:
+    """Cache a viewset's list responses under ``catalog_resource``."""
+    catalog_resource = None
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(request, self.catalog_resource, lambda: super(CachedCatalogMixin, self).list(request, *args, **kwargs))
@@ -0,0 +1,65 @@
+"""
+Incremental change feed for content resources.
+
+Clients keep the ``watermark`` of their last sync and pass it back as
+``since``. Rows whose ``updated_at`` is at or after it are returned in full,
+and deleted rows come back as ids from ``Tombstone``. The watermark handed out
+trails the server clock by ``CHANGE_FEED_OVERLAP``, so rows committed during
+the request are not missed. They may be sent twice, which is harmless
+because applying the feed is idempotent.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Assignment, Lesson, Question, Strand, SubStrand, Test, Tombstone
+from .serializers import (
+    AssignmentSerializer, LessonFeedSerializer, QuestionSerializer, StrandSerializer,
+    SubStrandSerializer, TestSerializer,
+)
+
+CHANGE_FEED_OVERLAP = timedelta(seconds=getattr(settings, "CHANGE_FEED_OVERLAP_SECONDS", 2))
+TOMBSTONE_RETENTION = timedelta(days=getattr(settings, "CHANGE_FEED_TOMBSTONE_DAYS", 90))
+
+# Parents before children, so clients can apply the feed in order.
+FEED = (
+    ("strands", Strand.objects.all(), StrandSerializer),
+    ("sub-strands", SubStrand.objects.select_related("strand"), SubStrandSerializer),
+    ("lessons", Lesson.objects.select_related("strand", "sub_strand"), LessonFeedSerializer),
+    ("questions", Question.objects.all(), QuestionSerializer),
+    ("assignments", Assignment.objects.select_related("lesson"), AssignmentSerializer),
+    ("tests", Test.objects.select_related("lesson"), TestSerializer),
+)
+
+
+def build_change_feed(since=None):
+    """
+    Return everything changed since ``since``.
+
+    Without a watermark, or with one older than tombstone retention, the
+    full data set is returned with ``full: true`` and the client should
+    replace its local copy.
+    """
+    now = timezone.now()
+    full = since is None or since < now - TOMBSTONE_RETENTION
+    deleted = {}
+    if not full:
+        for resource, object_id in (
+            Tombstone.objects.filter(deleted_at__gte=since).order_by("deleted_at").values_list("resource", "object_id")
+        ):
+            deleted.setdefault(resource, []).append(object_id)
+
+    changes = {}
+    for resource, queryset, serializer_class in FEED:
+        if not full:
+            queryset = queryset.filter(updated_at__gte=since)
+        changes[resource] = {
+            "updated": serializer_class(queryset.order_by("updated_at", "id"), many=True).data,
+            "deleted": deleted.get(resource, []),
+        }
+    return {"watermark": now - CHANGE_FEED_OVERLAP, "full": full, "changes": changes}
+
+
+def prune_tombstones():
+    return Tombstone.objects.filter(deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()[0]
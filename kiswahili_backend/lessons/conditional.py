@@ -0,0 +1,29 @@
+"""
+Strong ETags and ``If-None-Match`` handling for DRF views.
+
+Views compute a cheap validator (ids and version numbers, no payload) and
+answer 304 before any serialization when the client's copy is current.
+"""
+import hashlib
+import json
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(json.dumps(parts, default=str, separators=(",", ":")).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    # If-None-Match compares weakly: W/"x" matches "x".
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,160 @@
+"""
+Materialized dashboard counters.
+
+Each counted row contributes to a few ``DashboardCounter`` cells, e.g. an
+active PP2 lesson adds 1 to ``("PP2", "lessons")`` and
+``("PP2", "active_lessons")``. Saves and deletes apply the difference between
+the row's old and new contribution with ``F()`` updates inside the writing
+transaction, so the dashboards read every count with a single query.
+
+Moving a lesson to a strand of another grade (or a test to a lesson of
+another grade) also moves its questions, tests and results, so those saves
+schedule a rebuild instead of applying a difference.
+
+``bulk_create``/``update()`` bypass signals; callers doing bulk writes use
+``add()`` directly, and ``rebuild_counters()`` (``manage.py
+rebuild_dashboard_counters``) recomputes everything if the table drifts.
+"""
+import threading
+from collections import defaultdict
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import DashboardCounter, Lesson, Profile, Question, Result, Role, Strand, Test
+
+SCHOOL_WIDE = ""
+FIELDS = ("lessons", "active_lessons", "questions", "tests", "results", "teachers")
+
+# Fields whose change can move a row between counter cells.
+_TRACKED_FIELDS = {
+    Lesson: ("strand_id", "is_active"),
+    Question: ("lesson_id",),
+    Test: ("lesson_id",),
+    Result: ("test_id",),
+    Profile: ("role",),
+    Strand: ("grade",),
+}
+
+_pending = threading.local()
+
+
+def _contribution(model, values):
+    """Return {(grade, field): n} for a row with the given tracked values."""
+    if model is Lesson:
+        grade = Strand.objects.values_list("grade", flat=True).get(pk=values["strand_id"])
+        return {(grade, "lessons"): 1, (grade, "active_lessons"): int(bool(values["is_active"]))}
+    if model is Question:
+        grade = Lesson.objects.values_list("strand__grade", flat=True).get(pk=values["lesson_id"])
+        return {(grade, "questions"): 1}
+    if model is Test:
+        grade = Lesson.objects.values_list("strand__grade", flat=True).get(pk=values["lesson_id"])
+        return {(grade, "tests"): 1}
+    if model is Result:
+        grade = Test.objects.values_list("lesson__strand__grade", flat=True).get(pk=values["test_id"])
+        return {(grade, "results"): 1}
+    if model is Profile:
+        return {(SCHOOL_WIDE, "teachers"): int(values["role"] == Role.TEACHER)}
+    return {}
+
+
+def _tracked_values(instance):
+    return {field: getattr(instance, field) for field in _TRACKED_FIELDS[type(instance)]}
+
+
+def add(grade, **deltas):
+    """Add ``deltas`` (field=n) to a grade's counters, creating the row if needed."""
+    changes = {field: F(field) + n for field, n in deltas.items() if n}
+    if not changes:
+        return
+    if not DashboardCounter.objects.filter(grade=grade).update(**changes):
+        DashboardCounter.objects.get_or_create(grade=grade)
+        DashboardCounter.objects.filter(grade=grade).update(**changes)
+
+
+def _apply(delta):
+    by_grade = defaultdict(dict)
+    for (grade, field), n in delta.items():
+        by_grade[grade][field] = by_grade[grade].get(field, 0) + n
+    for grade, deltas in by_grade.items():
+        add(grade, **deltas)
+
+
+def capture(instance):
+    """pre_save: remember the tracked values the row had in the database."""
+    model = type(instance)
+    instance._counter_origin = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._counter_origin = model.objects.filter(pk=instance.pk).values(*_TRACKED_FIELDS[model]).first()
+
+
+def saved(instance):
+    model = type(instance)
+    origin = getattr(instance, "_counter_origin", None)
+    current = _tracked_values(instance)
+    if origin == current:
+        return
+    if model is Strand:
+        if origin is not None:
+            schedule_rebuild()
+        return
+    try:
+        delta = _contribution(model, current)
+        previous = _contribution(model, origin) if origin is not None else {}
+    except ObjectDoesNotExist:
+        schedule_rebuild()
+        return
+    if model in (Lesson, Test) and previous and {g for g, _ in previous} != {g for g, _ in delta}:
+        schedule_rebuild()  # the row's children changed grade with it
+        return
+    for cell, n in previous.items():
+        delta[cell] = delta.get(cell, 0) - n
+    _apply(delta)
+
+
+def deleted(instance):
+    try:
+        contribution = _contribution(type(instance), _tracked_values(instance))
+    except ObjectDoesNotExist:
+        schedule_rebuild()
+        return
+    _apply({cell: -n for cell, n in contribution.items()})
+
+
+def schedule_rebuild():
+    """Rebuild once the current transaction commits (fixtures, parent rows gone)."""
+    _pending.ticket = ticket = getattr(_pending, "ticket", 0) + 1
+    transaction.on_commit(lambda: ticket == _pending.ticket and rebuild_counters())
+
+
+def rebuild_counters():
+    rows = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+    lessons = Lesson.objects.order_by().values_list("strand__grade").annotate(
+        n=Count("id"), active=Count("id", filter=Q(is_active=True)),
+    )
+    for grade, n, active in lessons:
+        rows[grade]["lessons"], rows[grade]["active_lessons"] = n, active
+    for model, path, field in (
+        (Question, "lesson__strand__grade", "questions"),
+        (Test, "lesson__strand__grade", "tests"),
+        (Result, "test__lesson__strand__grade", "results"),
+    ):
+        for grade, n in model.objects.order_by().values_list(path).annotate(n=Count("id")):
+            rows[grade][field] = n
+    rows[SCHOOL_WIDE]["teachers"] = Profile.objects.filter(role=Role.TEACHER).count()
+
+    with transaction.atomic():
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create(DashboardCounter(grade=grade, **counts) for grade, counts in rows.items())
+
+
+def read_counters():
+    """Return ({grade: counts}, school-wide totals) from one query."""
+    by_grade, totals = {}, dict.fromkeys(FIELDS, 0)
+    for row in DashboardCounter.objects.values("grade", *FIELDS):
+        grade = row.pop("grade")
+        by_grade[grade] = row
+        for field in FIELDS:
+            totals[field] += row[field]
+    return by_grade, totals
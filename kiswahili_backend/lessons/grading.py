@@ -0,0 +1,318 @@
+"""
+Auto-grading of lesson submissions.
+
+A lesson's questions are compiled once into an ``AnswerKey`` (expected answers
+already normalized, total marks pre-summed) and cached under the lesson's
+``content_version``, which every question save or delete bumps. An edit
+therefore moves readers to a new cache key instead of deleting the old one;
+the version is read before the questions, so a key is never cached under a
+version newer than the questions it was compiled from.
+
+Fill-in answers are matched leniently. Both sides are reduced to a plain
+spelling (casefolded, accents, apostrophes and punctuation removed, so
+``Ng'ombe.`` and ``ngombe`` agree), every accepted form in ``answer`` and
+``alternatives`` counts. Spelling slips are only forgiven where a teacher
+opts in with ``data["max_edits"]``: up to that many letter insertions,
+deletions, substitutions or swaps of neighbours. Short Kiswahili words sit
+one edit apart from each other (``paka``, ``pata``, ``papa``), so there is no
+tolerance by default; ``FILL_MAX_EDITS_BY_LENGTH`` can set one per word
+length for a whole deployment. Exact forms are a set lookup; the rest is a
+banded edit distance against the few forms of a close enough length.
+"""
+import datetime
+import re
+import unicodedata
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Value
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .models import Lesson, Question, QuestionType, RegradeJob, Submission
+
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+REGRADE_BATCH_SIZE = 500
+REGRADE_STALE_AFTER = 60 * 60  # seconds without progress before a pending job counts as abandoned
+
+
+# (minimum length, edits allowed) from the longest words down, used when a
+# question sets no max_edits; e.g. ((10, 1),). Shorter words must be exact.
+FILL_MAX_EDITS_BY_LENGTH = getattr(settings, "FILL_MAX_EDITS_BY_LENGTH", ())
+MAX_FILL_EDITS = 3
+
+_APOSTROPHES = re.compile(r"['‘’`ʼ]")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _normalize(value):
+    return str(value if value is not None else "").strip().lower()
+
+
+def normalize_fill(value):
+    """Plain spelling of a fill-in answer: casefolded, no accents, apostrophes or punctuation."""
+    text = unicodedata.normalize("NFKD", str(value if value is not None else ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return " ".join(_NON_WORD.sub(" ", _APOSTROPHES.sub("", text)).split())
+
+
+def default_max_edits(length):
+    return next((edits for minimum, edits in FILL_MAX_EDITS_BY_LENGTH if length >= minimum), 0)
+
+
+def within_edits(a, b, limit):
+    """Whether ``a`` becomes ``b`` in at most ``limit`` edits (adjacent swaps count as one)."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous, row = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        if low > 1:
+            current[low - 1] = limit + 1
+        for j in range(low, high + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + cost)
+            if previous is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous[j - 2] + 1)
+            current[j] = value
+        if high < len(b):
+            current[high + 1:] = [limit + 1] * (len(b) - high)
+        if min(current[low - 1:high + 1]) > limit:
+            return False
+        previous, row = row, current
+    return row[len(b)] <= limit
+
+
+class FillMatcher:
+    """Accepted forms of one fill-in answer, precompiled for fast matching."""
+    __slots__ = ("exact", "by_length", "reach")
+
+    def __init__(self, answers, max_edits=None):
+        forms = {normalize_fill(answer) for answer in answers} - {""}
+        self.exact = frozenset(forms)
+        self.by_length = defaultdict(list)
+        for form in forms:
+            edits = default_max_edits(len(form)) if max_edits is None else max_edits
+            if edits:
+                self.by_length[len(form)].append((form, edits))
+        self.by_length = dict(self.by_length)
+        self.reach = max((edits for forms in self.by_length.values() for _, edits in forms), default=0)
+
+    @classmethod
+    def from_data(cls, data):
+        answers = []
+        for value in (data.get("answer"), data.get("alternatives")):
+            answers += value if isinstance(value, list) else [value]
+        max_edits = data.get("max_edits")
+        if type(max_edits) is int:
+            max_edits = min(max(max_edits, 0), MAX_FILL_EDITS)
+        else:
+            max_edits = None  # unset or malformed: use the length-based default
+        return cls([a for a in answers if a is not None], max_edits)
+
+    def matches(self, given):
+        given = normalize_fill(given)
+        if given in self.exact:
+            return True
+        if not given or not self.reach:
+            return False
+        for length in range(len(given) - self.reach, len(given) + self.reach + 1):
+            for form, edits in self.by_length.get(length, ()):
+                if within_edits(given, form, edits):
+                    return True
+        return False
+
+
+def _pairs(value):
+    """Return matching pairs as a {left: right} dict of normalized strings."""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, (list, tuple)):
+        items = []
+        for pair in value:
+            if isinstance(pair, dict):
+                items.append((pair.get("left"), pair.get("right")))
+            elif isinstance(pair, (list, tuple)) and len(pair) == 2:
+                items.append(tuple(pair))
+    else:
+        items = []
+    return {_normalize(left): _normalize(right) for left, right in items}
+
+
+class AnswerKey:
+    """Compiled, picklable answer key for one lesson."""
+
+    def __init__(self, lesson_id, items, total):
+        self.lesson_id = lesson_id
+        self.items = items  # (question id as str, qtype, marks, expected)
+        self.total = total
+
+    @classmethod
+    def compile(cls, lesson_id):
+        items, total = [], 0
+        questions = (
+            Question.objects.filter(lesson_id=lesson_id)
+            .order_by("order", "id")
+            .only("id", "qtype", "data", "marks")
+        )
+        for q in questions:
+            total += q.marks
+            data = q.data or {}
+            if q.qtype == QuestionType.MCQ:
+                expected = data.get("answer")
+            elif q.qtype == QuestionType.FILL:
+                expected = FillMatcher.from_data(data)
+            elif q.qtype == QuestionType.MATCH:
+                expected = _pairs(data.get("pairs") or data.get("answer"))
+            else:
+                # Oral and upload answers are marked by the teacher.
+                continue
+            items.append((str(q.id), q.qtype, q.marks, expected))
+        return cls(lesson_id, tuple(items), total)
+
+    def grade(self, answers):
+        """Return the auto-graded score for a submission's ``answers`` dict."""
+        answers = answers or {}
+        score = 0
+        for qid, qtype, marks, expected in self.items:
+            if qid not in answers:
+                continue
+            given = answers[qid]
+            if qtype == QuestionType.MCQ:
+                if given == expected:
+                    score += marks
+            elif qtype == QuestionType.FILL:
+                if expected.matches(given):
+                    score += marks
+            elif qtype == QuestionType.MATCH and expected:
+                given = _pairs(given)
+                correct = sum(1 for left, right in expected.items() if given.get(left) == right)
+                score += marks * correct / len(expected)
+        return score
+
+
+def _cache_key(lesson_id, version):
+    # v2: fill answers are FillMatcher objects rather than strings.
+    return f"answer-key:v2:{lesson_id}:{version}"
+
+
+def get_answer_key(lesson):
+    """The compiled key of ``lesson`` as of its loaded ``content_version``."""
+    cache_key = _cache_key(lesson.id, lesson.content_version)
+    key = cache.get(cache_key)
+    if key is None:
+        key = AnswerKey.compile(lesson.id)
+        cache.set(cache_key, key, ANSWER_KEY_TIMEOUT)
+    return key
+
+
+# -------------------------
+# Regrading
+# -------------------------
+def regrade_submissions(lesson_id, question_id=None, batch_size=REGRADE_BATCH_SIZE, progress=None):
+    """
+    Recompute score/total of a lesson's submissions against its current key.
+
+    With ``question_id`` only submissions that answered that question are
+    re-marked; the others just get the new total. Marks added through the
+    grade action (``extra_score``) are kept. Rows are walked in id order and
+    written with one ``bulk_update`` per batch. ``progress(done, count)`` is
+    called after every batch. Returns the number of rows whose score changed.
+    """
+    version = Lesson.objects.values_list("content_version", flat=True).get(pk=lesson_id)
+    key = AnswerKey.compile(lesson_id)
+    cache.set(_cache_key(lesson_id, version), key, ANSWER_KEY_TIMEOUT)
+    now = timezone.now()
+    qs = Submission.objects.filter(lesson_id=lesson_id)
+
+    if question_id is not None:
+        answered = str(question_id)
+        # Same cap as the re-marked rows below: a score never exceeds the new total.
+        qs.exclude(answers__has_key=answered).exclude(total=key.total, score__lte=key.total).update(
+            total=key.total, score=Least("score", Value(key.total)), updated_at=now,
+        )
+        qs = qs.filter(answers__has_key=answered)
+
+    count = qs.count()
+    done = changed = last_id = 0
+    while True:
+        batch = list(
+            qs.filter(id__gt=last_id).order_by("id")
+            .only("id", "answers", "score", "total", "extra_score")[:batch_size]
+        )
+        if not batch:
+            break
+        dirty = []
+        for sub in batch:
+            score = min(key.total, key.grade(sub.answers) + sub.extra_score)
+            if score != sub.score or key.total != sub.total:
+                changed += score != sub.score
+                sub.score, sub.total, sub.updated_at = score, key.total, now
+                dirty.append(sub)
+        if dirty:
+            with transaction.atomic():
+                Submission.objects.bulk_update(dirty, ["score", "total", "updated_at"])
+        done += len(batch)
+        last_id = batch[-1].id
+        if progress:
+            progress(done, count)
+        if len(batch) < batch_size:
+            break
+    return changed
+
+
+_regrade_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="regrade")
+
+
+def _job_state(job):
+    state = {"status": job.status, "question": job.question_id, "processed": job.processed, "total": job.total}
+    if job.status == RegradeJob.Status.DONE:
+        state["changed"] = job.changed
+    if job.status == RegradeJob.Status.FAILED:
+        state["error"] = job.error
+    return state
+
+
+def regrade_status(lesson_id):
+    """State of the lesson's latest regrade, or None if it never had one."""
+    job = RegradeJob.objects.filter(lesson_id=lesson_id).order_by("-id").first()
+    return job and _job_state(job)
+
+
+def _update_job(job_id, **fields):
+    RegradeJob.objects.filter(id=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def _run_regrade(job_id, lesson_id, question_id):
+    def report(done, count):
+        _update_job(job_id, status=RegradeJob.Status.RUNNING, processed=done, total=count)
+
+    try:
+        _update_job(job_id, status=RegradeJob.Status.RUNNING)
+        changed = regrade_submissions(lesson_id, question_id, progress=report)
+        _update_job(job_id, status=RegradeJob.Status.DONE, changed=changed)
+    except Exception as exc:
+        _update_job(job_id, status=RegradeJob.Status.FAILED, error=str(exc))
+    finally:
+        connections.close_all()
+
+
+def start_regrade(lesson_id, question_id=None):
+    """Queue a background regrade unless one is already pending for the lesson."""
+    # A job its worker never finished (process restarted) must not block the lesson forever.
+    RegradeJob.objects.filter(
+        lesson_id=lesson_id, status__in=RegradeJob.PENDING,
+        updated_at__lt=timezone.now() - datetime.timedelta(seconds=REGRADE_STALE_AFTER),
+    ).update(status=RegradeJob.Status.FAILED, error="Abandoned.", updated_at=timezone.now())
+    try:
+        with transaction.atomic():
+            job = RegradeJob.objects.create(lesson_id=lesson_id, question_id=question_id)
+    except IntegrityError:  # one is already queued or running, maybe in another process
+        return regrade_status(lesson_id)
+    transaction.on_commit(lambda: _regrade_executor.submit(_run_regrade, job.id, lesson_id, question_id))
+    return _job_state(job)
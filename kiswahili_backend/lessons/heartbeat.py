@@ -0,0 +1,110 @@
+"""
+Coalescing buffer for progress heartbeats.
+
+Tablets report progress on every lesson step. Heartbeats are merged in a
+per-process buffer, keeping the highest ``percent``/``stars``/``last_step``
+seen for each (student, lesson). The buffer is written with one upsert when
+it fills up, a few seconds after the first pending heartbeat, when a lesson
+is finished, or at process exit. A classroom of tablets therefore costs one
+write per flush instead of one per step. Stored values are never lowered:
+the upsert takes the larger of the stored and new value in SQL.
+"""
+import atexit
+import threading
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .models import Lesson, Progress
+
+FIELDS = ("percent", "stars", "last_step")
+
+
+WRITE_BATCH_SIZE = 500
+
+
+def _upsert_sql(vendor, table, rows):
+    """``INSERT ... ON CONFLICT`` that keeps the larger of the stored and new values, per field."""
+    q = connection.ops.quote_name
+    columns = ", ".join(q(c) for c in ("student_id", "lesson_id", *FIELDS, "updated_at"))
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * rows)
+    if vendor == "mysql":
+        updates = ", ".join(f"{q(f)} = GREATEST({q(f)}, VALUES({q(f)}))" for f in FIELDS)
+        return (f"INSERT INTO {q(table)} ({columns}) VALUES {values} "
+                f"ON DUPLICATE KEY UPDATE {updates}, {q('updated_at')} = VALUES({q('updated_at')})")
+    greatest = "MAX" if vendor == "sqlite" else "GREATEST"  # SQLite's two-argument MAX is scalar
+    updates = ", ".join(f"{q(f)} = {greatest}({q(table)}.{q(f)}, excluded.{q(f)})" for f in FIELDS)
+    return (f"INSERT INTO {q(table)} ({columns}) VALUES {values} "
+            f"ON CONFLICT ({q('student_id')}, {q('lesson_id')}) DO UPDATE SET {updates}, "
+            f"{q('updated_at')} = excluded.{q('updated_at')}")
+
+
+def write_progress(pending):
+    """
+    Upsert ``{(student_id, lesson_id): values}`` into Progress.
+
+    The database keeps the larger of the stored and new value of each field,
+    so concurrent writers (other processes, other flushes) cannot lower it.
+    Heartbeats for lessons deleted since they were accepted are dropped.
+    """
+    lessons = set(Lesson.objects.filter(id__in={lesson_id for _, lesson_id in pending}).values_list("id", flat=True))
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    rows = [
+        (student_id, lesson_id, *(values[f] for f in FIELDS), now)
+        for (student_id, lesson_id), values in pending.items() if lesson_id in lessons
+    ]
+    table = Progress._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(rows), WRITE_BATCH_SIZE):
+            batch = rows[i:i + WRITE_BATCH_SIZE]
+            cursor.execute(_upsert_sql(connection.vendor, table, len(batch)), [v for row in batch for v in row])
+    return len(rows)
+
+
+class ProgressBuffer:
+    def __init__(self, flush_interval, max_pending):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+
+    def add(self, student_id, lesson_id, **values):
+        """Merge one heartbeat and return the coalesced values for the pair."""
+        with self._lock:
+            merged = self._pending.setdefault((student_id, lesson_id), dict.fromkeys(FIELDS, 0))
+            for field in FIELDS:
+                merged[field] = max(merged[field], values.get(field) or 0)
+            snapshot = dict(merged)
+            full = len(self._pending) >= self.max_pending
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+        return snapshot
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+        return write_progress(pending)
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+
+progress_buffer = ProgressBuffer(
+    flush_interval=getattr(settings, "PROGRESS_HEARTBEAT_FLUSH_SECONDS", 5),
+    max_pending=getattr(settings, "PROGRESS_HEARTBEAT_MAX_PENDING", 500),
+)
+atexit.register(progress_buffer.flush)
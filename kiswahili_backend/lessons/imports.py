@@ -0,0 +1,154 @@
+"""
+Bulk import of paper-test marks.
+
+A sheet is validated as a whole: every row is checked against the test's
+``total_marks`` and the roster of the class the test was set for, and the
+results are only written, in one ``bulk_create``, when no row has an error.
+Otherwise nothing is written and the per-row report says what to fix.
+
+CSV is always accepted. ``.xlsx`` needs ``openpyxl``, which is optional.
+"""
+import csv
+import io
+import math
+
+from django.db import transaction
+
+from . import counters
+from .models import Result, Student, Test
+from .roster import AMBIGUOUS, MATCHED, Roster
+
+MAX_ROWS = 500
+NAME_COLUMNS = ("student_name", "student", "name")
+
+
+class ImportFileError(ValueError):
+    """The upload cannot be read as a sheet of marks."""
+
+
+def _header(value):
+    return str(value or "").strip().lower().replace(" ", "_")
+
+
+def read_rows(upload):
+    """Return the sheet's non-blank rows as ``(line number, {column: value})`` pairs."""
+    name = (upload.name or "").lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportFileError("Excel files need openpyxl on the server; upload a CSV instead.")
+        try:
+            sheet = load_workbook(upload, read_only=True, data_only=True).active
+        except Exception:
+            raise ImportFileError("Could not read the Excel file.")
+        lines = sheet.iter_rows(values_only=True)
+        header = [_header(cell) for cell in next(lines, ())]
+        rows = [
+            (number, dict(zip(header, line)))
+            for number, line in enumerate(lines, start=2) if any(cell not in (None, "") for cell in line)
+        ]
+    else:
+        try:
+            text = io.TextIOWrapper(upload, encoding="utf-8-sig")
+            reader = csv.reader(text)
+            header = [_header(cell) for cell in next(reader, [])]
+            rows = [
+                (number, dict(zip(header, line)))
+                for number, line in enumerate(reader, start=2) if any(cell.strip() for cell in line)
+            ]
+        except (UnicodeDecodeError, csv.Error):
+            raise ImportFileError("Could not read the file as UTF-8 CSV.")
+
+    if "score" not in header or not ({"student_id", *NAME_COLUMNS} & set(header)):
+        raise ImportFileError("The sheet needs a score column and a student_id or student_name column.")
+    if not rows:
+        raise ImportFileError("The sheet has no rows.")
+    if len(rows) > MAX_ROWS:
+        raise ImportFileError(f"A sheet may hold at most {MAX_ROWS} rows.")
+    return rows
+
+
+def _cell(row, *columns):
+    for column in columns:
+        value = row.get(column)
+        if value not in (None, ""):
+            return str(value).strip()
+    return ""
+
+
+def import_results(test, rows):
+    """
+    Validate ``rows`` for ``test`` and write them if all are valid.
+
+    Returns ``(report, created)``: one report entry per row, numbered as in
+    the sheet, and the number of results written, which is 0 whenever any
+    row has errors.
+    """
+    with transaction.atomic():
+        # Concurrent imports for the same test queue here, so each sees the
+        # other's results; the (test, student) constraint backs this up.
+        Test.objects.select_for_update().filter(pk=test.pk).first()
+        return _import_results(test, rows)
+
+
+def _import_results(test, rows):
+    class_name = test.lesson.class_name
+    students = Student.objects.filter(enrolled_class=class_name)
+    names = dict(students.values_list("id", "full_name"))
+    roster = Roster(students)
+    already = set(Result.objects.filter(test=test, student__isnull=False).values_list("student_id", flat=True))
+
+    report, results, seen = [], [], {}
+    for number, row in rows:
+        errors = {}
+        student_id = None
+        raw_id, raw_name = _cell(row, "student_id"), _cell(row, *NAME_COLUMNS)
+        if raw_id:
+            if raw_id.isdigit() and int(raw_id) in names:
+                student_id = int(raw_id)
+            else:
+                errors["student"] = f"No student {raw_id} in class {class_name}."
+        elif raw_name:
+            student_id, outcome = roster.match(raw_name, class_name)
+            if outcome != MATCHED:
+                errors["student"] = (
+                    f"Several students in class {class_name} match {raw_name!r}; use student_id."
+                    if outcome == AMBIGUOUS else f"No student named {raw_name!r} in class {class_name}."
+                )
+        else:
+            errors["student"] = "Missing student."
+
+        if student_id is not None:
+            if student_id in seen:
+                errors["student"] = f"Same student as row {seen[student_id]}."
+            elif student_id in already:
+                errors["student"] = "This student already has a result for this test."
+            else:
+                seen[student_id] = number
+
+        raw_score = _cell(row, "score")
+        try:
+            score = float(raw_score)
+            if not math.isfinite(score):
+                raise ValueError
+        except ValueError:
+            errors["score"] = f"{raw_score!r} is not a number." if raw_score else "Missing score."
+        else:
+            if not 0 <= score <= test.total_marks:
+                errors["score"] = f"Score must be between 0 and {test.total_marks}."
+
+        if errors:
+            report.append({"row": number, "outcome": "error", "errors": errors})
+            continue
+        report.append({"row": number, "outcome": "ok", "student": student_id, "score": score})
+        results.append(Result(
+            test=test, student_id=student_id, student_name=names[student_id],
+            score=score, feedback=_cell(row, "feedback") or None,
+        ))
+
+    if len(results) < len(rows):
+        return report, 0
+    Result.objects.bulk_create(results)
+    counters.add(test.lesson.strand.grade, results=len(results))
+    return report, len(results)
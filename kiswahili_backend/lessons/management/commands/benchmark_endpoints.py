@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from lessons.benchmarks import (
+    DEFAULT_REPEAT, DEFAULT_TOLERANCE, DEFAULT_WARMUP, compare, load_baseline, run_benchmarks,
+    same_dataset, save_baseline,
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark every API GET endpoint (p50/p95 latency, SQL queries) and save or compare a JSON baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+        parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+        parser.add_argument("--cold-cache", action="store_true", help="Clear the cache before every request.")
+        parser.add_argument("--username", help="Account to request as (default: the first teacher).")
+        parser.add_argument("--only", nargs="+", metavar="URL_NAME", help="Benchmark only these URL names.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--compare", metavar="BASELINE", help="Fail on regressions against this JSON baseline.")
+        parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                            help="Allowed relative p50 growth when comparing (default 0.5).")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["username"]:
+            user = User.objects.filter(username=options["username"]).first()
+            if user is None:
+                raise CommandError(f"No user named {options['username']!r}.")
+
+        def progress(name, result):
+            self.stdout.write(
+                f"  {name:<32} {result['status']}  p50 {result['p50_ms']:>8.2f} ms  "
+                f"p95 {result['p95_ms']:>8.2f} ms  {result['queries']:>3} queries  {result['bytes']} bytes"
+            )
+
+        try:
+            current = run_benchmarks(user, options["repeat"], options["warmup"], options["cold_cache"],
+                                     options["only"], progress=progress)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options["output"]:
+            save_baseline(options["output"], current)
+            self.stdout.write(f"Wrote {options['output']}.")
+        if not options["compare"]:
+            return
+
+        baseline = load_baseline(options["compare"])
+        if not same_dataset(baseline, current):
+            self.stdout.write(self.style.WARNING("The dataset differs from the baseline's; only comparing queries and statuses."))
+        problems = compare(baseline, current, options["tolerance"])
+        for problem in problems:
+            self.stdout.write(self.style.ERROR(f"  {problem}"))
+        if problems:
+            raise CommandError(f"{len(problems)} regression(s) against {options['compare']}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
@@ -0,0 +1,22 @@
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lessons.packs import get_or_build_pack
+
+
+class Command(BaseCommand):
+    help = "Build (or reuse) the offline lesson pack for a grade and/or class."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grade", help="e.g. PP2")
+        parser.add_argument("--class-name", dest="class_name")
+        parser.add_argument("--output", help="Also copy the pack to this path.")
+
+    def handle(self, *args, **options):
+        if not (options["grade"] or options["class_name"]):
+            raise CommandError("Pass --grade and/or --class-name.")
+        path, fingerprint = get_or_build_pack(options["grade"], options["class_name"])
+        if options["output"]:
+            shutil.copyfile(path, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Pack {fingerprint}: {path} ({path.stat().st_size} bytes)"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from lessons.roster import LINK_BATCH_SIZE, link_results
+
+
+class Command(BaseCommand):
+    help = "Link paper-test results to Student records by matching the recorded student names."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=LINK_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Report matches without writing them.")
+
+    def handle(self, *args, **options):
+        def progress(linked, unmatched):
+            self.stdout.write(f"  {linked} linked, {unmatched} unmatched")
+
+        linked, unmatched = link_results(options["batch_size"], options["dry_run"], progress=progress)
+        for (name, class_name, outcome), count in sorted(unmatched.items(), key=lambda item: (item[0][1] or "", item[0][0])):
+            self.stdout.write(f"  {outcome}: {name!r} in class {class_name or '-'} ({count} result(s))")
+        verb = "Would link" if options["dry_run"] else "Linked"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {linked} result(s); {sum(unmatched.values())} left unmatched."
+        ))
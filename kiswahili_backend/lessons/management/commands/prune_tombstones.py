@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from lessons.changes import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete change-feed tombstones older than CHANGE_FEED_TOMBSTONE_DAYS."
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"Pruned {prune_tombstones()} tombstone(s)."))
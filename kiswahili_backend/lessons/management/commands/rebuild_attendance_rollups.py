@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from lessons.attendance import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the monthly attendance rollups used by attendance analytics."
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} attendance rollups."))
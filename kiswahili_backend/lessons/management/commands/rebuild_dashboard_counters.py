@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from lessons.counters import read_counters, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized dashboard counters from the source tables."
+
+    def handle(self, *args, **options):
+        rebuild_counters()
+        by_grade, totals = read_counters()
+        for grade, counts in sorted(by_grade.items()):
+            self.stdout.write(f"  {grade or 'school-wide'}: {counts}")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt dashboard counters: {totals}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from lessons.search import SEARCH_BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = "Re-create the search entries for lessons, questions, lesson plans, strands and sub-strands."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SEARCH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        written = rebuild(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {written} search entries."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lessons.grading import REGRADE_BATCH_SIZE, regrade_submissions
+from lessons.models import Lesson, Question
+
+
+class Command(BaseCommand):
+    help = "Recompute submission scores after a lesson's answer key changed."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--lesson", type=int, help="Regrade every submission of this lesson.")
+        target.add_argument("--question", type=int, help="Regrade submissions that answered this question.")
+        parser.add_argument("--batch-size", type=int, default=REGRADE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        question_id = options["question"]
+        if question_id is not None:
+            try:
+                lesson_id = Question.objects.values_list("lesson_id", flat=True).get(pk=question_id)
+            except Question.DoesNotExist:
+                raise CommandError(f"Question {question_id} does not exist.")
+        else:
+            lesson_id = options["lesson"]
+            if not Lesson.objects.filter(pk=lesson_id).exists():
+                raise CommandError(f"Lesson {lesson_id} does not exist.")
+
+        def progress(done, count):
+            self.stdout.write(f"  {done}/{count} submissions")
+
+        changed = regrade_submissions(lesson_id, question_id, batch_size=options["batch_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Regraded lesson {lesson_id}: {changed} score(s) changed."))
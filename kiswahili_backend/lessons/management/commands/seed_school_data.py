@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lessons.models import Lesson, Student
+from lessons.seeding import DEMO_PASSWORD, SEED_BATCH_SIZE, seed_school_data
+
+
+class Command(BaseCommand):
+    help = "Generate a seeded, realistic dataset (schools, classes, accounts, lessons and years of activity)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schools", type=int, default=2)
+        parser.add_argument("--classes", type=int, default=5, help="Classes per school, spread over the grades.")
+        parser.add_argument("--students", type=int, default=30, help="Pupils per class.")
+        parser.add_argument("--years", type=int, default=1, help="Years of history ending at --until.")
+        parser.add_argument("--lessons", type=int, default=40, help="Lessons per class.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--until", type=datetime.date.fromisoformat, help="Last day of history (default today).")
+        parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE)
+        parser.add_argument("--append", action="store_true", help="Add to a database that already has data.")
+
+    def handle(self, *args, **options):
+        if not options["append"] and (Lesson.objects.exists() or Student.objects.exists()):
+            raise CommandError("The database already has lessons or students; pass --append to add to it.")
+        counts = seed_school_data(
+            schools=options["schools"], classes=options["classes"], students=options["students"],
+            years=options["years"], lessons=options["lessons"], seed=options["seed"],
+            until=options["until"], batch_size=options["batch_size"],
+        )
+        for model, count in counts.items():
+            self.stdout.write(f"  {model}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {sum(counts.values())} rows. Accounts use the password {DEMO_PASSWORD!r}."
+        ))
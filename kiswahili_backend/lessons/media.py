@@ -0,0 +1,193 @@
+"""
+Submission media: chunked, resumable uploads and range-served playback.
+
+A client declares an upload (question, size, content type), then sends the
+bytes with ``PUT`` requests carrying ``Content-Range: bytes start-end/size``.
+Each chunk is copied from the request stream to the file under
+``MEDIA_ROOT/submissions`` in small blocks, so memory use does not grow with
+the recording. A chunk that does not start at the received offset gets a
+409 with the offset to resume from; an interrupted chunk keeps whatever
+arrived.
+
+Finished uploads are handed to a small worker pool that makes a JPEG
+thumbnail for images (with Pillow) or a mono AAC transcode for audio (with
+ffmpeg). Both tools are optional: without them the original is served as is.
+"""
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .models import QuestionType, SubmissionMedia
+
+BLOCK_SIZE = 64 * 1024
+MEDIA_DIR = "submissions"
+THUMBNAIL_SIZE = (320, 320)
+ALLOWED_TYPES = {QuestionType.ORAL: "audio/", QuestionType.UPLOAD: "image/"}
+MAX_BYTES = getattr(settings, "SUBMISSION_MEDIA_MAX_BYTES", 50 * 1024 * 1024)
+
+_CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_media_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "SUBMISSION_MEDIA_WORKERS", 2), thread_name_prefix="submission-media",
+)
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, received=None):
+        super().__init__(message)
+        self.status = status
+        self.received = received
+
+
+def media_path(name):
+    return Path(settings.MEDIA_ROOT) / name
+
+
+def original_name(media):
+    extension = media.content_type.split("/")[-1].split(";")[0].strip() or "bin"
+    return f"{MEDIA_DIR}/{media.student_id}/{media.pk}/original.{re.sub(r'[^a-z0-9]', '', extension)[:8]}"
+
+
+def parse_content_range(header, size):
+    match = _CONTENT_RANGE.match(header or "")
+    if not match:
+        raise UploadError("Expected 'Content-Range: bytes start-end/size'.")
+    start, end, total = map(int, match.groups())
+    if total != size or end < start or end >= size:
+        raise UploadError(f"Content-Range does not fit the declared size of {size} bytes.")
+    return start, end
+
+
+def write_chunk(media_id, content_range, stream):
+    """
+    Append one chunk from ``stream`` to the upload and return the updated media.
+
+    The row is locked while the chunk is written so two requests for the
+    same upload cannot interleave.
+    """
+    if stream is None:
+        raise UploadError("The chunk is empty.")
+    with transaction.atomic():
+        media = SubmissionMedia.objects.select_for_update().get(pk=media_id)
+        if media.status != SubmissionMedia.Status.UPLOADING:
+            raise UploadError("This upload is already complete.", status=409, received=media.received)
+        start, end = parse_content_range(content_range, media.size)
+        if start != media.received:
+            raise UploadError(f"Resume from byte {media.received}.", status=409, received=media.received)
+
+        if not media.file:
+            media.file.name = original_name(media)
+        path = media_path(media.file.name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        remaining = end - start + 1
+        with open(path, "r+b" if path.exists() else "wb") as f:
+            f.seek(start)
+            f.truncate()
+            while remaining:
+                block = stream.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                f.write(block)
+                remaining -= len(block)
+        media.received = end + 1 - remaining
+
+        if media.received == media.size:
+            media.status = SubmissionMedia.Status.PROCESSING
+            transaction.on_commit(lambda: _media_executor.submit(_process, media.pk))
+        media.save(update_fields=["file", "received", "status", "updated_at"])
+    return media
+
+
+def _process(media_id):
+    try:
+        media = SubmissionMedia.objects.get(pk=media_id)
+        derived = make_derived(media)
+        SubmissionMedia.objects.filter(pk=media_id).update(derived=derived or "", status=SubmissionMedia.Status.READY)
+    except Exception as exc:
+        SubmissionMedia.objects.filter(pk=media_id).update(status=SubmissionMedia.Status.FAILED, error=str(exc))
+    finally:
+        connections.close_all()
+
+
+def make_derived(media):
+    """Write the thumbnail or transcode next to the original and return its name, if a tool is available."""
+    source = media_path(media.file.name)
+    if media.question.qtype == QuestionType.UPLOAD:
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        name = str(Path(media.file.name).with_name("thumbnail.jpg"))
+        with Image.open(source) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            image.convert("RGB").save(media_path(name), "JPEG", quality=80)
+        return name
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    name = str(Path(media.file.name).with_name("audio.m4a"))
+    subprocess.run(
+        [ffmpeg, "-nostdin", "-y", "-loglevel", "error", "-i", str(source),
+         "-vn", "-ac", "1", "-c:a", "aac", "-b:a", "48k", str(media_path(name))],
+        check=True, capture_output=True, timeout=300,
+    )
+    return name
+
+
+def delete_files(media):
+    names = [name for name in (media.file.name, media.derived.name) if name]
+
+    def remove():
+        for name in names:
+            media_path(name).unlink(missing_ok=True)
+        if names:
+            try:
+                media_path(names[0]).parent.rmdir()
+            except OSError:
+                pass
+
+    transaction.on_commit(remove)
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length:
+            block = f.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def ranged_file_response(request, path, content_type):
+    """Stream ``path``, honouring a single ``Range: bytes=`` request."""
+    size = os.path.getsize(path)
+    start, end, status = 0, size - 1, 200
+    match = _RANGE.match(request.headers.get("Range", ""))
+    if match and any(match.groups()):
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:
+            start = max(size - int(last), 0)
+        if start > end or start >= size:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        status = 206
+
+    response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=status, content_type=content_type)
+    response["Content-Length"] = str(end - start + 1)
+    response["Accept-Ranges"] = "bytes"
+    if status == 206:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
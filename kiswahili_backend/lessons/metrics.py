@@ -0,0 +1,200 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+``MetricsMiddleware`` times every request, counts its SQL queries and their
+time through ``execute_wrapper`` on each database connection, and records
+the response size, keyed by resolved URL name and method. Streamed
+responses are measured when their last chunk has been sent, so queries run
+while streaming are included. Recording is a few additions under a lock.
+
+Requests slower than ``METRICS_SLOW_REQUEST_MS`` are logged to
+``lessons.metrics`` with their slowest statements.
+
+Metrics are kept per process; Prometheus sums them across workers. The
+``/api/metrics`` view needs ``Authorization: Bearer <METRICS_TOKEN>``, or
+DEBUG when no token is configured.
+"""
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger("lessons.metrics")
+
+PREFIX = "swahub"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SLOW_SQL_SHOWN = 5
+SQL_KEPT = 500  # statements kept per request for the slow log
+
+
+class QueryRecorder:
+    """``execute_wrapper`` hook counting statements and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            if len(self.statements) < SQL_KEPT:
+                self.statements.append((elapsed, sql))
+
+
+class _RouteStats:
+    __slots__ = ("latency", "latency_sum", "queries", "query_sum", "query_seconds", "bytes", "statuses")
+
+    def __init__(self):
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.queries = [0] * (len(QUERY_BUCKETS) + 1)
+        self.query_sum = 0
+        self.query_seconds = 0.0
+        self.bytes = 0
+        self.statuses = {}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, method, status, seconds, queries, query_seconds, size):
+        with self._lock:
+            stats = self._routes.get((route, method))
+            if stats is None:
+                stats = self._routes[(route, method)] = _RouteStats()
+            stats.latency[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stats.latency_sum += seconds
+            stats.queries[bisect_left(QUERY_BUCKETS, queries)] += 1
+            stats.query_sum += queries
+            stats.query_seconds += query_seconds
+            stats.bytes += size
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def render(self):
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+            _histogram(lines, f"{PREFIX}_request_duration_seconds", "Request latency.",
+                       routes, LATENCY_BUCKETS, lambda s: (s.latency, s.latency_sum))
+            _histogram(lines, f"{PREFIX}_request_queries", "SQL queries per request.",
+                       routes, QUERY_BUCKETS, lambda s: (s.queries, s.query_sum))
+            _counter(lines, f"{PREFIX}_request_query_seconds_total", "Time spent in SQL.",
+                     routes, lambda s: s.query_seconds)
+            _counter(lines, f"{PREFIX}_response_bytes_total", "Response body bytes.",
+                     routes, lambda s: s.bytes)
+            lines += [f"# HELP {PREFIX}_requests_total Requests by status.", f"# TYPE {PREFIX}_requests_total counter"]
+            for (route, method), stats in routes:
+                for status, n in sorted(stats.statuses.items()):
+                    lines.append(f'{PREFIX}_requests_total{{{_labels(route, method)},status="{status}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+def _labels(route, method):
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'route="{route}",method="{method}"'
+
+
+def _histogram(lines, name, help_text, routes, buckets, values):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (route, method), stats in routes:
+        counts, total = values(stats)
+        labels = _labels(route, method)
+        cumulative = 0
+        for bound, n in zip((*buckets, "+Inf"), counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {total}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+
+def _counter(lines, name, help_text, routes, value):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for (route, method), stats in routes:
+        lines.append(f"{name}{{{_labels(route, method)}}} {value(stats)}")
+
+
+registry = Registry()
+
+
+def record_queries(recorder):
+    """Context manager sending every connection's queries through ``recorder``."""
+    stack = ExitStack()
+    for connection in connections.all(initialized_only=False):
+        stack.enter_context(connection.execute_wrapper(recorder))
+    return stack
+
+
+def _route(request):
+    match = getattr(request, "resolver_match", None)
+    return (match.url_name or match.route) if match else "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, "METRICS_SLOW_REQUEST_MS", 1000) / 1000
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with record_queries(recorder):
+            response = self.get_response(request)
+        if getattr(response, "streaming", False):
+            response.streaming_content = self._measure_stream(
+                request, response.status_code, response.streaming_content, recorder, start,
+            )
+        else:
+            self._finish(request, response.status_code, recorder, start, len(response.content))
+        return response
+
+    def _measure_stream(self, request, status, content, recorder, start):
+        size = 0
+        try:
+            with record_queries(recorder):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self._finish(request, status, recorder, start, size)
+
+    def _finish(self, request, status, recorder, start, size):
+        elapsed = time.perf_counter() - start
+        route = _route(request)
+        registry.record(route, request.method, status, elapsed, recorder.count, recorder.seconds, size)
+        if elapsed >= self.slow_seconds:
+            slowest = sorted(recorder.statements, key=lambda s: s[0], reverse=True)[:SLOW_SQL_SHOWN]
+            logger.warning(
+                "Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms%s",
+                request.method, request.path, route, elapsed * 1000, recorder.count, recorder.seconds * 1000,
+                "".join(f"\n  {seconds * 1000:.1f} ms: {sql[:500]}" for seconds, sql in slowest),
+            )
+
+
+def metrics_view(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        given = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(given.encode(), token.encode()):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:09
+
+from django.db import migrations, models
+
+
+def backfill_extra_score(apps, schema_editor):
+    """
+    Recover marks added through the grade action on already graded rows.
+
+    Before this migration only mcq/fill were auto-graded, so the auto score
+    is recomputed with that rule and anything above it is the teacher's.
+    """
+    Submission = apps.get_model("lessons", "Submission")
+    Question = apps.get_model("lessons", "Question")
+    keys = {}
+    graded = Submission.objects.filter(graded_by__isnull=False).only("id", "lesson_id", "answers", "score")
+    for sub in graded.iterator():
+        if sub.lesson_id not in keys:
+            keys[sub.lesson_id] = list(Question.objects.filter(lesson_id=sub.lesson_id).values_list("id", "qtype", "data", "marks"))
+        answers, auto = sub.answers or {}, 0
+        for qid, qtype, data, marks in keys[sub.lesson_id]:
+            if str(qid) not in answers:
+                continue
+            if qtype == "mcq" and answers[str(qid)] == (data or {}).get("answer"):
+                auto += marks
+            elif qtype == "fill" and str(answers[str(qid)] or "").strip().lower() == str((data or {}).get("answer") or "").strip().lower():
+                auto += marks
+        if sub.score > auto:
+            Submission.objects.filter(pk=sub.pk).update(extra_score=sub.score - auto)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0009_assignment_lesson_plan_alter_lessonplan_assignment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='extra_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_extra_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:11
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_counters(apps, schema_editor):
+    DashboardCounter = apps.get_model("lessons", "DashboardCounter")
+    rows = defaultdict(dict)
+    lessons = apps.get_model("lessons", "Lesson").objects.order_by().values_list("strand__grade").annotate(
+        n=Count("id"), active=Count("id", filter=Q(is_active=True)),
+    )
+    for grade, n, active in lessons:
+        rows[grade].update(lessons=n, active_lessons=active)
+    for model, path, field in (
+        ("Question", "lesson__strand__grade", "questions"),
+        ("Test", "lesson__strand__grade", "tests"),
+        ("Result", "test__lesson__strand__grade", "results"),
+    ):
+        for grade, n in apps.get_model("lessons", model).objects.order_by().values_list(path).annotate(n=Count("id")):
+            rows[grade][field] = n
+    rows[""]["teachers"] = apps.get_model("lessons", "Profile").objects.filter(role="teacher").count()
+    DashboardCounter.objects.bulk_create(DashboardCounter(grade=grade, **counts) for grade, counts in rows.items())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0010_submission_extra_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade', models.CharField(max_length=10, unique=True)),
+                ('lessons', models.IntegerField(default=0)),
+                ('active_lessons', models.IntegerField(default=0)),
+                ('questions', models.IntegerField(default=0)),
+                ('tests', models.IntegerField(default=0)),
+                ('results', models.IntegerField(default=0)),
+                ('teachers', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
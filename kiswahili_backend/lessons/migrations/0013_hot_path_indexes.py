@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:13
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def merge_duplicate_progress(apps, schema_editor):
+    """Collapse repeated (student, lesson) progress rows into the newest one, keeping the best values."""
+    Progress = apps.get_model("lessons", "Progress")
+    duplicates = (
+        Progress.objects.order_by().values("student_id", "lesson_id")
+        .annotate(n=Count("id")).filter(n__gt=1)
+    )
+    for pair in duplicates.iterator():
+        rows = Progress.objects.filter(student_id=pair["student_id"], lesson_id=pair["lesson_id"])
+        best = rows.aggregate(percent=Max("percent"), stars=Max("stars"), last_step=Max("last_step"))
+        keep = rows.order_by("-updated_at", "-id").values_list("id", flat=True)[0]
+        rows.exclude(id=keep).delete()
+        rows.filter(id=keep).update(**best)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0012_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_progress, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='strand',
+            name='grade',
+            field=models.CharField(db_index=True, default='PP2', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['date'], name='lesson_active_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['student', 'lesson'], name='submission_student_lesson_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['lesson', 'created_at'], name='submission_lesson_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='progress',
+            constraint=models.UniqueConstraint(fields=('student', 'lesson'), name='progress_student_lesson_uniq'),
+        ),
+    ]
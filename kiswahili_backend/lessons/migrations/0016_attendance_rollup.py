@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:21
+
+import django.db.models.deletion
+from itertools import groupby
+
+from django.db import migrations, models
+
+
+def populate_rollups(apps, schema_editor):
+    # Same runs as lessons.attendance.Stats, folded in one pass per student-month.
+    Attendance = apps.get_model("lessons", "Attendance")
+    AttendanceRollup = apps.get_model("lessons", "AttendanceRollup")
+    rows = Attendance.objects.order_by("student_id", "date").values_list("student_id", "date", "status").iterator()
+    batch = []
+    for (student_id, month), marks in groupby(rows, key=lambda r: (r[0], r[1].replace(day=1))):
+        statuses = [status for _, _, status in marks]
+        run = longest = 0
+        for status in statuses:
+            run = run + 1 if status == "absent" else 0
+            longest = max(longest, run)
+        lead = next((i for i, status in enumerate(statuses) if status != "absent"), len(statuses))
+        batch.append(AttendanceRollup(
+            student_id=student_id, month=month, days=len(statuses),
+            present=statuses.count("present"), absent=statuses.count("absent"), late=statuses.count("late"),
+            lead_absent=lead, trail_absent=run, longest_absent=longest,
+        ))
+        if len(batch) >= 2000:
+            AttendanceRollup.objects.bulk_create(batch)
+            batch = []
+    AttendanceRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0015_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('days', models.PositiveIntegerField(default=0)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('late', models.PositiveIntegerField(default=0)),
+                ('lead_absent', models.PositiveIntegerField(default=0)),
+                ('trail_absent', models.PositiveIntegerField(default=0)),
+                ('longest_absent', models.PositiveIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='lessons.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'student'], name='attendance_rollup_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'month'), name='attendance_rollup_student_month_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
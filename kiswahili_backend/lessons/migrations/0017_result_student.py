@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0016_attendance_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='student',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='results', to='lessons.student'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['student', 'created_at'], name='result_student_created_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0017_result_student'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.PositiveBigIntegerField()),
+                ('received', models.PositiveBigIntegerField(default=0)),
+                ('file', models.FileField(blank=True, max_length=255, upload_to='submissions/')),
+                ('derived', models.FileField(blank=True, max_length=255, upload_to='submissions/')),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='uploading', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media', to='lessons.question')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_media', to=settings.AUTH_USER_MODEL)),
+                ('submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='media', to='lessons.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'question'], name='submission_media_student_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,145 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:40
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+SQLITE_INDEX = [
+    """CREATE VIRTUAL TABLE lessons_searchentry_fts USING fts5(
+        title_terms, body_terms, content='lessons_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER lessons_searchentry_fts_insert AFTER INSERT ON lessons_searchentry BEGIN
+        INSERT INTO lessons_searchentry_fts(rowid, title_terms, body_terms) VALUES (new.id, new.title_terms, new.body_terms);
+    END""",
+    """CREATE TRIGGER lessons_searchentry_fts_delete AFTER DELETE ON lessons_searchentry BEGIN
+        INSERT INTO lessons_searchentry_fts(lessons_searchentry_fts, rowid, title_terms, body_terms)
+        VALUES ('delete', old.id, old.title_terms, old.body_terms);
+    END""",
+    """CREATE TRIGGER lessons_searchentry_fts_update AFTER UPDATE ON lessons_searchentry BEGIN
+        INSERT INTO lessons_searchentry_fts(lessons_searchentry_fts, rowid, title_terms, body_terms)
+        VALUES ('delete', old.id, old.title_terms, old.body_terms);
+        INSERT INTO lessons_searchentry_fts(rowid, title_terms, body_terms) VALUES (new.id, new.title_terms, new.body_terms);
+    END""",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS lessons_searchentry_fts_update",
+    "DROP TRIGGER IF EXISTS lessons_searchentry_fts_delete",
+    "DROP TRIGGER IF EXISTS lessons_searchentry_fts_insert",
+    "DROP TABLE IF EXISTS lessons_searchentry_fts",
+]
+# Must stay identical to lessons.search._TSVECTOR (minus the table alias) for the index to be used.
+POSTGRES_INDEX = [
+    """CREATE INDEX lessons_searchentry_tsv_idx ON lessons_searchentry USING gin ((
+        setweight(to_tsvector('simple', title_terms), 'A') || setweight(to_tsvector('simple', body_terms), 'B')
+    ))""",
+]
+POSTGRES_DROP = ["DROP INDEX IF EXISTS lessons_searchentry_tsv_idx"]
+
+
+def _execute(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _execute(schema_editor, {"sqlite": SQLITE_INDEX, "postgresql": POSTGRES_INDEX})
+
+
+def drop_search_index(apps, schema_editor):
+    _execute(schema_editor, {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP})
+
+
+# A frozen copy of lessons.search's indexing as of this migration, so later
+# changes there (or to the models) cannot break or alter the backfill.
+_PREFIX = re.compile(r"^(?:mw(?=[aeiou])|ch(?=[aeiou])|vy(?=[aeiou])|wa|mi|ji|ma|ki|vi|ku|m(?=[^aeiouw])|u(?=[^aeiou]))")
+_APOSTROPHES = re.compile(r"['‘’`]")
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _index_terms(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = _APOSTROPHES.sub("", "".join(ch for ch in text if not unicodedata.combining(ch)).casefold())
+    terms = []
+    for word in _WORD.findall(text):
+        terms.append(word)
+        match = _PREFIX.match(word)
+        if match and len(word) - match.end() >= 3:
+            terms.append(word[match.end():])
+    return " ".join(terms)
+
+
+def _question_text(data):
+    data = data or {}
+    parts = [text for text in (data.get("options") or []) + (data.get("alternatives") or []) if isinstance(text, str)]
+    if isinstance(data.get("answer"), str):
+        parts.append(data["answer"])
+    for pair in data.get("pairs") or []:
+        if isinstance(pair, dict):
+            parts += [str(pair.get("left") or ""), str(pair.get("right") or "")]
+    return " ".join(parts)
+
+
+_DOCUMENTS = {
+    "Strand": ("strand", lambda o: (o.name, o.grade, None, None)),
+    "SubStrand": ("substrand", lambda o: (o.name, "", o.strand_id, None)),
+    "Lesson": ("lesson", lambda o: (o.title, "\n".join(filter(None, (o.objective, o.description))), None, None)),
+    "Question": ("question", lambda o: (o.prompt, _question_text(o.data), o.lesson_id, None)),
+    "LessonPlan": ("lessonplan", lambda o: (
+        f"{o.strand} - {o.sub_strand}",
+        "\n".join(filter(None, (
+            o.general_outcome, o.specific_outcome1, o.specific_outcome2, o.specific_outcome3,
+            o.enquiry_question, o.introduction, o.lesson_development, o.conclusion, o.reflection,
+        ))),
+        None, o.teacher_id,
+    )),
+}
+
+
+def populate_search_entries(apps, schema_editor):
+    SearchEntry = apps.get_model("lessons", "SearchEntry")
+    for name, (resource, fields) in _DOCUMENTS.items():
+        batch = []
+        for instance in apps.get_model("lessons", name).objects.order_by("pk").iterator(chunk_size=1000):
+            title, body, parent_id, owner_id = fields(instance)
+            batch.append(SearchEntry(
+                resource=resource, object_id=instance.pk, parent_id=parent_id, owner_id=owner_id, title=title,
+                body=body, title_terms=_index_terms(title), body_terms=_index_terms(body),
+            ))
+            if len(batch) >= 1000:
+                SearchEntry.objects.bulk_create(batch)
+                batch = []
+        SearchEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0018_submission_media'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('parent_id', models.BigIntegerField(blank=True, null=True)),
+                ('title', models.TextField()),
+                ('body', models.TextField(blank=True)),
+                ('title_terms', models.TextField(blank=True)),
+                ('body_terms', models.TextField(blank=True)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('resource', 'object_id'), name='search_entry_resource_object_uniq')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_search_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:56
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+_APOSTROPHES = re.compile(r"['‘’`ʼ]")
+
+
+def _normalize_name(name):
+    # Frozen copy of lessons.roster.normalize_name.
+    name = unicodedata.normalize("NFKD", name or "")
+    name = "".join(ch for ch in name if not unicodedata.combining(ch)).casefold()
+    name = _APOSTROPHES.sub("", name)  # Ng'ang'a and Nganga are the same name
+    return " ".join(sorted(re.sub(r"[^\w\s]", " ", name).split()))
+
+
+def populate_name_keys(apps, schema_editor):
+    Student = apps.get_model("lessons", "Student")
+    students = list(Student.objects.only("id", "full_name"))
+    for student in students:
+        student.name_key = _normalize_name(student.full_name)
+    Student.objects.bulk_update(students, ["name_key"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0020_regrade_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=150),
+        ),
+        migrations.RunPython(populate_name_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:57
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def unlink_duplicate_results(apps, schema_editor):
+    # Keep the newest result linked; older duplicates keep their student_name and become unlinked.
+    # roster.link_results reports them as duplicates rather than matching them back onto the student.
+    Result = apps.get_model("lessons", "Result")
+    duplicates = (
+        Result.objects.filter(student__isnull=False).values("test", "student")
+        .annotate(count=Count("id"), newest=Max("id")).filter(count__gt=1)
+    )
+    for row in duplicates:
+        Result.objects.filter(test=row["test"], student=row["student"], id__lt=row["newest"]).update(student=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0021_student_name_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(unlink_duplicate_results, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='result',
+            constraint=models.UniqueConstraint(fields=('test', 'student'), name='result_test_student_uniq'),
+        ),
+    ]
@@ -4,6 +4,7 @@ import datetime
 from datetime import date
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.utils import timezone
 import jsonfield
 
 # -------------------------
@@ -20,10 +21,19 @@ class Student(models.Model):
     full_name = models.CharField(max_length=100)
     enrolled_class = models.CharField(max_length=20)
     gender = models.CharField(max_length=10, default="Unknown")
+    # full_name reduced by lessons.roster.normalize_name, for exact indexed name matching
+    name_key = models.CharField(max_length=150, blank=True, db_index=True, editable=False)
 
     def __str__(self):
         return self.full_name
 
+    def save(self, *args, **kwargs):
+        from .roster import normalize_name
+        self.name_key = normalize_name(self.full_name)
+        if kwargs.get("update_fields") is not None and "full_name" in kwargs["update_fields"]:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "name_key"}
+        super().save(*args, **kwargs)
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     role = models.CharField(max_length=20, choices=Role.choices)
@@ -37,7 +47,8 @@ class Profile(models.Model):
 # -------------------------
 class Strand(models.Model):
     name = models.CharField(max_length=120)
-    grade = models.CharField(max_length=10, default="PP2")
+    grade = models.CharField(max_length=10, default="PP2", db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.grade} - {self.name}"
@@ -45,6 +56,7 @@ class Strand(models.Model):
 class SubStrand(models.Model):
     strand = models.ForeignKey(Strand, on_delete=models.CASCADE, related_name="sub_strands")
     name = models.CharField(max_length=120)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.strand.grade} - {self.strand.name} - {self.name}"
@@ -59,10 +71,28 @@ class Lesson(models.Model):
     objective = models.TextField(blank=True)
     content = models.JSONField(default=dict)
     is_active = models.BooleanField(default=True)
+    content_version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # Partial rather than (is_active, date): boolean filters compile to a bare
+        # "WHERE is_active", which only a matching partial index can serve.
+        indexes = [models.Index(fields=["date"], condition=models.Q(is_active=True), name="lesson_active_date_idx")]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Every save bumps content_version, which clients validate against via ETags.
+        bump = not self._state.adding
+        if bump:
+            self.content_version = models.F("content_version") + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "content_version"}
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=["content_version"])
+
 # -------------------------
 # Questions
 # -------------------------
@@ -80,6 +110,7 @@ class Question(models.Model):
     data = models.JSONField(default=dict)
     marks = models.PositiveIntegerField(default=1)
     order = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.lesson.title} - {self.qtype}"
@@ -93,6 +124,7 @@ class Assignment(models.Model):
     title = models.CharField(max_length=160)
     instructions = models.TextField(blank=True)
     due_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.title} ({self.lesson.title})"
@@ -107,11 +139,55 @@ class Submission(models.Model):
     answers = models.JSONField(default=dict)
     score = models.FloatField(default=0)
     total = models.FloatField(default=0)
+    extra_score = models.FloatField(default=0)  # marks added by the teacher on top of auto-grading
     feedback = models.TextField(blank=True)
     graded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="graded")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="submission_created_id_idx"),
+            models.Index(fields=["student", "lesson"], name="submission_student_lesson_idx"),
+            models.Index(fields=["lesson", "created_at"], name="submission_lesson_created_idx"),
+        ]
+
+class RegradeJob(models.Model):
+    """
+    A background regrade of a lesson's submissions (see lessons/grading.py).
+
+    Kept in the database rather than the cache so every worker process sees
+    the job a teacher started, and at most one per lesson can be pending.
+    """
+    class Status(models.TextChoices):
+        QUEUED = "queued", _("Queued")
+        RUNNING = "running", _("Running")
+        DONE = "done", _("Done")
+        FAILED = "failed", _("Failed")
+
+    PENDING = (Status.QUEUED, Status.RUNNING)
+
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="regrade_jobs")
+    question = models.ForeignKey(Question, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    processed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    changed = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["lesson"], condition=models.Q(status__in=["queued", "running"]),
+                name="regrade_job_one_pending_per_lesson",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.lesson_id} regrade ({self.status})"
+
 # -------------------------
 # Progress
 # -------------------------
@@ -123,6 +199,36 @@ class Progress(models.Model):
     last_step = models.PositiveIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["student", "lesson"], name="progress_student_lesson_uniq")]
+
+class SubmissionMedia(models.Model):
+    """Audio or image answer to an oral/upload question, uploaded in chunks (see lessons/media.py)."""
+    class Status(models.TextChoices):
+        UPLOADING = "uploading", _("Uploading")
+        PROCESSING = "processing", _("Processing")
+        READY = "ready", _("Ready")
+        FAILED = "failed", _("Failed")
+
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name="submission_media")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="media")
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, null=True, blank=True, related_name="media")
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField()  # declared by the client up front
+    received = models.PositiveBigIntegerField(default=0)
+    file = models.FileField(upload_to="submissions/", max_length=255, blank=True)
+    derived = models.FileField(upload_to="submissions/", max_length=255, blank=True)  # thumbnail or transcode
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.UPLOADING)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["student", "question"], name="submission_media_student_idx")]
+
+    def __str__(self):
+        return f"{self.student} - question {self.question_id} ({self.status})"
+
 # -------------------------
 # Tests & Results
 # -------------------------
@@ -132,17 +238,29 @@ class Test(models.Model):
     total_marks = models.PositiveIntegerField(default=0)
     date = models.DateField()
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.title
 
 class Result(models.Model):
     test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name="results")
-    student_name = models.CharField(max_length=255)
+    student = models.ForeignKey(Student, on_delete=models.SET_NULL, null=True, blank=True, related_name="results")
+    student_name = models.CharField(max_length=255)  # as written on the paper; kept when unmatched
     score = models.FloatField(default=0)
     feedback = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="result_created_id_idx"),
+            models.Index(fields=["student", "created_at"], name="result_student_created_idx"),
+        ]
+        constraints = [
+            # Unlinked results (no student) may repeat; a linked student has one result per test.
+            models.UniqueConstraint(fields=["test", "student"], name="result_test_student_uniq"),
+        ]
+
     def __str__(self):
         return f"{self.student_name} - {self.test.title}"
 
@@ -163,10 +281,36 @@ class Attendance(models.Model):
 
     class Meta:
         unique_together = ("student", "date")
+        indexes = [
+            models.Index(fields=["date", "id"], name="attendance_date_id_idx"),
+            models.Index(fields=["date", "status"], name="attendance_date_status_idx"),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.date} - {self.status}"
 
+
+class AttendanceRollup(models.Model):
+    """One student's attendance for one month, kept current by signals (see lessons/attendance.py)."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="attendance_rollups")
+    month = models.DateField()  # first day of the month
+    days = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    lead_absent = models.PositiveIntegerField(default=0)  # absences opening the month
+    trail_absent = models.PositiveIntegerField(default=0)  # absences closing the month
+    longest_absent = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["student", "month"], name="attendance_rollup_student_month_uniq"),
+        ]
+        indexes = [models.Index(fields=["month", "student"], name="attendance_rollup_month_idx")]
+
+    def __str__(self):
+        return f"{self.student} - {self.month:%Y-%m}"
+
 # -------------------------
 # Lesson Plans
 # -------------------------
@@ -189,13 +333,251 @@ class LessonPlan(models.Model):
     def __str__(self):
         return f"{self.strand} - {self.sub_strand} ({self.teacher.email})"
 
+# -------------------------
+# Change feed
+# -------------------------
+class Tombstone(models.Model):
+    """A deleted content row, reported by the change feed (see lessons/changes.py)."""
+    resource = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.resource} #{self.object_id}"
+
+# -------------------------
+# Dashboard counters
+# -------------------------
+class DashboardCounter(models.Model):
+    """Row counts per grade, kept current by signals (see lessons/counters.py)."""
+    grade = models.CharField(max_length=10, unique=True)  # "" holds school-wide counts
+    lessons = models.IntegerField(default=0)
+    active_lessons = models.IntegerField(default=0)
+    questions = models.IntegerField(default=0)
+    tests = models.IntegerField(default=0)
+    results = models.IntegerField(default=0)
+    teachers = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.grade or "school-wide"
+
+# -------------------------
+# Search
+# -------------------------
+class SearchEntry(models.Model):
+    """
+    Searchable text of one lesson, question, lesson plan, strand or sub-strand (see lessons/search.py).
+
+    The full-text index over ``title_terms``/``body_terms`` is created by
+    migration 0019 (FTS5 table and triggers on SQLite, GIN index on
+    PostgreSQL). SQLite drops the triggers when Django rebuilds this table,
+    so a migration altering it must recreate them.
+    """
+    resource = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    parent_id = models.BigIntegerField(null=True, blank=True)  # a question's lesson, a sub-strand's strand
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="+")  # private entries
+    title = models.TextField()
+    body = models.TextField(blank=True)
+    title_terms = models.TextField(blank=True)
+    body_terms = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["resource", "object_id"], name="search_entry_resource_object_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} {self.object_id}"
+
 # -------------------------
 # Signals: Auto-create profile
 # -------------------------
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created and not hasattr(instance, "profile"):
         Profile.objects.create(user=instance, role=Role.STUDENT)
+
+
+# -------------------------
+# Signals: Lesson content version
+# -------------------------
+@receiver([post_save, post_delete], sender=Question)
+def bump_lesson_content_version(sender, instance, **kwargs):
+    Lesson.objects.filter(pk=instance.lesson_id).update(
+        content_version=models.F("content_version") + 1, updated_at=timezone.now(),
+    )
+
+
+# -------------------------
+# Signals: Dashboard counters
+# -------------------------
+@receiver(pre_save, sender=Lesson)
+@receiver(pre_save, sender=Question)
+@receiver(pre_save, sender=Test)
+@receiver(pre_save, sender=Result)
+@receiver(pre_save, sender=Profile)
+@receiver(pre_save, sender=Strand)
+def capture_counter_contribution(sender, instance, raw=False, **kwargs):
+    from . import counters
+    if not raw:
+        counters.capture(instance)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Test)
+@receiver(post_save, sender=Result)
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=Strand)
+def update_counters_on_save(sender, instance, raw=False, **kwargs):
+    from . import counters
+    if raw:
+        counters.schedule_rebuild()
+    else:
+        counters.saved(instance)
+
+
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Test)
+@receiver(post_delete, sender=Result)
+@receiver(post_delete, sender=Profile)
+def update_counters_on_delete(sender, instance, **kwargs):
+    from . import counters
+    counters.deleted(instance)
+
+
+# -------------------------
+# Signals: Change-feed tombstones
+# -------------------------
+FEED_RESOURCES = {
+    Strand: "strands",
+    SubStrand: "sub-strands",
+    Lesson: "lessons",
+    Question: "questions",
+    Assignment: "assignments",
+    Test: "tests",
+}
+
+
+@receiver(post_delete, sender=Strand)
+@receiver(post_delete, sender=SubStrand)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_delete, sender=Test)
+def record_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(resource=FEED_RESOURCES[sender], object_id=instance.pk)
+
+
+@receiver(pre_save, sender=Strand)
+@receiver(pre_save, sender=SubStrand)
+@receiver(pre_save, sender=Lesson)
+@receiver(pre_save, sender=Question)
+@receiver(pre_save, sender=Assignment)
+@receiver(pre_save, sender=Test)
+def stamp_fixture_updated_at(sender, instance, raw=False, **kwargs):
+    # Raw (fixture) saves skip auto_now, and fixtures predate updated_at.
+    if raw and instance.updated_at is None:
+        instance.updated_at = timezone.now()
+
+
+# -------------------------
+# Signals: Attendance rollups
+# -------------------------
+@receiver(pre_save, sender=Attendance)
+def capture_attendance_month(sender, instance, raw=False, **kwargs):
+    # A correction may move a row to another student or month; both need refreshing.
+    instance._rollup_previous = (
+        Attendance.objects.filter(pk=instance.pk).values_list("student_id", "date").first()
+        if instance.pk and not raw else None
+    )
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def refresh_attendance_rollup(sender, instance, origin=None, **kwargs):
+    from .attendance import refresh_rollups
+    if isinstance(origin, Student) or getattr(origin, "model", None) is Student:
+        return  # the student's rollups are being deleted with it
+    pairs = {(instance.student_id, instance.date)}
+    if getattr(instance, "_rollup_previous", None):
+        pairs.add(instance._rollup_previous)
+    refresh_rollups(pairs)
+
+
+# -------------------------
+# Signals: Token revocation
+# -------------------------
+# What tokens depend on: their role and school claims, and the account being active.
+REVOCATION_FIELDS = {User: ("is_active",), Profile: ("role", "school")}
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Profile)
+def capture_token_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    fields = REVOCATION_FIELDS[sender]
+    watched = instance.pk and not raw and (update_fields is None or set(update_fields) & set(fields))
+    instance._revocation_previous = (
+        sender.objects.filter(pk=instance.pk).values_list(*fields).first() if watched else None
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def revoke_stale_tokens(sender, instance, created, raw=False, **kwargs):
+    # Earlier tokens must not outlive a role, school or activation change; other edits keep sessions.
+    from .authentication import revoke_tokens
+    previous = getattr(instance, "_revocation_previous", None)
+    if created or raw or previous is None:
+        return
+    if previous != tuple(getattr(instance, field) for field in REVOCATION_FIELDS[sender]):
+        revoke_tokens(instance.pk if sender is User else instance.user_id)
+
+
+# -------------------------
+# Signals: Catalog cache
+# -------------------------
+@receiver([post_save, post_delete], sender=Strand)
+@receiver([post_save, post_delete], sender=SubStrand)
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    from .catalog import invalidate
+    invalidate(sender.__name__)
+
+
+# -------------------------
+# Signals: Submission media files
+# -------------------------
+@receiver(post_delete, sender=SubmissionMedia)
+def delete_submission_media_files(sender, instance, **kwargs):
+    from .media import delete_files
+    delete_files(instance)
+
+
+# -------------------------
+# Signals: Search index
+# -------------------------
+@receiver(post_save, sender=Strand)
+@receiver(post_save, sender=SubStrand)
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=LessonPlan)
+def update_search_entry(sender, instance, **kwargs):
+    from .search import index
+    index(instance)
+
+
+@receiver(post_delete, sender=Strand)
+@receiver(post_delete, sender=SubStrand)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=LessonPlan)
+def remove_search_entry(sender, instance, **kwargs):
+    from .search import remove
+    remove(instance)
@@ -0,0 +1,166 @@
+"""
+Offline lesson packs.
+
+A pack is a zip with everything a tablet needs to run a grade's or a class's
+lessons without the API: lessons with their questions, the strand /
+sub-strand tree, the media files they reference and a manifest of SHA-256
+content hashes. Packs are stored under ``MEDIA_ROOT/packs`` and named after
+a fingerprint of the rows written into them (the lessons, and every strand
+and sub-strand of the curriculum tree), so a pack is only rebuilt when one
+of those changes.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import zipfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Lesson, Question, Strand
+from .serializers import LessonSerializer, StrandSerializer, SubStrandSerializer
+
+PACK_FORMAT = 1
+PACK_DIR = "packs"
+MEDIA_KEYS = ("image", "audio", "video")
+
+
+def pack_lessons(grade=None, class_name=None):
+    qs = Lesson.objects.filter(is_active=True)
+    if grade:
+        qs = qs.filter(strand__grade=grade)
+    if class_name:
+        qs = qs.filter(class_name=class_name)
+    return qs.order_by("id")
+
+
+def pack_fingerprint(lessons):
+    """
+    Hash of everything that ends up in the pack, from two narrow queries.
+
+    ``curriculum.json`` lists every sub-strand of each included strand, not
+    only those with a lesson in the pack, so the whole tree is hashed.
+    """
+    rows = list(lessons.values_list(
+        "id", "content_version", "updated_at", "strand_id", "strand__name", "sub_strand_id", "sub_strand__name",
+    ))
+    curriculum = list(
+        Strand.objects.filter(id__in=lessons.values("strand_id"))
+        .order_by("id", "sub_strands__id")
+        .values_list("id", "name", "grade", "updated_at", "sub_strands__id", "sub_strands__name", "sub_strands__updated_at")
+    )
+    return _sha256(json.dumps([PACK_FORMAT, rows, curriculum], default=str).encode())[:20]
+
+
+def pack_name(grade=None, class_name=None):
+    parts = [f"grade-{grade}" if grade else "", f"class-{class_name}" if class_name else ""]
+    return slugify("-".join(p for p in parts if p)) or "all"
+
+
+def get_or_build_pack(grade=None, class_name=None, fingerprint=None):
+    """
+    Return ``(path, fingerprint)`` of the current pack, building it if needed.
+
+    Callers that already computed ``pack_fingerprint`` (to answer a
+    conditional request first) pass it in to skip the query.
+    """
+    lessons = pack_lessons(grade, class_name)
+    fingerprint = fingerprint or pack_fingerprint(lessons)
+    name = pack_name(grade, class_name)
+    directory = Path(settings.MEDIA_ROOT) / PACK_DIR
+    path = directory / f"{name}-{fingerprint}.zip"
+    if not path.exists():
+        directory.mkdir(parents=True, exist_ok=True)
+        build_pack(lessons, path, scope={"grade": grade, "class_name": class_name}, fingerprint=fingerprint)
+        # Only this scope's packs: a plain "grade-pp2-*" glob would also match "grade-pp2-class-*".
+        own = re.compile(rf"^{re.escape(name)}-[0-9a-f]{{20}}\.zip$")
+        for stale in directory.iterdir():
+            if stale != path and own.match(stale.name):
+                stale.unlink(missing_ok=True)
+    return path, fingerprint
+
+
+def build_pack(lessons, path, scope, fingerprint):
+    lessons = list(
+        lessons.select_related("strand", "sub_strand")
+        .prefetch_related(Prefetch("questions", queryset=Question.objects.order_by("order", "id")))
+    )
+    lesson_data = LessonSerializer(lessons, many=True).data
+    strands = (
+        Strand.objects.filter(id__in={lesson.strand_id for lesson in lessons})
+        .prefetch_related("sub_strands").order_by("id")
+    )
+    curriculum = [
+        {**StrandSerializer(strand).data, "sub_strands": SubStrandSerializer(strand.sub_strands.all(), many=True).data}
+        for strand in strands
+    ]
+
+    media = {}
+    for reference in sorted(_media_references(lesson_data)):
+        source = (Path(settings.MEDIA_ROOT) / reference).resolve()
+        if source.is_file() and Path(settings.MEDIA_ROOT).resolve() in source.parents:
+            media[reference] = source
+
+    manifest = {
+        "format": PACK_FORMAT,
+        "scope": scope,
+        "fingerprint": fingerprint,
+        "generated_at": timezone.now().isoformat(),
+        "lessons": {
+            str(item["id"]): {"version": item["content_version"], "sha256": _sha256(_canonical(item))}
+            for item in lesson_data
+        },
+        "curriculum_sha256": _sha256(_canonical(curriculum)),
+        "media": {},
+    }
+
+    # Write next to the target and rename, so readers never see a partial pack.
+    handle, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+    os.close(handle)
+    try:
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as pack:
+            pack.writestr("lessons.json", _canonical(lesson_data))
+            pack.writestr("curriculum.json", _canonical(curriculum))
+            for reference, source in media.items():
+                # Images and audio are already compressed.
+                pack.write(source, f"media/{reference}", compress_type=zipfile.ZIP_STORED)
+                manifest["media"][reference] = _file_sha256(source)
+            pack.writestr("manifest.json", json.dumps(manifest, indent=2))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return manifest
+
+
+def _media_references(value, key=None):
+    """Yield media file names referenced anywhere in lesson content or question data."""
+    if isinstance(value, dict):
+        for k, v in value.items():
+            yield from _media_references(v, k)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _media_references(v, key)
+    elif isinstance(value, str) and key in MEDIA_KEYS and value and "://" not in value:
+        yield value.lstrip("/").removeprefix(settings.MEDIA_URL.lstrip("/"))
+
+
+def _canonical(data):
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,100 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on a composite key such as ``(created_at, id)``.
+
+    DRF's ``CursorPagination`` positions on the first ordering field only and
+    steps over ties with OFFSET, which degrades on dates shared by a whole
+    class register. Here the cursor carries every key value of the boundary
+    row, so each page is one range scan on the matching index and page N
+    costs the same as page 1. No ``COUNT(*)`` is issued.
+    """
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(self.ordering)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = bool(self.cursor and self.cursor.reverse)
+        ordering = tuple(o[1:] if o.startswith("-") else f"-{o}" for o in self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        try:
+            if self.cursor and self.cursor.position is not None:
+                queryset = queryset.filter(self._after(ordering, self.cursor.position))
+            results = list(queryset[:self.page_size + 1])
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        self.display_page_controls = self.template is not None and (self.has_next or self.has_previous)
+        return self.page
+
+    def _after(self, ordering, position):
+        """
+        Q selecting rows strictly after ``position`` in ``ordering``.
+
+        The OR chain alone is not sargable on most planners, so it is ANDed
+        with an inclusive bound on the leading key, which gives the index a
+        range to seek into; the chain then only sorts out the ties.
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        leading = ordering[0]
+        bound = Q(**{f"{leading.lstrip('-')}__{'lte' if leading.startswith('-') else 'gte'}": values[0]})
+        condition = Q(pk__in=[])
+        for depth, order in enumerate(ordering):
+            field = order.lstrip("-")
+            lookup = "lt" if order.startswith("-") else "gt"
+            equal = {other.lstrip("-"): value for other, value in zip(ordering[:depth], values)}
+            condition |= Q(**equal, **{f"{field}__{lookup}": values[depth]})
+        return bound & condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            value = getattr(instance, order.lstrip("-"))
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return json.dumps(values)
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+
+class DateKeysetPagination(KeysetPagination):
+    ordering = ("-date", "-id")
+
+
+class IdKeysetPagination(KeysetPagination):
+    ordering = ("-id",)
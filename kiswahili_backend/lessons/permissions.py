@@ -1,9 +1,20 @@
 from rest_framework.permissions import BasePermission
 
+
+def request_role(request):
+    """The caller's role, from the access token's claims when present, else from their profile."""
+    token = getattr(request, "auth", None)
+    role = token.get("role") if hasattr(token, "get") else None
+    if role is None:
+        profile = getattr(request.user, "profile", None)
+        role = profile.role if profile else None
+    return role
+
+
 class IsTeacher(BasePermission):
     def has_permission(self, request, view):
-        return bool(request.user and hasattr(request.user, "profile") and request.user.profile.role == "teacher")
+        return bool(request.user and request_role(request) == "teacher")
 
 class IsStudent(BasePermission):
     def has_permission(self, request, view):
-        return bool(request.user and hasattr(request.user, "profile") and request.user.profile.role == "student")
+        return bool(request.user and request_role(request) == "student")
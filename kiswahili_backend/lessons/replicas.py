@@ -0,0 +1,136 @@
+"""
+Read-replica routing.
+
+When a ``replica`` database is configured, ``ReplicaRoutingMiddleware`` marks
+safe requests to read-heavy routes (lists, dashboards, reports, exports) and
+``ReplicaRouter`` sends their reads to the replica. Everything else, every
+write, and every read inside a transaction on ``default`` uses ``default``.
+
+After a client writes (any unsafe request), its reads stay on the primary
+for ``DATABASE_REPLICA_STICKY_SECONDS`` so it sees its own changes despite
+replication lag. Clients are told apart by user id, taken from the bearer
+token before DRF authenticates the request (so every token and device of a
+user shares the flag), or by address when anonymous.
+
+Routes are matched on their URL name (``fnmatch`` patterns). The change feed
+and the cached catalog lists stay on the primary: the feed's watermark comes
+from the clock and would skip rows not yet replicated, and a catalog entry
+filled from a lagging replica would stay stale until the next change.
+"""
+import contextvars
+from fnmatch import fnmatchcase
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = "replica"
+DEFAULT_READ_ROUTES = (
+    "*-list", "*-pp2*", "dashboard-data", "teacher-dashboard-stats",
+    "gradebook-*", "attendance-register", "attendance-analytics", "student-results",
+)
+DEFAULT_PRIMARY_ROUTES = (
+    "changes-list", "me-list",
+    # Cached catalog responses: filling the cache from a lagging replica would
+    # pin stale data until the next change.
+    "strand-list", "substrand-list", "lesson-pp2-lessons",
+)
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_use_replica = contextvars.ContextVar("use_replica", default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def _user_id(request):
+    """The requesting user's id; DRF has not authenticated yet, so read the bearer token."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    from rest_framework_simplejwt.exceptions import InvalidToken
+    from rest_framework_simplejwt.settings import api_settings
+    from .authentication import ClaimsJWTAuthentication
+
+    auth = ClaimsJWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = header and auth.get_raw_token(header)
+    if not raw_token:
+        return None
+    try:
+        return auth.get_validated_token(raw_token)[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, KeyError):
+        return None
+
+
+def _client_key(request):
+    user_id = _user_id(request)
+    if user_id is not None:
+        return f"db-sticky:user:{user_id}"
+    return f"db-sticky:addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _matches(name, patterns):
+    return any(fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def wants_replica(request):
+    match = request.resolver_match
+    name = match.url_name if match else None
+    if request.method not in SAFE_METHODS or not name:
+        return False
+    if _matches(name, getattr(settings, "DATABASE_REPLICA_PRIMARY_ROUTES", DEFAULT_PRIMARY_ROUTES)):
+        return False
+    if not _matches(name, getattr(settings, "DATABASE_REPLICA_READ_ROUTES", DEFAULT_READ_ROUTES)):
+        return False
+    return not cache.get(_client_key(request))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Inside a transaction the reads must see its own uncommitted writes.
+        if _use_replica.get() and replica_configured() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return REPLICA
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # the replica holds the same rows
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA  # the replica gets its schema through replication
+
+
+def _on_replica(content):
+    # Streamed exports run their queries while the response is being sent.
+    token = _use_replica.set(True)
+    try:
+        yield from content
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.use_replica = False
+        token = _use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        if request.use_replica and getattr(response, "streaming", False):
+            response.streaming_content = _on_replica(response.streaming_content)
+        if request.method not in SAFE_METHODS and response.status_code < 500 and replica_configured():
+            cache.set(_client_key(request), True, getattr(settings, "DATABASE_REPLICA_STICKY_SECONDS", 5))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if replica_configured() and wants_replica(request):
+            request.use_replica = True
+            _use_replica.set(True)
@@ -0,0 +1,168 @@
+"""
+Reporting queries and streamed CSV exports.
+
+Aggregation happens in the database. Exports are generated row by row from
+``iterator()`` querysets into a ``StreamingHttpResponse``, so memory stays
+flat however large the class or date range is.
+"""
+import csv
+import datetime
+from itertools import chain, groupby
+
+from django.db.models import Avg, Count, FilteredRelation, Q, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+from .models import Result, Student, Submission
+
+GRADEBOOK_COLUMNS = (
+    "source", "student_id", "student", "strand_id", "strand", "sub_strand_id", "sub_strand",
+    "attempts", "score", "total", "average", "percent",
+)
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows, filename):
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in chain([header], rows)), content_type="text/csv",
+    )
+    # Class names are free text; quotes or non-ASCII must not break the header.
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    return response
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def gradebook_querysets(class_name, start=None, end=None):
+    """
+    Per student, strand and sub-strand totals for a class.
+
+    Returns two aggregated querysets: submissions (grouped by the submitting
+    user) and paper-test results (grouped by the recorded student name).
+    """
+    submissions = Submission.objects.filter(lesson__class_name=class_name)
+    results = Result.objects.filter(test__lesson__class_name=class_name)
+    if start:
+        submissions = submissions.filter(created_at__gte=_day_start(start))
+        results = results.filter(test__date__gte=start)
+    if end:
+        submissions = submissions.filter(created_at__lt=_day_start(end + datetime.timedelta(days=1)))
+        results = results.filter(test__date__lte=end)
+
+    submissions = (
+        submissions.values(
+            "student_id", "student__username",
+            "lesson__strand_id", "lesson__strand__name", "lesson__sub_strand_id", "lesson__sub_strand__name",
+        )
+        .annotate(attempts=Count("id"), score_sum=Sum("score"), total_sum=Sum("total"), average=Avg("score"))
+        .order_by("student__username", "student_id", "lesson__strand__name", "lesson__sub_strand__name")
+    )
+    results = (
+        results.values(
+            "student_name",
+            "test__lesson__strand_id", "test__lesson__strand__name",
+            "test__lesson__sub_strand_id", "test__lesson__sub_strand__name",
+        )
+        .annotate(attempts=Count("id"), score_sum=Sum("score"), total_sum=Sum("test__total_marks"), average=Avg("score"))
+        .order_by("student_name", "test__lesson__strand__name", "test__lesson__sub_strand__name")
+    )
+    return submissions, results
+
+
+def _row(source, student_id, student, strand_id, strand, sub_strand_id, sub_strand, agg):
+    total = agg["total_sum"] or 0
+    score = agg["score_sum"] or 0
+    return {
+        "source": source,
+        "student_id": student_id,
+        "student": student,
+        "strand_id": strand_id,
+        "strand": strand,
+        "sub_strand_id": sub_strand_id,
+        "sub_strand": sub_strand,
+        "attempts": agg["attempts"],
+        "score": score,
+        "total": total,
+        "average": round(agg["average"] or 0, 2),
+        "percent": round(score * 100 / total, 1) if total else None,
+    }
+
+
+def gradebook_rows(class_name, start=None, end=None):
+    """Yield gradebook rows, submissions first, streaming from the database."""
+    submissions, results = gradebook_querysets(class_name, start, end)
+    for agg in submissions.iterator():
+        yield _row(
+            "submission", agg["student_id"], agg["student__username"],
+            agg["lesson__strand_id"], agg["lesson__strand__name"],
+            agg["lesson__sub_strand_id"], agg["lesson__sub_strand__name"], agg,
+        )
+    for agg in results.iterator():
+        yield _row(
+            "result", None, agg["student_name"],
+            agg["test__lesson__strand_id"], agg["test__lesson__strand__name"],
+            agg["test__lesson__sub_strand_id"], agg["test__lesson__sub_strand__name"], agg,
+        )
+
+
+# -------------------------
+# Attendance register
+# -------------------------
+REGISTER_CODES = {"present": "P", "absent": "A", "late": "L"}
+
+
+def school_days(start, end):
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            yield day
+        day += datetime.timedelta(days=1)
+
+
+def attendance_register(start, end, class_name=None):
+    """
+    Return ``(header, rows)`` for a register: one row per student, one column per school day.
+
+    Rows come from a single ordered query (students LEFT JOIN their
+    attendance in the window) consumed with ``iterator()`` and grouped on
+    the fly, so only one student's marks are held at a time. Without a
+    class the whole school is exported, class by class. Marks on weekends
+    have no column and are left out of the totals too.
+    """
+    days = list(school_days(start, end))
+    columns = set(days)
+    header = ["class", "student_id", "student", *[day.isoformat() for day in days], "present", "absent", "late"]
+
+    students = Student.objects.all()
+    if class_name:
+        students = students.filter(enrolled_class=class_name)
+    marks = (
+        students.annotate(period=FilteredRelation("attendance", condition=Q(attendance__date__range=(start, end))))
+        .order_by("enrolled_class", "full_name", "id", "period__date")
+        .values_list("enrolled_class", "id", "full_name", "period__date", "period__status")
+        .iterator()
+    )
+
+    def rows():
+        for (enrolled_class, student_id, name), records in groupby(marks, key=lambda r: r[:3]):
+            statuses = {day: status for *_, day, status in records if day in columns}
+            counts = {status: 0 for status in REGISTER_CODES}
+            for status in statuses.values():
+                counts[status] = counts.get(status, 0) + 1
+            yield [
+                enrolled_class, student_id, name,
+                *[REGISTER_CODES.get(statuses.get(day), "") for day in days],
+                counts["present"], counts["absent"], counts["late"],
+            ]
+
+    return header, rows()
@@ -0,0 +1,112 @@
+"""
+Matching free-text student names to ``Student`` rows.
+
+Paper results carry names as a teacher wrote them: different case, stray
+punctuation, missing accents, or given and family name swapped. Names are
+reduced to a key (casefolded, accents, apostrophes and punctuation
+removed, tokens sorted) and matched within the class the test was set for,
+falling back to the whole school when the key is unique there. Ambiguous
+keys are never guessed.
+
+``Student.name_key`` stores each name's key, so a single name is matched
+with an exact index lookup; rosters loaded in bulk recompute keys in Python.
+"""
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .models import Result, Student
+
+LINK_BATCH_SIZE = 1000
+
+MATCHED, UNKNOWN, AMBIGUOUS = "matched", "unknown", "ambiguous"
+DUPLICATE = "duplicate"  # matched, but the student already has a result for that test
+
+_APOSTROPHES = re.compile(r"['‘’`ʼ]")
+
+
+def normalize_name(name):
+    name = unicodedata.normalize("NFKD", name or "")
+    name = "".join(ch for ch in name if not unicodedata.combining(ch)).casefold()
+    name = _APOSTROPHES.sub("", name)  # Ng'ang'a and Nganga are the same name
+    return " ".join(sorted(re.sub(r"[^\w\s]", " ", name).split()))
+
+
+class Roster:
+    """Name lookups over a set of students, loaded with one query."""
+
+    def __init__(self, students=None):
+        students = Student.objects.all() if students is None else students
+        self.by_class = defaultdict(list)
+        self.school = defaultdict(list)
+        for student_id, full_name, enrolled_class in students.values_list("id", "full_name", "enrolled_class"):
+            key = normalize_name(full_name)
+            self.by_class[(enrolled_class, key)].append(student_id)
+            self.school[key].append(student_id)
+
+    def match(self, name, class_name=None):
+        """Return ``(student_id, outcome)``; ``student_id`` is None unless matched."""
+        key = normalize_name(name)
+        candidates = self.by_class.get((class_name, key)) if class_name else None
+        if not candidates:
+            candidates = self.school.get(key, [])
+        if len(candidates) == 1:
+            return candidates[0], MATCHED
+        return None, AMBIGUOUS if candidates else UNKNOWN
+
+
+def match_student(name, class_name=None):
+    """Match a single name, loading only the students with the same key (an indexed lookup)."""
+    key = normalize_name(name)
+    if not key:
+        return None
+    student_id, _ = Roster(Student.objects.filter(name_key=key)).match(name, class_name)
+    return student_id
+
+
+def link_results(batch_size=LINK_BATCH_SIZE, dry_run=False, progress=None):
+    """
+    Set ``Result.student`` on unlinked results by matching ``student_name``.
+
+    Results are read in id order in batches and written with one
+    ``bulk_update`` per batch. A match is skipped as ``DUPLICATE`` when
+    the student already holds a result for that test, whether stored or
+    matched earlier in the run, so the ``(test, student)`` constraint holds.
+    Returns ``(linked, unmatched)`` where ``unmatched`` counts
+    ``(student_name, class_name, outcome)``.
+    """
+    roster = Roster()
+    linked, unmatched, last_id = 0, Counter(), 0
+    taken = set()
+    while True:
+        batch = list(
+            Result.objects.filter(student__isnull=True, id__gt=last_id)
+            .order_by("id").values_list("id", "test_id", "student_name", "test__lesson__class_name")[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        matches = [(row, *roster.match(row[2], row[3])) for row in batch]
+        candidates = {student_id for _, student_id, _ in matches if student_id is not None}
+        taken.update(
+            Result.objects.filter(test_id__in={row[1] for row in batch}, student_id__in=candidates)
+            .values_list("test_id", "student_id")
+        )
+        updates = []
+        for (result_id, test_id, name, class_name), student_id, outcome in matches:
+            if student_id is not None and (test_id, student_id) in taken:
+                student_id, outcome = None, DUPLICATE
+            if student_id is None:
+                unmatched[(name, class_name, outcome)] += 1
+            else:
+                taken.add((test_id, student_id))
+                updates.append(Result(id=result_id, student_id=student_id))
+        if updates and not dry_run:
+            with transaction.atomic():
+                Result.objects.bulk_update(updates, ["student"])
+        linked += len(updates)
+        if progress:
+            progress(linked, sum(unmatched.values()))
+    return linked, unmatched
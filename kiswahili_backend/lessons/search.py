@@ -0,0 +1,244 @@
+"""
+Full-text search over lessons, questions, lesson plans, strands and sub-strands.
+
+Each searchable row has a ``SearchEntry`` with its display text and its
+index terms: every word casefolded, with accents and apostrophes removed
+(``ng'ombe`` becomes ``ngombe``), followed by its stem when a Kiswahili
+noun-class or infinitive prefix can be stripped: ``kitabu`` and ``vitabu``
+both give ``tabu``, ``mtoto`` and ``watoto`` give ``toto``, ``kusoma`` gives
+``soma``. The stemmer is deliberately light (no lexicon) and only strips
+when at least three letters remain. Queries are reduced the same way and
+every word matches as a prefix, so a half-typed word already finds results.
+
+SQLite uses an FTS5 table over the terms, kept in sync by triggers, ranked
+with bm25; PostgreSQL uses a GIN index over a weighted ``tsvector``, ranked
+with ``ts_rank_cd`` (see migration 0019). Titles weigh more than bodies.
+Other databases fall back to unranked ``LIKE`` matching on word prefixes.
+
+Signals keep entries current; bulk writes bypass them, so run
+``manage.py rebuild_search_index`` after those.
+"""
+import re
+import unicodedata
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Q, TextField, Value
+from django.db.models.functions import Concat
+from django.utils.html import escape
+
+from .models import SearchEntry
+
+SEARCH_BATCH_SIZE = 1000
+MIN_STEM = 3
+SNIPPET_WORDS = 24
+FTS_TABLE = "lessons_searchentry_fts"
+TITLE_WEIGHT, BODY_WEIGHT = 4.0, 1.0
+
+# Noun-class prefixes (m-/wa-, m-/mi-, ji-/ma-, ki-/vi-, ch-/vy-, u-) and the
+# infinitive ku-. Glide and consonant forms only apply where they can.
+_PREFIX = re.compile(r"^(?:mw(?=[aeiou])|ch(?=[aeiou])|vy(?=[aeiou])|wa|mi|ji|ma|ki|vi|ku|m(?=[^aeiouw])|u(?=[^aeiou]))")
+_APOSTROPHES = re.compile(r"['‘’`]")
+_WORD = re.compile(r"[^\W_]+")
+_DISPLAY_WORD = re.compile(r"([^\W_]+(?:['‘’`][^\W_]+)*)")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return _APOSTROPHES.sub("", text)
+
+
+def words(text):
+    return _WORD.findall(normalize(text))
+
+
+def stem(word):
+    match = _PREFIX.match(word)
+    if match and len(word) - match.end() >= MIN_STEM:
+        return word[match.end():]
+    return word
+
+
+def index_terms(text):
+    """The indexed form of ``text``: each word, then its stem when different."""
+    terms = []
+    for word in words(text):
+        terms.append(word)
+        if stem(word) != word:
+            terms.append(stem(word))
+    return " ".join(terms)
+
+
+# ---- Documents
+
+def _question_text(data):
+    data = data or {}
+    parts = [text for text in (data.get("options") or []) + (data.get("alternatives") or []) if isinstance(text, str)]
+    if isinstance(data.get("answer"), str):
+        parts.append(data["answer"])
+    for pair in data.get("pairs") or []:
+        if isinstance(pair, dict):
+            parts += [str(pair.get("left") or ""), str(pair.get("right") or "")]
+    return " ".join(parts)
+
+
+# Model name -> (resource, function returning title, body, parent id, owner id).
+DOCUMENTS = {
+    "Strand": ("strand", lambda o: (o.name, o.grade, None, None)),
+    "SubStrand": ("substrand", lambda o: (o.name, "", o.strand_id, None)),
+    "Lesson": ("lesson", lambda o: (o.title, "\n".join(filter(None, (o.objective, o.description))), None, None)),
+    "Question": ("question", lambda o: (o.prompt, _question_text(o.data), o.lesson_id, None)),
+    "LessonPlan": ("lessonplan", lambda o: (
+        f"{o.strand} - {o.sub_strand}",
+        "\n".join(filter(None, (
+            o.general_outcome, o.specific_outcome1, o.specific_outcome2, o.specific_outcome3,
+            o.enquiry_question, o.introduction, o.lesson_development, o.conclusion, o.reflection,
+        ))),
+        None, o.teacher_id,
+    )),
+}
+RESOURCES = tuple(resource for resource, _ in DOCUMENTS.values())
+PRIVATE_RESOURCES = ("question", "lessonplan")  # teachers only
+ENTRY_FIELDS = ("parent_id", "owner_id", "title", "body", "title_terms", "body_terms")
+
+
+def document(instance):
+    """Entry field values for ``instance``."""
+    resource, fields = DOCUMENTS[instance.__class__.__name__]
+    title, body, parent_id, owner_id = fields(instance)
+    return {
+        "resource": resource, "object_id": instance.pk, "parent_id": parent_id, "owner_id": owner_id,
+        "title": title, "body": body, "title_terms": index_terms(title), "body_terms": index_terms(body),
+    }
+
+
+def _upsert(entries):
+    SearchEntry.objects.bulk_create(
+        entries, update_conflicts=True, unique_fields=["resource", "object_id"], update_fields=ENTRY_FIELDS,
+    )
+
+
+def index(instance):
+    _upsert([SearchEntry(**document(instance))])
+
+
+def remove(instance):
+    resource, _ = DOCUMENTS[instance.__class__.__name__]
+    SearchEntry.objects.filter(resource=resource, object_id=instance.pk).delete()
+
+
+def rebuild(batch_size=SEARCH_BATCH_SIZE):
+    """Re-create every entry and return how many were written."""
+    written = 0
+    with transaction.atomic():
+        SearchEntry.objects.all().delete()
+        for name in DOCUMENTS:
+            batch = []
+            for instance in apps.get_model("lessons", name).objects.order_by("pk").iterator(chunk_size=batch_size):
+                batch.append(SearchEntry(**document(instance)))
+                if len(batch) >= batch_size:
+                    _upsert(batch)
+                    written, batch = written + len(batch), []
+            _upsert(batch)
+            written += len(batch)
+    return written
+
+
+# ---- Queries
+
+def parse_query(text):
+    """One set of alternatives (the word and its stem) per query word."""
+    return [{word, stem(word)} for word in dict.fromkeys(words(text))]
+
+
+def _fts5_match(groups):
+    return " AND ".join("(" + " OR ".join(f'"{alt}"*' for alt in sorted(alts)) + ")" for alts in groups)
+
+
+def _tsquery(groups):
+    return " & ".join("(" + " | ".join(f"{alt}:*" for alt in sorted(alts)) + ")" for alts in groups)
+
+
+_TSVECTOR = (
+    "setweight(to_tsvector('simple', e.title_terms), 'A') || setweight(to_tsvector('simple', e.body_terms), 'B')"
+)
+
+
+def _matching(groups, resources, user_id):
+    """Unranked entries matching every query word, for databases without a full-text index."""
+    # Terms are space-separated, so " " + alt against " " + terms is a word-prefix match.
+    qs = SearchEntry.objects.filter(Q(owner__isnull=True) | Q(owner_id=user_id), resource__in=resources).annotate(
+        spaced_title=Concat(Value(" "), "title_terms", output_field=TextField()),
+        spaced_body=Concat(Value(" "), "body_terms", output_field=TextField()),
+    )
+    for alts in groups:
+        match = Q()
+        for alt in alts:
+            match |= Q(spaced_title__contains=" " + alt) | Q(spaced_body__contains=" " + alt)
+        qs = qs.filter(match)
+    return qs
+
+
+def _ranked(groups, resources, user_id, limit, offset):
+    table = SearchEntry._meta.db_table
+    placeholders = ", ".join(["%s"] * len(resources))
+    scope = f"e.resource IN ({placeholders}) AND (e.owner_id IS NULL OR e.owner_id = %s)"
+    if connection.vendor == "sqlite":
+        sql = (
+            f"SELECT e.*, -bm25({FTS_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+            f"FROM {FTS_TABLE} JOIN {table} e ON e.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND {scope} ORDER BY score DESC, e.id LIMIT %s OFFSET %s"
+        )
+        return SearchEntry.objects.raw(sql, [_fts5_match(groups), *resources, user_id, limit, offset])
+    if connection.vendor == "postgresql":
+        sql = (
+            f"SELECT e.*, ts_rank_cd({_TSVECTOR}, query) AS score "
+            f"FROM {table} e, to_tsquery('simple', %s) query "
+            f"WHERE ({_TSVECTOR}) @@ query AND {scope} ORDER BY score DESC, e.id LIMIT %s OFFSET %s"
+        )
+        return SearchEntry.objects.raw(sql, [_tsquery(groups), *resources, user_id, limit, offset])
+
+    return _matching(groups, resources, user_id).order_by("id")[offset:offset + limit]
+
+
+def _matches(word, groups):
+    key = normalize(word)
+    stemmed = stem(key)
+    return any(key.startswith(alt) or stemmed.startswith(alt) for alts in groups for alt in alts)
+
+
+def highlight(text, groups, max_words=None):
+    """HTML-escape ``text`` and wrap matching words in ``<mark>``; trim to ``max_words`` around the first match."""
+    pieces = _DISPLAY_WORD.split(text or "")  # separators at even, words at odd positions
+    rendered = [
+        f"<mark>{escape(piece)}</mark>" if i % 2 and _matches(piece, groups) else escape(piece)
+        for i, piece in enumerate(pieces)
+    ]
+    count = len(pieces) // 2
+    if not max_words or count <= max_words:
+        return "".join(rendered).strip()
+    first = next((i // 2 for i in range(1, len(pieces), 2) if rendered[i].startswith("<mark>")), 0)
+    start = max(0, min(first - max_words // 3, count - max_words))
+    end = start + max_words
+    snippet = "".join(rendered[2 * start + 1 if start else 0:2 * end if end < count else None]).strip()
+    return ("… " if start else "") + snippet + (" …" if end < count else "")
+
+
+def search(text, user_id, resources=RESOURCES, limit=20, offset=0):
+    """Ranked, highlighted hits for ``text``; lesson plans are only searched among ``user_id``'s."""
+    groups = parse_query(text)
+    if not groups or not resources:
+        return []
+    hits = []
+    for entry in _ranked(groups, list(resources), user_id, limit, offset):
+        hits.append({
+            "type": entry.resource,
+            "id": entry.object_id,
+            "parent": entry.parent_id,
+            "title": entry.title,
+            "title_highlighted": highlight(entry.title, groups),
+            "snippet": highlight(entry.body, groups, SNIPPET_WORDS),
+            "score": round(getattr(entry, "score", 0) or 0, 4),
+        })
+    return hits
@@ -0,0 +1,336 @@
+"""
+A realistic, seeded dataset for load testing and benchmarks.
+
+Builds schools (``Profile.school``) with classes across the grades, a
+teacher account per class, and per pupil both a ``Student`` row (the class
+register) and a student ``User`` with a profile. The curriculum (strands and
+sub-strands per grade) is shared by every school; each class gets its own
+lessons with questions, assignments, tests and lesson plans spread over the
+requested years, plus attendance on every term weekday, submissions,
+progress and paper-test results.
+
+Everything is written with ``bulk_create`` in batches inside a single
+transaction, with historical timestamps kept (``auto_now`` is switched off
+while seeding). Signals do not fire for bulk writes, so dashboard counters,
+attendance rollups, search entries and the catalog cache are rebuilt at the
+end. The same seed and end date always produce the same data.
+"""
+import datetime
+import random
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import catalog, search
+from .attendance import rebuild_rollups
+from .counters import rebuild_counters
+from .models import (
+    Assignment, Attendance, Lesson, LessonPlan, Profile, Progress, Question, QuestionType,
+    Result, Role, Strand, Student, SubStrand, Submission, Test,
+)
+from .reports import school_days
+from .roster import normalize_name
+
+SEED_BATCH_SIZE = 2000
+DEMO_PASSWORD = "swahub-demo"
+
+GRADES = ("PP1", "PP2", "Grade 1", "Grade 2", "Grade 3")
+STRANDS = {
+    "Kusikiliza na Kuzungumza": ("Salamu", "Familia", "Shuleni"),
+    "Kusoma": ("Herufi", "Silabi", "Hadithi"),
+    "Kuandika": ("Maneno", "Sentensi", "Imla"),
+    "Msamiati": ("Wanyama", "Chakula", "Mwili"),
+}
+WORDS = (
+    ("paka", "cat"), ("mbwa", "dog"), ("kuku", "chicken"), ("ng'ombe", "cow"), ("mbuzi", "goat"),
+    ("samaki", "fish"), ("maji", "water"), ("chakula", "food"), ("mama", "mother"), ("baba", "father"),
+    ("kitabu", "book"), ("shule", "school"), ("nyumba", "house"), ("mti", "tree"), ("jua", "sun"),
+    ("mvua", "rain"), ("kalamu", "pen"), ("kiti", "chair"), ("mkono", "hand"), ("jicho", "eye"),
+)
+GIVEN_NAMES = (
+    "Amani", "Baraka", "Neema", "Zawadi", "Imani", "Juma", "Wanjiru", "Achieng", "Kamau", "Otieno",
+    "Mwajuma", "Halima", "Omari", "Faraji", "Nafula", "Chebet", "Kiprono", "Wafula", "Akinyi", "Mutua",
+)
+FAMILY_NAMES = (
+    "Mwangi", "Odhiambo", "Njoroge", "Wekesa", "Mohamed", "Kariuki", "Ochieng", "Kiptoo", "Atieno",
+    "Mbugua", "Hassan", "Nyambura", "Barasa", "Cheruiyot", "Muthoni", "Onyango", "Salim", "Wambui",
+)
+HOLIDAY_MONTHS = (4, 8, 12)  # term breaks
+LESSONS_PER_TEST = 4
+LESSONS_PER_ASSIGNMENT = 5
+PLANS_PER_TEACHER = 3
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """Let ``bulk_create`` keep the given ``created_at``/``updated_at`` values."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _bulk(model, objects, batch_size):
+    """``bulk_create`` an iterable in batches; return the created objects."""
+    created = []
+    objects = iter(objects)
+    while batch := list(islice(objects, batch_size)):
+        created += model.objects.bulk_create(batch)
+    return created
+
+
+def _bulk_count(model, objects, batch_size):
+    """Like ``_bulk`` for large generated sets, keeping only the count."""
+    count = 0
+    objects = iter(objects)
+    while batch := list(islice(objects, batch_size)):
+        model.objects.bulk_create(batch)
+        count += len(batch)
+    return count
+
+
+def _moment(rng, day):
+    """A time during the school day on ``day``."""
+    moment = datetime.datetime.combine(day, datetime.time(8)) + datetime.timedelta(minutes=rng.randrange(8 * 60))
+    return timezone.make_aware(moment)
+
+
+class _Seeder:
+    def __init__(self, schools, classes, students, years, lessons, seed, until, batch_size):
+        self.rng = random.Random(seed)
+        self.schools, self.classes, self.students, self.lessons = schools, classes, students, lessons
+        self.until = until
+        self.start = until - datetime.timedelta(days=365 * years)
+        self.batch_size = batch_size
+        self.password = make_password(DEMO_PASSWORD)
+        self.counts = {}
+
+    def _save(self, model, objects):
+        created = _bulk(model, objects, self.batch_size)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(created)
+        return created
+
+    def _save_many(self, model, objects):
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + _bulk_count(model, objects, self.batch_size)
+
+    def _term_days(self):
+        return [day for day in school_days(self.start, self.until) if day.month not in HOLIDAY_MONTHS]
+
+    def curriculum(self):
+        """Strands and sub-strands per grade, reusing a grade's existing strands."""
+        existing = set(Strand.objects.filter(grade__in=GRADES).values_list("grade", flat=True))
+        strands = self._save(Strand, (
+            Strand(name=name, grade=grade) for grade in GRADES if grade not in existing for name in STRANDS
+        ))
+        self._save(SubStrand, (
+            SubStrand(strand=strand, name=name) for strand in strands for name in STRANDS[strand.name]
+        ))
+        by_grade = {}
+        for sub_strand in SubStrand.objects.filter(strand__grade__in=GRADES).select_related("strand"):
+            by_grade.setdefault(sub_strand.strand.grade, []).append(sub_strand)
+        return by_grade
+
+    def accounts(self, school_offset):
+        """Teacher accounts per class and a ``Student`` plus student account per pupil."""
+        classes, users, profiles, register = [], [], [], []
+        for school in range(school_offset + 1, school_offset + self.schools + 1):
+            school_name = f"Shule ya Mfano {school:03d}"
+            for index in range(self.classes):
+                grade = GRADES[index % len(GRADES)]
+                class_name = f"S{school:03d} {grade} {chr(ord('A') + index // len(GRADES))}"
+                teacher = User(username=f"s{school:03d}-teacher-{index + 1}", password=self.password,
+                               first_name=self.rng.choice(GIVEN_NAMES), last_name=self.rng.choice(FAMILY_NAMES))
+                users.append(teacher)
+                profiles.append((teacher, Role.TEACHER, school_name))
+                pupils = []
+                for n in range(self.students):
+                    given, family = self.rng.choice(GIVEN_NAMES), self.rng.choice(FAMILY_NAMES)
+                    user = User(username=f"s{school:03d}-c{index + 1}-{n + 1}", password=self.password,
+                                first_name=given, last_name=family)
+                    users.append(user)
+                    profiles.append((user, Role.STUDENT, school_name))
+                    full_name = f"{given} {family}"
+                    student = Student(full_name=full_name, name_key=normalize_name(full_name), enrolled_class=class_name,
+                                      gender=self.rng.choice(("Male", "Female")))
+                    register.append(student)
+                    # Ability drives every mark this pupil gets; a few are chronically absent.
+                    pupils.append((student, user, self.rng.uniform(0.35, 0.95),
+                                   0.25 if self.rng.random() < 0.08 else 0.04))
+                classes.append((class_name, grade, teacher, pupils))
+
+        self._save(User, users)
+        self._save(Profile, (Profile(user=user, role=role, school=school) for user, role, school in profiles))
+        self._save(Student, register)
+        return classes
+
+    def lessons_for(self, classes, curriculum):
+        days = self._term_days()
+        plan = []
+        for class_name, grade, teacher, pupils in classes:
+            sub_strands = curriculum[grade]
+            lesson_days = sorted(self.rng.sample(days, min(self.lessons, len(days))))
+            for number, day in enumerate(lesson_days, 1):
+                sub_strand = sub_strands[number % len(sub_strands)]
+                plan.append((class_name, Lesson(
+                    class_name=class_name, date=day, strand=sub_strand.strand, sub_strand=sub_strand,
+                    title=f"{sub_strand.name} {number}",
+                    objective=f"Mwanafunzi ataweza kutumia msamiati wa {sub_strand.name.lower()}.",
+                    content={"steps": [{"type": "image_word_audio", "items": [
+                        {"word": word, "image": f"{word}.png", "audio": f"{word}.mp3"}
+                        for word, _ in self.rng.sample(WORDS, 3)
+                    ]}]},
+                    updated_at=_moment(self.rng, day),
+                )))
+        lessons = self._save(Lesson, (lesson for _, lesson in plan))
+        by_class = {}
+        for class_name, lesson in plan:
+            by_class.setdefault(class_name, []).append(lesson)
+        return lessons, by_class
+
+    def questions(self, lessons):
+        def make(lesson):
+            (word, english), *others = self.rng.sample(WORDS, 4)
+            moment = lesson.updated_at
+            yield Question(lesson=lesson, qtype=QuestionType.MCQ, prompt=f"Ni neno gani lina maana ya '{english}'?",
+                           data={"options": self.rng.sample([word, *(w for w, _ in others[:2])], 3), "answer": word},
+                           marks=1, order=1, updated_at=moment)
+            yield Question(lesson=lesson, qtype=QuestionType.FILL, prompt=f"Andika neno ______ ({english}).",
+                           data={"answer": word}, marks=1, order=2, updated_at=moment)
+            yield Question(lesson=lesson, qtype=QuestionType.MATCH, prompt="Oanisha maneno.",
+                           data={"pairs": [{"left": w, "right": e} for w, e in others]}, marks=3, order=3,
+                           updated_at=moment)
+            yield Question(lesson=lesson, qtype=QuestionType.ORAL, prompt=f"Sema: 'Huyu ni {word}.'",
+                           data={}, marks=2, order=4, updated_at=moment)
+
+        questions = self._save(Question, (q for lesson in lessons for q in make(lesson)))
+        by_lesson = {}
+        for question in questions:
+            by_lesson.setdefault(question.lesson_id, []).append(question)
+        return by_lesson
+
+    def class_work(self, classes, lessons_by_class):
+        """Assignments, tests and lesson plans per class."""
+        assignments, tests, plans = [], [], []
+        for class_name, grade, teacher, pupils in classes:
+            lessons = lessons_by_class.get(class_name, [])
+            for lesson in lessons[LESSONS_PER_ASSIGNMENT - 1::LESSONS_PER_ASSIGNMENT]:
+                assignments.append(Assignment(
+                    lesson=lesson, title=f"Kazi ya nyumbani: {lesson.title}",
+                    instructions="Soma tena hadithi na ujibu maswali.",
+                    due_date=lesson.date + datetime.timedelta(days=7), updated_at=lesson.updated_at,
+                ))
+            for lesson in lessons[LESSONS_PER_TEST - 1::LESSONS_PER_TEST]:
+                tests.append((class_name, Test(
+                    lesson=lesson, title=f"Jaribio: {lesson.title}", total_marks=20,
+                    date=lesson.date + datetime.timedelta(days=3), updated_at=lesson.updated_at,
+                )))
+            for lesson in lessons[:PLANS_PER_TEACHER]:
+                plans.append(LessonPlan(
+                    teacher=teacher, strand=lesson.strand.name, sub_strand=lesson.sub_strand.name,
+                    general_outcome=lesson.objective, specific_outcome1=f"Kutaja maneno ya {lesson.sub_strand.name}.",
+                    enquiry_question="Ni maneno gani unayoyajua?", introduction="Wimbo wa salamu.",
+                    lesson_development="Kusoma na kurudia maneno.", conclusion="Muhtasari.", reflection="",
+                    assignment=[{"title": "Chora na uandike maneno matatu."}], created_at=lesson.updated_at,
+                ))
+        self._save(Assignment, assignments)
+        self._save(Test, (test for _, test in tests))
+        self._save(LessonPlan, plans)
+        return tests
+
+    def results(self, classes, tests):
+        pupils_by_class = {class_name: pupils for class_name, _, _, pupils in classes}
+
+        def make():
+            for class_name, test in tests:
+                moment = _moment(self.rng, test.date)
+                for student, _, ability, _ in pupils_by_class[class_name]:
+                    score = round(min(1, max(0, self.rng.gauss(ability, 0.12))) * test.total_marks)
+                    yield Result(test=test, student=student, student_name=student.full_name, score=score,
+                                 feedback="Vizuri sana!" if score >= 15 else "", created_at=moment)
+
+        self._save_many(Result, make())
+
+    def attendance(self, classes):
+        days = self._term_days()
+
+        def make():
+            for _, _, teacher, pupils in classes:
+                for student, _, _, absence in pupils:
+                    for day in days:
+                        roll = self.rng.random()
+                        status = "absent" if roll < absence else "late" if roll < absence + 0.05 else "present"
+                        yield Attendance(student=student, teacher=teacher, date=day, status=status)
+
+        self._save_many(Attendance, make())
+
+    def learner_activity(self, classes, lessons_by_class, questions):
+        """Submissions and progress from each pupil's account on their class's lessons."""
+        def submissions():
+            for class_name, _, teacher, pupils in classes:
+                for lesson in lessons_by_class.get(class_name, []):
+                    items = questions.get(lesson.id, [])
+                    auto = [q for q in items if q.qtype != QuestionType.ORAL]
+                    total = sum(q.marks for q in auto)
+                    for _, user, ability, _ in pupils:
+                        if self.rng.random() > 0.7:
+                            continue
+                        answers, score = {}, 0
+                        for q in auto:
+                            right = self.rng.random() < ability
+                            if q.qtype == QuestionType.MATCH:
+                                answers[str(q.id)] = {p["left"]: p["right"] for p in q.data["pairs"]} if right else {}
+                            else:
+                                answers[str(q.id)] = q.data["answer"] if right else self.rng.choice(WORDS)[0]
+                            score += q.marks if right else 0
+                        moment = _moment(self.rng, lesson.date)
+                        yield Submission(student=user, lesson=lesson, answers=answers, score=score, total=total,
+                                         graded_by=teacher if self.rng.random() < 0.3 else None,
+                                         created_at=moment, updated_at=moment)
+
+        def progress():
+            for class_name, _, _, pupils in classes:
+                for lesson in lessons_by_class.get(class_name, []):
+                    for _, user, ability, _ in pupils:
+                        if self.rng.random() > 0.85:
+                            continue
+                        percent = min(100, round(self.rng.uniform(ability, 1.2) * 100))
+                        yield Progress(student=user, lesson=lesson, percent=percent, stars=percent // 34,
+                                       last_step=self.rng.randrange(1, 4), updated_at=_moment(self.rng, lesson.date))
+
+        self._save_many(Submission, submissions())
+        self._save_many(Progress, progress())
+
+
+def seed_school_data(schools=2, classes=5, students=30, years=1, lessons=40, seed=0, until=None,
+                     batch_size=SEED_BATCH_SIZE):
+    """Generate the dataset and return the number of rows created per model."""
+    seeder = _Seeder(schools, classes, students, years, lessons, seed, until or timezone.localdate(), batch_size)
+    school_offset = Profile.objects.exclude(school="").values("school").distinct().count()
+    with transaction.atomic(), historical_timestamps(
+        Lesson, Question, Assignment, Test, LessonPlan, Result, Submission, Progress,
+    ):
+        curriculum = seeder.curriculum()
+        class_list = seeder.accounts(school_offset)
+        lessons, lessons_by_class = seeder.lessons_for(class_list, curriculum)
+        questions = seeder.questions(lessons)
+        tests = seeder.class_work(class_list, lessons_by_class)
+        seeder.results(class_list, tests)
+        seeder.attendance(class_list)
+        seeder.learner_activity(class_list, lessons_by_class, questions)
+        rebuild_counters()
+        seeder.counts["AttendanceRollup"] = rebuild_rollups()
+        seeder.counts["SearchEntry"] = search.rebuild()
+    catalog.invalidate("Strand")
+    return seeder.counts
@@ -1,9 +1,18 @@
 from rest_framework import serializers
+from django.utils import timezone
 from django.contrib.auth.models import User
 from .models import (
     Profile, Strand, SubStrand, Lesson, Question, Assignment, Submission,
-    Progress, Test, Result, Attendance, LessonPlan, Student
+    Progress, Test, Result, Attendance, LessonPlan, Student, SubmissionMedia
 )
+from .roster import match_student
+
+def requested_expansions(request):
+    """Return the set of names in the request's ``?expand=`` parameter."""
+    if request is None:
+        return set()
+    return {name.strip() for name in request.query_params.get("expand", "").split(",") if name.strip()}
+
 
 # -------------------------
 # User & Profile
@@ -45,7 +54,7 @@ class SubStrandSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = SubStrand
-        fields = ["id", "strand", "strand_name", "name"]
+        fields = ["id", "strand", "strand_name", "name", "updated_at"]
 
 
 # -------------------------
@@ -56,13 +65,26 @@ class QuestionSerializer(serializers.ModelSerializer):
         model = Question
         fields = "__all__"
 
+    def validate(self, attrs):
+        from .grading import MAX_FILL_EDITS
+        qtype = attrs.get("qtype") or getattr(self.instance, "qtype", None)
+        data = attrs.get("data") or {}
+        if qtype == "fill" and isinstance(data, dict):
+            alternatives = data.get("alternatives", [])
+            if not isinstance(alternatives, list) or not all(isinstance(a, str) for a in alternatives):
+                raise serializers.ValidationError({"data": "alternatives must be a list of strings."})
+            max_edits = data.get("max_edits")
+            if max_edits is not None and (type(max_edits) is not int or not 0 <= max_edits <= MAX_FILL_EDITS):
+                raise serializers.ValidationError({"data": f"max_edits must be a whole number from 0 to {MAX_FILL_EDITS}."})
+        return attrs
+
 
 class AssignmentSerializer(serializers.ModelSerializer):
     lesson_title = serializers.CharField(source="lesson.title", read_only=True)
 
     class Meta:
         model = Assignment
-        fields = ["id", "lesson", "lesson_title", "title", "instructions", "due_date"]
+        fields = ["id", "lesson", "lesson_title", "title", "instructions", "due_date", "updated_at"]
         read_only_fields = ["lesson_title"]
 
 
@@ -76,8 +98,37 @@ class LessonSerializer(serializers.ModelSerializer):
         fields = [
             "id", "class_name", "description", "date", "strand", "strand_name",
             "sub_strand", "sub_strand_name", "title", "objective", "content",
-            "is_active", "questions"
+            "is_active", "content_version", "updated_at", "questions"
         ]
+        read_only_fields = ["content_version"]
+
+
+class LessonFeedSerializer(LessonSerializer):
+    """Lesson without nested questions; the change feed ships questions separately."""
+
+    class Meta(LessonSerializer.Meta):
+        fields = [f for f in LessonSerializer.Meta.fields if f != "questions"]
+
+
+class LessonListSerializer(LessonSerializer):
+    """
+    Compact lesson representation for list views.
+
+    ``content`` and ``questions`` are left out unless the client asks for
+    them with ``?expand=content,questions``.
+    """
+    EXPANDABLE = ("content", "questions")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = requested_expansions(self.context.get("request"))
+        for name in self.EXPANDABLE:
+            if name not in expand:
+                self.fields.pop(name)
+
+
+class RegradeSerializer(serializers.Serializer):
+    question = serializers.IntegerField(min_value=1, required=False, allow_null=True)
 
 
 # -------------------------
@@ -89,7 +140,25 @@ class SubmissionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Submission
         fields = "__all__"
-        read_only_fields = ["score", "total", "graded_by"]
+        read_only_fields = ["score", "total", "extra_score", "graded_by"]
+
+
+class SubmissionMediaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SubmissionMedia
+        fields = ["id", "question", "submission", "content_type", "size", "received", "status", "error", "created_at"]
+        read_only_fields = ["submission", "received", "status", "error"]
+
+    def validate(self, attrs):
+        from .media import ALLOWED_TYPES, MAX_BYTES
+        prefix = ALLOWED_TYPES.get(attrs["question"].qtype)
+        if prefix is None:
+            raise serializers.ValidationError({"question": "Only oral and upload questions take media."})
+        if not attrs["content_type"].startswith(prefix):
+            raise serializers.ValidationError({"content_type": f"Expected a {prefix}* type for this question."})
+        if not 0 < attrs["size"] <= MAX_BYTES:
+            raise serializers.ValidationError({"size": f"Size must be between 1 and {MAX_BYTES} bytes."})
+        return attrs
 
 
 # -------------------------
@@ -104,6 +173,19 @@ class ProgressSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class ProgressHeartbeatSerializer(serializers.Serializer):
+    lesson = serializers.IntegerField(min_value=1)
+    last_step = serializers.IntegerField(min_value=0, default=0)
+    percent = serializers.IntegerField(min_value=0, max_value=100, default=0)
+    stars = serializers.IntegerField(min_value=0, default=0)
+    final = serializers.BooleanField(default=False)
+
+    def validate_lesson(self, value):
+        if not Lesson.objects.filter(pk=value, is_active=True).exists():
+            raise serializers.ValidationError("No active lesson with this id.")
+        return value
+
+
 # -------------------------
 # Tests & Results
 # -------------------------
@@ -121,6 +203,22 @@ class ResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = Result
         fields = "__all__"
+        extra_kwargs = {"student_name": {"required": False}}
+
+    def validate(self, attrs):
+        student = attrs.get("student")
+        if student is not None and not attrs.get("student_name"):
+            attrs["student_name"] = student.full_name
+        if self.instance is None and not attrs.get("student_name"):
+            raise serializers.ValidationError({"student": "Give a student or a student name."})
+        if student is None and attrs.get("student_name") and "student" not in self.initial_data:
+            # Older clients send only the name; link it when the match is unambiguous.
+            test = attrs.get("test") or self.instance.test
+            student_id = match_student(attrs["student_name"], test.lesson.class_name)
+            # A student has one result per test; a second one stays unlinked.
+            if student_id and not Result.objects.filter(test=test, student_id=student_id).exists():
+                attrs["student_id"] = student_id
+        return attrs
 
 
 # -------------------------
@@ -135,6 +233,17 @@ class AttendanceSerializer(serializers.ModelSerializer):
         read_only_fields = ["teacher"]
 
 
+class AttendanceBulkRowSerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Attendance.STATUS_CHOICES)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class AttendanceBulkSerializer(serializers.Serializer):
+    date = serializers.DateField(required=False)
+    records = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=500)
+
+
 # -------------------------
 # Lesson Plans
 # -------------------------
@@ -152,3 +261,58 @@ class LessonPlanSerializer(serializers.ModelSerializer):
             "created_at", "assignments"
         ]
         read_only_fields = ['teacher', 'created_at']
+
+
+# -------------------------
+# Reports
+# -------------------------
+class ReportParamsSerializer(serializers.Serializer):
+    class_name = serializers.CharField()
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"end": "End date must not be before start date."})
+        return attrs
+
+
+class AttendanceRegisterParamsSerializer(ReportParamsSerializer):
+    MAX_DAYS = 366
+
+    class_name = serializers.CharField(required=False)
+    start = serializers.DateField()
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.localdate())
+        attrs = super().validate(attrs)
+        if (attrs["end"] - attrs["start"]).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({"end": f"A register covers at most {self.MAX_DAYS} days."})
+        return attrs
+
+
+class AttendanceAnalyticsParamsSerializer(ReportParamsSerializer):
+    class_name = serializers.CharField(required=False)
+    start = serializers.DateField()
+    end = serializers.DateField(required=False)
+    threshold = serializers.FloatField(min_value=0, max_value=1, default=0.9)
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.localdate())
+        return super().validate(attrs)
+
+
+class SearchParamsSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    type = serializers.CharField(required=False, help_text="Comma-separated: lesson, question, lessonplan, strand, substrand.")
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+    offset = serializers.IntegerField(min_value=0, default=0)
+
+    def validate_type(self, value):
+        from .search import RESOURCES
+        types = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = sorted(set(types) - set(RESOURCES))
+        if unknown:
+            raise serializers.ValidationError(f"Unknown type(s): {', '.join(unknown)}.")
+        return types
@@ -1,3 +1,886 @@
-from django.test import TestCase
+import datetime
+import tempfile
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from unittest import mock, skipUnless
+
+from .benchmarks import api_client, compare, default_user, measure, request_plan, run_benchmarks
+from .models import (
+    Attendance, Lesson, LessonPlan, Progress, Question, RegradeJob, Result, Role, Strand, Student, SubStrand, Submission,
+    SubmissionMedia, Test,
+)
+from .grading import AnswerKey, FillMatcher, get_answer_key, regrade_submissions
+from .counters import read_counters, rebuild_counters
+from .packs import PACK_DIR, get_or_build_pack, pack_fingerprint, pack_lessons
+from .pagination import KeysetPagination
+from .replicas import REPLICA, ReplicaRouter, _use_replica
+from .heartbeat import ProgressBuffer, write_progress
+from .metrics import registry
+from .imports import import_results
+from .reports import stream_csv
+from .roster import DUPLICATE, link_results, match_student
+from .search import RESOURCES, _matching, highlight, parse_query, search, stem
+from .seeding import seed_school_data
+
+
+@skipUnless(connection.vendor == "sqlite", "query plans are checked against SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTests(TestCase):
+    """The hot lookups issued by the views must be served by their indexes."""
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan, f"{index} not used:\n{plan}")
+        self.assertNotIn("USE TEMP B-TREE", plan)
+
+    def test_active_lessons_by_date(self):
+        self.assertUsesIndex(Lesson.objects.filter(is_active=True).order_by("-date"), "lesson_active_date_idx")
+
+    def test_strands_by_grade(self):
+        self.assertUsesIndex(Strand.objects.filter(grade="PP2"), "lessons_strand_grade")
+
+    def test_progress_by_student_and_lesson(self):
+        # SQLite folds the unique constraint into the table as an autoindex.
+        self.assertUsesIndex(Progress.objects.filter(student_id=1, lesson_id=1), "(student_id=? AND lesson_id=?)")
+
+    def test_submissions_by_student_and_lesson(self):
+        self.assertUsesIndex(Submission.objects.filter(student_id=1, lesson_id=1), "submission_student_lesson_idx")
+
+    def test_submissions_by_lesson_newest_first(self):
+        self.assertUsesIndex(
+            Submission.objects.filter(lesson_id=1).order_by("-created_at"), "submission_lesson_created_idx"
+        )
+
+    def test_attendance_by_date_and_status(self):
+        self.assertUsesIndex(
+            Attendance.objects.filter(date=datetime.date(2025, 1, 6), status="absent"), "attendance_date_status_idx"
+        )
+
+
+class SeedAndBenchmarkTests(TestCase):
+    """The data generator and the endpoint benchmark run end to end on a small school."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = seed_school_data(schools=1, classes=2, students=3, lessons=8, until=datetime.date(2025, 3, 14))
+
+    def test_seeded_history_keeps_its_dates(self):
+        self.assertEqual(Lesson.objects.count(), self.counts["Lesson"])
+        self.assertEqual(User.objects.filter(profile__role="teacher").count(), 2)
+        self.assertLessEqual(Submission.objects.latest("created_at").created_at.date(), datetime.date(2025, 3, 14))
+
+    def test_every_endpoint_answers(self):
+        run = run_benchmarks(repeat=1, warmup=0)
+        self.assertIn("lesson-detail", run["endpoints"])
+        failing = {name: r["status"] for name, r in run["endpoints"].items() if r["status"] != 200}
+        self.assertEqual(failing, {})
+        self.assertEqual(compare(run, run), [])
+
+
+class PackTests(TestCase):
+    def test_rebuild_only_removes_its_own_scope(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            directory = Path(media) / PACK_DIR
+            directory.mkdir()
+            others = [directory / f"grade-pp2-class-a-{'1' * 20}.zip", directory / f"all-stars-{'2' * 20}.zip"]
+            stale = directory / f"grade-pp2-{'3' * 20}.zip"
+            for path in [*others, stale]:
+                path.touch()
+            path, _ = get_or_build_pack("pp2")
+            self.assertTrue(path.exists())
+            self.assertFalse(stale.exists())
+            self.assertTrue(all(other.exists() for other in others))
+
+    def test_fingerprint_covers_the_whole_curriculum_tree(self):
+        strand, elsewhere = Strand.objects.create(name="Kusoma"), Strand.objects.create(name="Kuandika")
+        Lesson.objects.create(strand=strand, sub_strand=SubStrand.objects.create(strand=strand, name="Herufi"), title="Herufi")
+        unused = SubStrand.objects.create(strand=strand, name="Silabi")  # in curriculum.json, no lesson of its own
+        other = SubStrand.objects.create(strand=elsewhere, name="Maneno")
+        fingerprint = pack_fingerprint(pack_lessons("PP2"))
+
+        other.name = "Sentensi"
+        other.save()
+        self.assertEqual(pack_fingerprint(pack_lessons("PP2")), fingerprint)
+        unused.name = "Silabi mbili"
+        unused.save()
+        self.assertNotEqual(pack_fingerprint(pack_lessons("PP2")), fingerprint)
+
+
+# Queries per request, whatever the page size. Every GET route needs an entry,
+# so a new endpoint cannot ship without one.
+QUERY_BUDGETS = {
+    "dashboard-data": 1,
+    "teacher-dashboard-stats": 4,
+    "strand-list": 2,
+    "strand-detail": 1,
+    "substrand-list": 2,
+    "substrand-detail": 1,
+    "lesson-list": 3,
+    "lesson-detail": 2,
+    "lesson-pp2-lessons": 3,
+    "lesson-regrade": 2,
+    "question-list": 2,
+    "question-detail": 1,
+    "assignment-list": 2,
+    "assignment-detail": 1,
+    "submission-list": 1,
+    "submission-detail": 1,
+    "progress-list": 1,
+    "progress-detail": 1,
+    "test-list": 2,
+    "test-detail": 1,
+    "test-pp2-tests": 2,
+    "result-list": 1,
+    "result-detail": 1,
+    "result-pp2-results": 1,
+    "attendance-list": 1,
+    "attendance-detail": 1,
+    "attendance-analytics": 3,
+    "attendance-register": 1,
+    "attendance-today": 1,
+    "lessonplan-list": 3,
+    "lessonplan-detail": 2,
+    "student-list": 2,
+    "student-detail": 1,
+    "student-results": 2,
+    "me-list": 1,
+    "changes-list": 6,
+    "gradebook-list": 2,
+    "gradebook-export": 2,
+    "search-list": 1,
+}
+
+
+class QueryBudgetTests(TestCase):
+    """List and detail routes must not issue per-row queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_school_data(schools=1, classes=2, students=12, lessons=12, until=datetime.date(2025, 3, 14))
+
+    def setUp(self):
+        self.api = api_client(default_user())
+
+    def queries(self, path, query, page_size):
+        # Keyset paginators take ?page_size=; page-number ones use the class default.
+        with mock.patch.object(PageNumberPagination, "page_size", page_size):
+            status, _, queries, _ = measure(self.api, path, {**query, "page_size": page_size}, cold_cache=True)
+        self.assertEqual(status, 200, path)
+        return queries
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual({name for name, _, _ in request_plan(self.api)} - set(QUERY_BUDGETS), set())
+
+    def test_routes_stay_within_budget_at_any_page_size(self):
+        for name, path, query in request_plan(self.api):
+            with self.subTest(name):
+                small, large = self.queries(path, query, 2), self.queries(path, query, 20)
+                self.assertEqual(small, large, f"{name} grows with the page size")
+                self.assertLessEqual(large, QUERY_BUDGETS[name])
+
+    def tearDown(self):
+        cache.clear()
+
+
+@override_settings(ALLOWED_HOSTS=["a.example", "b.example"])
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        strand = Strand.objects.create(name="Kusoma", grade="PP2")
+        sub_strand = SubStrand.objects.create(strand=strand, name="Herufi")
+        Lesson.objects.bulk_create(
+            Lesson(strand=strand, sub_strand=sub_strand, title=f"Herufi {i}") for i in range(PageNumberPagination.page_size + 1)
+        )
+        cls.api = api_client(User.objects.create(username="mwalimu"))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_saves_show_up_once_committed(self):
+        self.assertEqual(len(self.api.get("/api/strands/", HTTP_HOST="a.example").json()["results"]), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Strand.objects.create(name="Kuandika", grade="PP2")
+        self.assertEqual(len(self.api.get("/api/strands/", HTTP_HOST="a.example").json()["results"]), 2)
+
+    def test_links_follow_the_host(self):
+        for host in ("a.example", "b.example"):
+            data = self.api.get("/api/lessons/pp2/", HTTP_HOST=host).json()
+            self.assertTrue(data["next"].startswith(f"http://{host}/"), data["next"])
+
+
+class RosterTests(TestCase):
+    def test_names_match_whatever_the_spelling(self):
+        wanjiru = Student.objects.create(full_name="Wanjiru Ng’ang’a", enrolled_class="PP2 East")
+        muthoni = Student.objects.create(full_name="Muthóni Kamau", enrolled_class="PP2 East")
+        self.assertEqual(match_student("ng'ang'a, wanjiru", "PP2 East"), wanjiru.id)
+        self.assertEqual(match_student("NGANGA Wanjiru"), wanjiru.id)
+        self.assertEqual(match_student("Kamau Muthoni", "PP2 West"), muthoni.id)
+        self.assertIsNone(match_student("Wanjiru"))
+
+    def test_linking_keeps_one_result_per_test(self):
+        strand = Strand.objects.create(name="Kusoma")
+        lesson = Lesson.objects.create(strand=strand, sub_strand=SubStrand.objects.create(strand=strand, name="Herufi"),
+                                       title="Herufi", class_name="PP2 East")
+        first, second = (Test.objects.create(lesson=lesson, title=f"Jaribio {n}", total_marks=10, date=datetime.date(2025, 3, n)) for n in (1, 2))
+        wanjiru = Student.objects.create(full_name="Wanjiru Ng'ang'a", enrolled_class="PP2 East")
+        Result.objects.create(test=first, student=wanjiru, student_name="Wanjiru Ng'ang'a", score=7)
+        for test, spelling in ((first, "Nganga Wanjiru"), (second, "NGANGA Wanjiru"), (second, "Wanjiru Nganga")):
+            Result.objects.create(test=test, student_name=spelling, score=5)
+
+        linked, unmatched = link_results(batch_size=2)
+        self.assertEqual(linked, 1)
+        self.assertEqual(sorted(unmatched), [("Nganga Wanjiru", "PP2 East", DUPLICATE), ("Wanjiru Nganga", "PP2 East", DUPLICATE)])
+        self.assertEqual(Result.objects.get(test=second, student=wanjiru).student_name, "NGANGA Wanjiru")
+
+
+class ResultUniquenessMigrationTests(TransactionTestCase):
+    before, after = [("lessons", "0021_student_name_key")], [("lessons", "0022_result_test_student_uniq")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_duplicates_stay_unlinked_after_the_backfill(self):
+        apps = self.migrate(self.before)
+        self.addCleanup(self.migrate, self.after)
+        Strand, SubStrand, Lesson, Test, Student, Result = (
+            apps.get_model("lessons", name) for name in ("Strand", "SubStrand", "Lesson", "Test", "Student", "Result")
+        )
+        strand = Strand.objects.create(name="Kusoma")
+        lesson = Lesson.objects.create(strand=strand, sub_strand=SubStrand.objects.create(strand=strand, name="Herufi"),
+                                       title="Herufi", class_name="PP2 East")
+        test = Test.objects.create(lesson=lesson, title="Herufi", total_marks=10, date=datetime.date(2025, 3, 14))
+        student = Student.objects.create(full_name="Wanjiru Ng'ang'a", name_key="nganga wanjiru", enrolled_class="PP2 East")
+        older, newer = (Result.objects.create(test=test, student=student, student_name="Wanjiru Ng'ang'a", score=score)
+                        for score in (6, 8))
+
+        self.migrate(self.after)
+        self.assertEqual(list(Result.objects.filter(student__isnull=False).values_list("id", flat=True)), [newer.id])
+        linked, unmatched = link_results()
+        self.assertEqual((linked, list(unmatched)), (0, [("Wanjiru Ng'ang'a", "PP2 East", DUPLICATE)]))
+        self.assertIsNone(Result.objects.get(id=older.id).student_id)
+
+
+class ResultImportTests(TestCase):
+    def test_a_student_gets_one_result_per_test(self):
+        strand = Strand.objects.create(name="Kusoma")
+        lesson = Lesson.objects.create(strand=strand, sub_strand=SubStrand.objects.create(strand=strand, name="Herufi"),
+                                       title="Herufi", class_name="PP2 East")
+        test = Test.objects.create(lesson=lesson, title="Herufi", total_marks=10, date=datetime.date(2025, 3, 14))
+        student = Student.objects.create(full_name="Wanjiru Ng'ang'a", enrolled_class="PP2 East")
+        self.assertEqual(import_results(test, [(2, {"student_id": str(student.id), "score": "7"})])[1], 1)
+        report, created = import_results(test, [(2, {"student_name": "Nganga Wanjiru", "score": "8"})])
+        self.assertEqual((created, report[0]["outcome"]), (0, "error"))
+        self.assertEqual(Result.objects.get(test=test, student=student).score, 7)
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def test_token_user_has_a_typed_pk(self):
+        strand = Strand.objects.create(name="Kusikiliza")
+        lesson = Lesson.objects.create(strand=strand, sub_strand=SubStrand.objects.create(strand=strand, name="Sauti"),
+                                       title="Sauti")
+        question = Question.objects.create(lesson=lesson, qtype="oral", prompt="Soma.")
+        pupil = User.objects.create(username="mwanafunzi")
+        api = api_client(pupil)  # a real bearer token, no force_authenticate
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            upload = api.post("/api/submission-media/", {"question": question.id, "content_type": "audio/webm", "size": 4})
+            self.assertEqual(upload.status_code, 201, upload.content)
+            chunk = api.put(f"/api/submission-media/{upload.json()['id']}/chunk/", b"abcd",
+                            content_type="application/octet-stream", HTTP_CONTENT_RANGE="bytes 0-3/4")
+            self.assertEqual(chunk.status_code, 200, chunk.content)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Routing against a second alias onto the same in-memory test database."""
+
+    def setUp(self):
+        # Added after class setup, so the test runner neither creates nor guards it.
+        connections.settings[REPLICA] = dict(connections.settings["default"])
+        self.addCleanup(connections.settings.pop, REPLICA)
+        self.addCleanup(lambda: connections[REPLICA].close())
+        for patch in (
+            mock.patch.object(type(self), "databases", {"default", REPLICA}),
+            mock.patch("lessons.replicas.replica_configured", return_value=True),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.teacher, self.other = (User.objects.create(username=name) for name in ("mwalimu", "mwalimu2"))
+        for user in (self.teacher, self.other):
+            user.profile.role = Role.TEACHER
+            user.profile.save()
+        cache.clear()
+
+    def aliases_used(self, request):
+        with CaptureQueriesContext(connections["default"]) as primary, CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = request()
+        self.assertLess(response.status_code, 400, response.content)
+        return {alias for alias, queries in (("default", primary), (REPLICA, replica)) if len(queries)}
+
+    def test_list_reads_go_to_the_replica(self):
+        api = api_client(self.teacher)
+        self.assertEqual(self.aliases_used(lambda: api.get("/api/students/")), {REPLICA})
+
+    def test_writes_and_transactions_stay_on_the_primary(self):
+        token = _use_replica.set(True)
+        self.addCleanup(_use_replica.reset, token)
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Student), REPLICA)
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Student), "default")
+        self.assertEqual(router.db_for_write(Student), "default")
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        api, relogged, other = api_client(self.teacher), api_client(self.teacher), api_client(self.other)
+        self.assertEqual(self.aliases_used(lambda: api.post("/api/students/", {"full_name": "Wanjiru", "enrolled_class": "PP2"})), {"default"})
+        self.assertEqual(self.aliases_used(lambda: relogged.get("/api/students/")), {"default"})  # another token, same user
+        self.assertEqual(self.aliases_used(lambda: other.get("/api/students/")), {REPLICA})
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursors walk a composite key without skipping or repeating tied rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        strand = Strand.objects.create(name="Kusoma")
+        lesson = Lesson.objects.create(
+            strand=strand, sub_strand=SubStrand.objects.create(strand=strand, name="Hadithi"), title="Hadithi",
+        )
+        pupil = User.objects.create(username="mwanafunzi")
+        Submission.objects.bulk_create(Submission(student=pupil, lesson=lesson) for _ in range(7))
+        # Three rows share each timestamp so pages have to break inside a tie.
+        start = datetime.datetime(2025, 3, 3, 8, tzinfo=datetime.timezone.utc)
+        for n, pk in enumerate(Submission.objects.order_by("id").values_list("id", flat=True)):
+            Submission.objects.filter(pk=pk).update(created_at=start + datetime.timedelta(minutes=n // 3))
+        cls.queryset = Submission.objects.all()
+
+    def page(self, paginator, url="/api/submissions/?page_size=2"):
+        return [s.id for s in paginator.paginate_queryset(self.queryset, Request(APIRequestFactory().get(url)))]
+
+    def walk(self, paginator):
+        ids, page = [], self.page(paginator)
+        while True:
+            ids += page
+            link = paginator.get_next_link()
+            if link is None:
+                return ids
+            page = self.page(paginator, link)
+
+    def test_descending_walk_covers_ties_once(self):
+        expected = list(self.queryset.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(self.walk(KeysetPagination()), expected)
+
+    def test_ascending_walk(self):
+        class Ascending(KeysetPagination):
+            ordering = ("created_at", "id")
+        expected = list(self.queryset.order_by("created_at", "id").values_list("id", flat=True))
+        self.assertEqual(self.walk(Ascending()), expected)
+
+    def test_previous_link_round_trips(self):
+        paginator = KeysetPagination()
+        first = self.page(paginator)
+        second = self.page(paginator, paginator.get_next_link())
+        self.assertEqual(self.page(paginator, paginator.get_previous_link()), first)
+        self.assertEqual(self.page(paginator, paginator.get_next_link()), second)
+
+    def test_tampered_cursor_is_not_found(self):
+        paginator = KeysetPagination()
+        paginator.base_url = "/api/submissions/"
+        for position in ('"x"', '["yesterday", 1]', "[1]", "{"):
+            cursor = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=position)).split("cursor=")[1]
+            with self.subTest(position=position), self.assertRaises(NotFound):
+                self.page(KeysetPagination(), f"/api/submissions/?cursor={cursor}")
+
+
+class AttendanceBulkTests(TestCase):
+    path = "/api/attendance/bulk/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pupils = [Student.objects.create(full_name=f"Mwanafunzi {n}", enrolled_class="PP2") for n in range(12)]
+        cls.teacher = User.objects.create(username="mwalimu")
+        cls.day = datetime.date(2025, 3, 3)
+
+    def setUp(self):
+        self.api = api_client(self.teacher)
+
+    def post(self, records):
+        return self.api.post(self.path, {"date": self.day.isoformat(), "records": records}, content_type="application/json")
+
+    def test_existing_marks_are_updated(self):
+        Attendance.objects.create(student=self.pupils[0], date=self.day, status="absent")
+        data = self.post([{"student": p.id, "status": "present"} for p in self.pupils[:2]]).json()
+        self.assertEqual((data["created"], data["updated"]), (1, 1))
+        self.assertEqual([r["outcome"] for r in data["results"]], ["updated", "created"])
+        self.assertEqual(set(Attendance.objects.filter(date=self.day).values_list("status", flat=True)), {"present"})
+
+    def test_invalid_rows_are_reported_and_the_rest_written(self):
+        response = self.post([
+            {"student": self.pupils[0].id, "status": "late"},
+            {"student": self.pupils[1].id, "status": "asleep"},
+            {"student": self.pupils[0].id, "status": "present"},
+            {"student": 0, "status": "present"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["outcome"] for r in response.json()["results"]], ["created", "error", "error", "error"])
+        self.assertEqual(list(Attendance.objects.values_list("student_id", "status")), [(self.pupils[0].id, "late")])
+        self.assertEqual(self.post([{"student": 0, "status": "present"}]).status_code, 400)
+
+    def test_queries_do_not_grow_with_the_register(self):
+        def count(pupils):
+            with CaptureQueriesContext(connection) as queries:
+                self.post([{"student": p.id, "status": "present"} for p in pupils])
+            return len(queries)
+        self.assertEqual(count(self.pupils[:2]), count(self.pupils[2:]))
+
+
+class AttendanceAnalyticsTests(TestCase):
+    def test_streaks_are_stitched_across_months_and_edges(self):
+        pupil = Student.objects.create(full_name="Wanjiru", enrolled_class="PP2")
+        marks = [
+            ((2, 26), "present"), ((2, 27), "absent"), ((2, 28), "absent"),  # partial February, raw rows
+            ((3, 3), "absent"), ((3, 4), "absent"), ((3, 5), "present"), ((3, 31), "absent"),  # whole March, rollup
+            ((4, 1), "absent"), ((4, 2), "absent"), ((4, 3), "late"),  # partial April, raw rows
+        ]
+        for (month, day), mark in marks:
+            Attendance.objects.create(student=pupil, date=datetime.date(2025, month, day), status=mark)
+        teacher = User.objects.create(username="mwalimu")
+        teacher.profile.role = Role.TEACHER
+        teacher.profile.save()
+
+        data = api_client(teacher).get(
+            "/api/attendance/analytics/", {"class_name": "PP2", "start": "2025-02-20", "end": "2025-04-05"},
+        ).json()
+        row = data["students"][0]
+        self.assertEqual((row["days"], row["present"], row["absent"], row["late"]), (10, 2, 7, 1))
+        self.assertEqual((row["longest_absence_streak"], row["attendance_rate"]), (4, 0.3))
+        self.assertEqual(data["chronic_absentees"], [row])
+
+
+@override_settings(METRICS_TOKEN="siri")
+class MetricsTests(TestCase):
+    def test_requests_are_rendered_after_they_finish(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        api = api_client(User.objects.create(username="mwalimu"))
+        self.assertEqual(api.get("/api/students/").status_code, 200)
+        self.assertEqual(self.client.get("/api/metrics").status_code, 403)
+
+        body = self.client.get("/api/metrics", HTTP_AUTHORIZATION="Bearer siri").content.decode()
+        self.assertIn('swahub_requests_total{route="student-list",method="GET",status="200"} 1', body)
+        self.assertIn('swahub_request_queries_count{route="student-list",method="GET"} 1', body)
+        self.assertIn('swahub_request_duration_seconds_bucket{route="student-list",method="GET",le="+Inf"} 1', body)
+
+
+class ChangeFeedTests(TestCase):
+    def test_cursor_resumes_with_edits_and_deletes(self):
+        strand = Strand.objects.create(name="Kusoma")
+        lesson = Lesson.objects.create(strand=strand, sub_strand=SubStrand.objects.create(strand=strand, name="Herufi"), title="Herufi")
+        edited = [Question.objects.create(lesson=lesson, qtype="mcq", prompt=p) for p in ("A?", "B?")][1]
+        test = Test.objects.create(lesson=lesson, title="Herufi", total_marks=10, date=datetime.date(2025, 3, 14))
+        hour_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
+        for model in (Strand, SubStrand, Lesson, Question, Test):
+            model.objects.update(updated_at=hour_ago)
+        api = api_client(User.objects.create(username="mwalimu"))
+
+        first = api.get("/api/changes/").json()
+        self.assertTrue(first["full"])
+        self.assertEqual(len(first["changes"]["questions"]["updated"]), 2)
+
+        edited.prompt = "C?"
+        edited.save()
+        test_id = test.id
+        test.delete()
+        feed = api.get("/api/changes/", {"since": first["watermark"]}).json()
+        self.assertFalse(feed["full"])
+        self.assertEqual([q["id"] for q in feed["changes"]["questions"]["updated"]], [edited.id])
+        self.assertEqual(feed["changes"]["tests"], {"updated": [], "deleted": [test_id]})
+
+
+class ConditionalLessonTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        strand = Strand.objects.create(name="Kusoma")
+        cls.lesson = Lesson.objects.create(
+            strand=strand, sub_strand=SubStrand.objects.create(strand=strand, name="Herufi"), title="Herufi",
+        )
+        cls.question = Question.objects.create(lesson=cls.lesson, qtype="mcq", prompt="A?")
+        cls.user = User.objects.create(username="mwanafunzi")
+
+    def setUp(self):
+        self.api = api_client(self.user)
+
+    def test_current_copy_gets_an_empty_304(self):
+        for path in ("/api/lessons/", f"/api/lessons/{self.lesson.id}/"):
+            etag = self.api.get(path)["ETag"]
+            response = self.api.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual((response.status_code, response.content, response["ETag"]), (304, b"", etag))
+
+    def test_question_edit_changes_the_etag(self):
+        path = f"/api/lessons/{self.lesson.id}/"
+        etag = self.api.get(path)["ETag"]
+        self.question.prompt = "B?"
+        self.question.save()
+        response = self.api.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["questions"][0]["prompt"], "B?")
+
+    def test_header_matching(self):
+        path = f"/api/lessons/{self.lesson.id}/"
+        etag = self.api.get(path)["ETag"]
+        for header, code in ((f"W/{etag}", 304), (f'"stale", {etag}', 304), ("*", 304), ('"stale"', 200)):
+            with self.subTest(header=header):
+                self.assertEqual(self.api.get(path, HTTP_IF_NONE_MATCH=header).status_code, code)
+
+
+class SubmissionMediaTests(TestCase):
+    """Chunked uploads resume from the server's offset and play back with byte ranges."""
+
+    @classmethod
+    def setUpTestData(cls):
+        strand = Strand.objects.create(name="Kusikiliza")
+        cls.lesson = Lesson.objects.create(
+            strand=strand, sub_strand=SubStrand.objects.create(strand=strand, name="Sauti"), title="Sauti",
+        )
+        cls.question = Question.objects.create(lesson=cls.lesson, qtype="oral", prompt="Soma.")
+        cls.pupil = User.objects.create(username="mwanafunzi")
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.api = api_client(self.pupil)
+        response = self.api.post("/api/submission-media/", {"question": self.question.id, "content_type": "audio/webm", "size": 8})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.path = f"/api/submission-media/{response.json()['id']}/"
+
+    def put(self, data, first, last):
+        return self.api.put(self.path + "chunk/", data, content_type="application/octet-stream",
+                            HTTP_CONTENT_RANGE=f"bytes {first}-{last}/8")
+
+    def upload(self):
+        self.put(b"abcd", 0, 3)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.put(b"efgh", 4, 7)
+        self.assertEqual(len(callbacks), 1)  # processing is queued once the chunk commits
+        return response
+
+    def test_chunks_resume_from_the_received_offset(self):
+        first = self.put(b"abcd", 0, 3)
+        self.assertEqual((first.status_code, first.json()["received"], first.json()["status"]), (200, 4, "uploading"))
+        for start, end in ((0, 3), (6, 7)):  # duplicate, then out of order
+            response = self.put(b"xx", start, end)
+            self.assertEqual((response.status_code, response.json()["received"]), (409, 4))
+        done = self.upload()
+        self.assertEqual((done.json()["received"], done.json()["status"]), (8, "processing"))
+
+    def test_ranges(self):
+        self.upload()
+        part = self.api.get(self.path + "file/", HTTP_RANGE="bytes=2-5")
+        self.assertEqual((part.status_code, part["Content-Range"], b"".join(part.streaming_content)), (206, "bytes 2-5/8", b"cdef"))
+        outside = self.api.get(self.path + "file/", HTTP_RANGE="bytes=20-")
+        self.assertEqual((outside.status_code, outside["Content-Range"]), (416, "bytes */8"))
+
+    def test_submission_links_its_media(self):
+        self.upload()
+        media_id = int(self.path.rstrip("/").rsplit("/", 1)[1])
+        response = self.api.post("/api/submissions/", {
+            "lesson": self.lesson.id, "student": self.pupil.id, "answers": {str(self.question.id): {"media": media_id}},
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(SubmissionMedia.objects.get(id=media_id).submission_id, response.json()["id"])
+
+
+class CounterTests(TestCase):
+    """Counters kept by signals match a full rebuild after every kind of edit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pp1, cls.pp2 = (Strand.objects.create(name=f"Kusoma {grade}", grade=grade) for grade in ("PP1", "PP2"))
+        cls.lesson = Lesson.objects.create(
+            strand=cls.pp1, sub_strand=SubStrand.objects.create(strand=cls.pp1, name="Herufi"), title="Herufi",
+        )
+        Question.objects.create(lesson=cls.lesson, qtype="mcq", prompt="A?")
+        cls.test = Test.objects.create(lesson=cls.lesson, title="Herufi", total_marks=10, date=datetime.date(2025, 3, 14))
+        Result.objects.create(test=cls.test, student_name="Wanjiru", score=7)
+
+    def counters(self):
+        return {grade: row for grade, row in read_counters()[0].items() if any(row.values())}
+
+    def assertMatchesRebuild(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        live = self.counters()
+        rebuild_counters()
+        self.assertEqual(live, self.counters())
+
+    def test_create(self):
+        self.assertMatchesRebuild(lambda: Lesson.objects.create(
+            strand=self.pp2, sub_strand=SubStrand.objects.create(strand=self.pp2, name="Sauti"), title="Sauti",
+        ))
+
+    def test_deactivate(self):
+        self.lesson.is_active = False
+        self.assertMatchesRebuild(self.lesson.save)
+
+    def test_delete(self):
+        self.assertMatchesRebuild(self.lesson.delete)
+
+    def test_lesson_moves_grade_with_its_children(self):
+        self.lesson.strand = self.pp2
+        self.assertMatchesRebuild(self.lesson.save)
+        self.assertEqual(read_counters()[0]["PP2"]["results"], 1)
+
+    def test_test_moves_grade_with_its_results(self):
+        other = Lesson.objects.create(
+            strand=self.pp2, sub_strand=SubStrand.objects.create(strand=self.pp2, name="Sauti"), title="Sauti",
+        )
+        self.test.lesson = other
+        self.assertMatchesRebuild(self.test.save)
+        self.assertEqual(read_counters()[0]["PP2"]["results"], 1)
+
+
+class HeartbeatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        strand = Strand.objects.create(name="Kusoma")
+        sub_strand = SubStrand.objects.create(strand=strand, name="Herufi")
+        cls.lesson = Lesson.objects.create(strand=strand, sub_strand=sub_strand, title="Herufi a")
+        cls.hidden = Lesson.objects.create(strand=strand, sub_strand=sub_strand, title="Herufi e", is_active=False)
+        cls.pupil = User.objects.create(username="mwanafunzi")
+
+    def beat(self, **data):
+        return api_client(self.pupil).post("/api/progress/heartbeat/", {"final": True, **data}, content_type="application/json")
+
+    def stored(self):
+        return Progress.objects.filter(student=self.pupil, lesson=self.lesson).values_list("percent", "stars", "last_step").get()
+
+    def test_stored_progress_is_never_lowered(self):
+        Progress.objects.create(student=self.pupil, lesson=self.lesson, percent=90, stars=3, last_step=7)
+        self.assertEqual(self.beat(lesson=self.lesson.id, percent=10, stars=0, last_step=9).status_code, 202)
+        self.assertEqual(self.stored(), (90, 3, 9))
+        write_progress({(self.pupil.id, self.lesson.id): {"percent": 50, "stars": 1, "last_step": 2}})
+        self.assertEqual(self.stored(), (90, 3, 9))
+
+    def test_buffer_coalesces_and_writes_in_batches(self):
+        other = User.objects.create(username="mwanafunzi2")
+        buffer = ProgressBuffer(flush_interval=60, max_pending=2)
+        buffer.add(self.pupil.id, self.lesson.id, percent=40, stars=1, last_step=3)
+        buffer.add(self.pupil.id, self.lesson.id, percent=20, stars=2, last_step=1)
+        self.assertFalse(Progress.objects.exists())
+        with mock.patch("lessons.heartbeat.WRITE_BATCH_SIZE", 1), self.assertNumQueries(5):  # lesson check, 2 upserts, savepoint pair
+            buffer.add(other.id, self.lesson.id, percent=5)  # fills the buffer
+        self.assertEqual(self.stored(), (40, 2, 3))
+        self.assertEqual(Progress.objects.count(), 2)
+
+    def test_unknown_or_inactive_lessons_are_rejected(self):
+        for lesson_id in (self.hidden.id, 999999):
+            response = self.beat(lesson=lesson_id, percent=10)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("lesson", response.json())
+        self.assertFalse(Progress.objects.exists())
+
+
+@override_settings(JWT_REVOCATION_CHECK=True)
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="mwalimu")
+        self.user.profile.role = Role.TEACHER
+        self.user.profile.save()
+        self.api = api_client(self.user)
+
+    def status(self):
+        return self.api.get("/api/me/").status_code
+
+    def test_unrelated_saves_keep_sessions(self):
+        self.user.first_name = "Amina"
+        self.user.save()
+        self.user.profile.save()
+        self.assertEqual(self.status(), 200)
+
+    def test_role_change_revokes_and_new_tokens_work_at_once(self):
+        self.user.profile.role = Role.STUDENT
+        self.user.profile.save()
+        self.assertEqual(self.status(), 401)
+        self.api = api_client(self.user)  # same second as the revocation
+        self.assertEqual(self.status(), 200)
+
+    def test_deactivation_revokes(self):
+        User.objects.get(pk=self.user.pk).save()  # a fresh instance with nothing changed
+        self.assertEqual(self.status(), 200)
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        self.assertEqual(self.status(), 401)
+
+
+class ReportTests(TestCase):
+    def test_csv_filename_is_escaped(self):
+        self.assertEqual(stream_csv(["a"], [], 'gradebook-PP2 "Mti".csv')["Content-Disposition"],
+                         'attachment; filename="gradebook-PP2 \\"Mti\\".csv"')
+        self.assertEqual(stream_csv(["a"], [], "gradebook-Darasa “A”.csv")["Content-Disposition"],
+                         "attachment; filename*=utf-8''gradebook-Darasa%20%E2%80%9CA%E2%80%9D.csv")
+
+    def test_register_columns_and_totals(self):
+        wanjiru, baraka = (Student.objects.create(full_name=name, enrolled_class="PP2") for name in ("Wanjiru", "Baraka"))
+        for student, day, mark in ((wanjiru, 7, "present"), (wanjiru, 8, "present"), (wanjiru, 10, "late"), (baraka, 10, "absent")):
+            Attendance.objects.create(student=student, date=datetime.date(2025, 3, day), status=mark)
+        teacher = User.objects.create(username="mwalimu")
+        teacher.profile.role = Role.TEACHER
+        teacher.profile.save()
+        response = api_client(teacher).get("/api/attendance/register/", {"class_name": "PP2", "start": "2025-03-07", "end": "2025-03-10"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, [  # the Saturday mark has no column and no total
+            "class,student_id,student,2025-03-07,2025-03-10,present,absent,late",
+            f"PP2,{baraka.id},Baraka,,A,0,1,0",
+            f"PP2,{wanjiru.id},Wanjiru,P,L,1,0,1",
+        ])
+
+
+class RegradeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        strand = Strand.objects.create(name="Kuandika")
+        sub_strand = SubStrand.objects.create(strand=strand, name="Maneno")
+        cls.lesson = Lesson.objects.create(strand=strand, sub_strand=sub_strand, title="Wanyama")
+        cls.cat = Question.objects.create(lesson=cls.lesson, qtype="fill", prompt="'cat'", data={"answer": "paka"}, marks=2)
+        cls.dog = Question.objects.create(lesson=cls.lesson, qtype="fill", prompt="'dog'", data={"answer": "mbwa"}, marks=2)
+        cls.teacher = User.objects.create(username="mwalimu")
+        cls.teacher.profile.role = Role.TEACHER
+        cls.teacher.profile.save()
+
+    def test_jobs_are_validated_and_not_duplicated(self):
+        api, path = api_client(self.teacher), f"/api/lessons/{self.lesson.id}/regrade/"
+        self.assertEqual(api.post(path, {"question": "abc"}).status_code, 400)
+        first = api.post(path, {"question": self.cat.id})
+        self.assertEqual((first.status_code, first.json()["status"]), (202, "queued"))
+        self.assertEqual(api.post(path).json()["question"], self.cat.id)  # still the pending job
+        self.assertEqual(RegradeJob.objects.count(), 1)
+        self.assertEqual(api.get(path).json()["status"], "queued")
+
+    def test_question_regrade_caps_every_score(self):
+        answered = Submission.objects.create(student=self.teacher, lesson=self.lesson, answers={str(self.cat.id): "paka"},
+                                             score=4, total=4, extra_score=2)
+        other = Submission.objects.create(student=self.teacher, lesson=self.lesson, answers={str(self.dog.id): "mbwa"},
+                                          score=4, total=4)
+        Question.objects.filter(id=self.dog.id).update(marks=0)
+        Question.objects.filter(id=self.cat.id).update(marks=1)
+        regrade_submissions(self.lesson.id, self.cat.id)
+        for sub in (answered, other):
+            sub.refresh_from_db()
+            self.assertEqual((sub.score, sub.total), (1, 1))
+
+
+class SearchTests(TestCase):
+    """The search index follows saves and deletes and matches across noun classes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        strand = Strand.objects.create(name="Msamiati", grade="PP2")
+        sub_strand = SubStrand.objects.create(strand=strand, name="Vitu darasani")
+        cls.lesson = Lesson.objects.create(strand=strand, sub_strand=sub_strand, title="Kitabu changu",
+                                           objective="Kutaja vitu vya darasani.")
+        cls.question = Question.objects.create(lesson=cls.lesson, qtype="fill", prompt="Andika neno la 'book'.",
+                                               data={"answer": "kitabu"})
+        cls.teacher = User.objects.create(username="mwalimu")
+        cls.other = User.objects.create(username="mwalimu2")
+        LessonPlan.objects.create(
+            teacher=cls.teacher, strand="Msamiati", sub_strand="Vitabu", general_outcome="Kusoma vitabu.",
+            specific_outcome1="-", enquiry_question="-", introduction="-", lesson_development="-",
+            conclusion="-", reflection="-",
+        )
+
+    def found(self, text, user=None):
+        return {(hit["type"], hit["id"]) for hit in search(text, (user or self.teacher).pk)}
+
+    def test_noun_class_prefixes_are_stripped(self):
+        self.assertEqual([stem(w) for w in ("kitabu", "vitabu", "mtoto", "watoto", "kusoma", "mti")],
+                         ["tabu", "tabu", "toto", "toto", "soma", "mti"])
+        self.assertIn(("lesson", self.lesson.pk), self.found("vitabu"))
+        self.assertIn(("question", self.question.pk), self.found("KITAB"))
+
+    def test_entries_follow_saves_and_deletes(self):
+        self.lesson.title = "Ng'ombe wetu"
+        self.lesson.save()
+        self.assertIn(("lesson", self.lesson.pk), self.found("ngombe"))
+        self.assertNotIn(("lesson", self.lesson.pk), self.found("kitabu"))
+        self.question.delete()
+        self.assertNotIn(("question", self.question.pk), self.found("kitabu"))
+
+    def test_lesson_plans_are_private(self):
+        self.assertIn("lessonplan", {kind for kind, _ in self.found("vitabu")})
+        self.assertNotIn("lessonplan", {kind for kind, _ in self.found("vitabu", self.other)})
+
+    def test_fallback_matches_word_prefixes(self):
+        def found(text):
+            return set(_matching(parse_query(text), RESOURCES, self.teacher.pk).values_list("resource", "object_id"))
+
+        self.assertIn(("lesson", self.lesson.pk), found("vitab"))
+        self.assertNotIn(("lesson", self.lesson.pk), found("itabu"))
+
+    def test_highlight_escapes_and_marks(self):
+        self.assertEqual(highlight("<b>Vitabu</b> vyetu", parse_query("kitabu")), "&lt;b&gt;<mark>Vitabu</mark>&lt;/b&gt; vyetu")
+
+
+class FillMatcherTests(TestCase):
+    """Fill-in answers forgive spelling slips, orthography variants and accepted alternatives."""
+
+    def test_orthography_and_alternatives(self):
+        matcher = FillMatcher.from_data({"answer": "ng'ombe", "alternatives": ["ngombe wa maziwa"]})
+        for given in ("Ng’ombe.", "NGOMBE", " ng'ombe ", "Ngombe wa maziwa!"):
+            self.assertTrue(matcher.matches(given), given)
+        self.assertFalse(matcher.matches("mbuzi"))
+        self.assertFalse(matcher.matches(""))
+
+    def test_edits_are_opt_in(self):
+        self.assertTrue(FillMatcher.from_data({"answer": "kitabu", "max_edits": 1}).matches("kitbau"))  # swapped letters
+        self.assertFalse(FillMatcher.from_data({"answer": "kitabu", "max_edits": 1}).matches("kitbu u"))
+        self.assertFalse(FillMatcher.from_data({"answer": "kitabu"}).matches("kitbau"))
+        self.assertTrue(FillMatcher.from_data({"answer": "mti", "max_edits": 1}).matches("mto"))
+
+    def test_distinct_words_are_rejected_by_default(self):
+        matcher = FillMatcher.from_data({"answer": "paka"})
+        for word in ("pata", "papa", "paa"):
+            self.assertFalse(matcher.matches(word), word)
+
+    def test_length_defaults_come_from_settings(self):
+        with mock.patch("lessons.grading.FILL_MAX_EDITS_BY_LENGTH", ((6, 1),)):
+            self.assertTrue(FillMatcher.from_data({"answer": "kitabu"}).matches("kitbau"))
+            self.assertFalse(FillMatcher.from_data({"answer": "paka"}).matches("pata"))
+
+    def test_answer_key_grades_fill_leniently(self):
+        strand = Strand.objects.create(name="Kuandika")
+        sub_strand = SubStrand.objects.create(strand=strand, name="Maneno")
+        lesson = Lesson.objects.create(strand=strand, sub_strand=sub_strand, title="Wanyama")
+        question = Question.objects.create(lesson=lesson, qtype="fill", prompt="Andika 'cat'.", data={"answer": "paka", "max_edits": 1}, marks=2)
+        key = AnswerKey.compile(lesson.id)
+        self.assertEqual(key.grade({str(question.id): "Pakaa"}), 2)
+        self.assertEqual(key.grade({str(question.id): "mbwa"}), 0)
+
+    def test_cached_key_follows_the_content_version(self):
+        strand = Strand.objects.create(name="Kuandika")
+        sub_strand = SubStrand.objects.create(strand=strand, name="Maneno")
+        lesson = Lesson.objects.create(strand=strand, sub_strand=sub_strand, title="Wanyama")
+        question = Question.objects.create(lesson=lesson, qtype="fill", prompt="Andika 'dog'.", data={"answer": "mbwa"})
+        cache.clear()
+        lesson.refresh_from_db()
+        self.assertEqual(get_answer_key(lesson).total, 1)
+        with self.assertNumQueries(0):
+            get_answer_key(lesson)
+        question.marks = 3
+        question.save()
+        lesson.refresh_from_db()
+        self.assertEqual(get_answer_key(lesson).total, 3)
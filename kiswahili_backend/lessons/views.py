@@ -1,21 +1,44 @@
-from rest_framework import viewsets, permissions
+from rest_framework import mixins, viewsets, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch, prefetch_related_objects
+from django.http import FileResponse
 from django.shortcuts import render, redirect
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from .models import (
     Strand, SubStrand, Lesson, LessonPlan, Question, Assignment,
-    Submission, Progress, Test, Result, Attendance, Student
+    Submission, SubmissionMedia, Progress, Test, Result, Attendance, Student
 )
 from .serializers import (
     StrandSerializer, SubStrandSerializer, LessonSerializer, LessonPlanSerializer,
     QuestionSerializer, AssignmentSerializer, SubmissionSerializer, ProgressSerializer,
-    UserSerializer, TestSerializer, ResultSerializer, AttendanceSerializer, StudentSerializer
+    UserSerializer, TestSerializer, ResultSerializer, AttendanceSerializer, StudentSerializer,
+    AttendanceBulkSerializer, AttendanceBulkRowSerializer, LessonListSerializer, requested_expansions,
+    ProgressHeartbeatSerializer, ReportParamsSerializer, AttendanceRegisterParamsSerializer,
+    AttendanceAnalyticsParamsSerializer, SubmissionMediaSerializer, SearchParamsSerializer, RegradeSerializer
 )
-from .permissions import IsTeacher
+from .permissions import IsTeacher, request_role
+from .grading import get_answer_key, regrade_status, start_regrade
+from .counters import read_counters
+from .pagination import KeysetPagination, DateKeysetPagination, IdKeysetPagination
+from .heartbeat import progress_buffer
+from .conditional import make_etag, etag_matches, not_modified
+from .packs import get_or_build_pack, pack_fingerprint, pack_lessons
+from .changes import build_change_feed
+from .reports import GRADEBOOK_COLUMNS, gradebook_rows, stream_csv, attendance_register
+from .attendance import attendance_analytics, refresh_rollups
+from .imports import ImportFileError, import_results, read_rows
+from . import catalog
+from .catalog import CachedCatalogMixin
+from .media import UploadError, media_path, ranged_file_response, write_chunk
+from . import search
 from .forms import LessonForm
 
 
@@ -27,36 +50,136 @@ class StudentViewSet(viewsets.ModelViewSet):
     serializer_class = StudentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=True, methods=["get"])
+    def results(self, request, pk=None):
+        """The student's paper-test results, newest first."""
+        student = self.get_object()
+        paginator = KeysetPagination()
+        qs = student.results.select_related("test")
+        page = paginator.paginate_queryset(qs, request, view=self)
+        return paginator.get_paginated_response(ResultSerializer(page, many=True).data)
+
 
 # -------------------------
 # Strands & SubStrands
 # -------------------------
-class StrandViewSet(viewsets.ModelViewSet):
-    queryset = Strand.objects.all()
+class StrandViewSet(CachedCatalogMixin, viewsets.ModelViewSet):
+    queryset = Strand.objects.all().order_by("id")
     serializer_class = StrandSerializer
     permission_classes = [IsAuthenticated]
+    catalog_resource = catalog.STRANDS
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        grade = self.request.query_params.get("grade")
+        return qs.filter(grade=grade) if grade else qs
 
 
-class SubStrandViewSet(viewsets.ModelViewSet):
-    queryset = SubStrand.objects.all()
+class SubStrandViewSet(CachedCatalogMixin, viewsets.ModelViewSet):
+    queryset = SubStrand.objects.select_related("strand").order_by("id")
     serializer_class = SubStrandSerializer
     permission_classes = [IsAuthenticated]
+    catalog_resource = catalog.SUB_STRANDS
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        grade = self.request.query_params.get("grade")
+        return qs.filter(strand__grade=grade) if grade else qs
 
 
 # -------------------------
 # Lessons
 # -------------------------
 class LessonViewSet(viewsets.ModelViewSet):
-    queryset = Lesson.objects.select_related("strand", "sub_strand").all()
+    queryset = Lesson.objects.select_related("strand", "sub_strand").prefetch_related(
+        Prefetch("questions", queryset=Question.objects.order_by("order", "id"))
+    ).order_by("id")
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated]
+    list_actions = ("list", "pp2_lessons")
 
-    @action(detail=False, methods=["get"], url_path="pp2")
-    def pp2_lessons(self, request):
-        qs = self.get_queryset().filter(strand__grade="PP2", is_active=True)
+    def get_serializer_class(self):
+        if self.action in self.list_actions:
+            return LessonListSerializer
+        return LessonSerializer
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action in self.list_actions:
+            expand = requested_expansions(self.request)
+            if "questions" not in expand:
+                qs = qs.prefetch_related(None)
+            if "content" not in expand:
+                qs = qs.defer("content")
+        elif self.action in ("retrieve", "regrade"):
+            # retrieve prefetches questions itself, only once the ETag missed
+            qs = qs.prefetch_related(None)
+        return qs
+
+    def _list_response(self, qs):
+        # One aggregate validates the whole filtered list: the count catches
+        # deletions, the newest update and version catch edits, and the catalog
+        # token catches strand, sub-strand and question changes shown in it.
+        state = qs.prefetch_related(None).order_by().aggregate(
+            count=Count("id"), version=Max("content_version"), updated=Max("updated_at"),
+        )
+        etag = make_etag(self.request.get_full_path(), catalog.generation(catalog.LESSONS), state)
+        if etag_matches(self.request, etag):
+            return not_modified(etag)
         page = self.paginate_queryset(qs)
         ser = self.get_serializer(page, many=True)
-        return self.get_paginated_response(ser.data)
+        response = self.get_paginated_response(ser.data)
+        response["ETag"] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._list_response(self.filter_queryset(self.get_queryset()))
+
+    def retrieve(self, request, *args, **kwargs):
+        lesson = self.get_object()
+        etag = make_etag(lesson.id, lesson.content_version, lesson.strand.name, lesson.sub_strand.name)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        prefetch_related_objects([lesson], Prefetch("questions", queryset=Question.objects.order_by("order", "id")))
+        return Response(self.get_serializer(lesson).data, headers={"ETag": etag})
+
+    @action(detail=False, methods=["get"], url_path="pp2")
+    def pp2_lessons(self, request):
+        return catalog.cached_response(
+            request, catalog.LESSONS,
+            lambda: self._list_response(self.get_queryset().filter(strand__grade="PP2", is_active=True)),
+        )
+
+    @action(detail=False, methods=["get"])
+    def pack(self, request):
+        """Download the offline lesson pack for ``?grade=`` and/or ``?class_name=``."""
+        grade = request.query_params.get("grade")
+        class_name = request.query_params.get("class_name")
+        if not (grade or class_name):
+            return Response({"detail": "Pass grade and/or class_name."}, status=status.HTTP_400_BAD_REQUEST)
+        # Answer conditional requests before (re)building anything.
+        fingerprint = pack_fingerprint(pack_lessons(grade, class_name))
+        etag = f'"{fingerprint}"'
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        path, fingerprint = get_or_build_pack(grade, class_name, fingerprint)
+        response = FileResponse(open(path, "rb"), as_attachment=True, filename=path.name, content_type="application/zip")
+        response["ETag"] = etag
+        return response
+
+    @action(detail=True, methods=["get", "post"], permission_classes=[IsAuthenticated, IsTeacher])
+    def regrade(self, request, pk=None):
+        """POST queues a background regrade (optionally for one ``question``); GET reports progress."""
+        lesson = self.get_object()
+        if request.method == "GET":
+            return Response(regrade_status(lesson.id) or {"status": "idle"})
+
+        params = RegradeSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        question_id = params.validated_data.get("question")
+        if question_id is not None and not lesson.questions.filter(id=question_id).exists():
+            return Response({"question": ["Not a question of this lesson."]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(start_regrade(lesson.id, question_id), status=status.HTTP_202_ACCEPTED)
 
 
 # -------------------------
@@ -77,9 +200,10 @@ class AssignmentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        qs = Assignment.objects.select_related("lesson")
         if hasattr(user, 'student'):
-            return Assignment.objects.filter(lesson__class_name=user.student.enrolled_class)
-        return Assignment.objects.all()
+            return qs.filter(lesson__class_name=user.student.enrolled_class)
+        return qs
 
     def perform_create(self, serializer):
         serializer.save()
@@ -92,34 +216,25 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     queryset = Submission.objects.select_related("student", "lesson").all()
     serializer_class = SubmissionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
-        submission = serializer.save(student=self.request.user)
-        total, score = 0, 0
-        answers = submission.answers or {}
-
-        for q in submission.lesson.questions.all().order_by("order"):
-            total += q.marks
-            if str(q.id) not in answers:
-                continue
-            if q.qtype == "mcq":
-                if answers[str(q.id)] == q.data.get("answer"):
-                    score += q.marks
-            elif q.qtype == "fill":
-                correct = (q.data.get("answer") or "").strip().lower()
-                given = (answers[str(q.id)] or "").strip().lower()
-                if given == correct:
-                    score += q.marks
-
-        submission.total = total
-        submission.score = score
-        submission.save()
+        key = get_answer_key(serializer.validated_data["lesson"])
+        answers = serializer.validated_data.get("answers") or {}
+        submission = serializer.save(student=self.request.user, score=key.grade(answers), total=key.total)
+        # Oral/upload answers reference uploaded media as {"media": <id>}.
+        media_ids = [a["media"] for a in answers.values() if isinstance(a, dict) and isinstance(a.get("media"), int)]
+        if media_ids:
+            SubmissionMedia.objects.filter(
+                id__in=media_ids, student=self.request.user, question__lesson=submission.lesson_id, submission__isnull=True,
+            ).update(submission=submission)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsTeacher])
     def grade(self, request, pk=None):
         sub = self.get_object()
         add_score = float(request.data.get("extra_score", 0))
         feedback = request.data.get("feedback", "")
+        sub.extra_score += add_score
         sub.score = min(sub.total, sub.score + add_score)
         sub.feedback = feedback
         sub.graded_by = request.user
@@ -127,13 +242,79 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         return Response(SubmissionSerializer(sub).data)
 
 
+class SubmissionMediaViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                             mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable uploads of oral/upload answers.
+
+    POST declares the upload, ``PUT {id}/chunk/`` sends bytes with
+    ``Content-Range``, GET reports the received offset to resume from and
+    ``{id}/file/`` streams the recording (``?variant=derived`` for the
+    thumbnail or transcode) with range support.
+    """
+    serializer_class = SubmissionMediaSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        qs = SubmissionMedia.objects.select_related("question").order_by("id")
+        if request_role(self.request) == "teacher":
+            return qs
+        return qs.filter(student=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(student=self.request.user)
+
+    @action(detail=True, methods=["put"])
+    def chunk(self, request, pk=None):
+        media = self.get_object()
+        if media.student_id != User._meta.pk.to_python(request.user.pk):
+            return Response({"detail": "Only the uploader can add chunks."}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            media = write_chunk(media.pk, request.headers.get("Content-Range"), request.stream)
+        except UploadError as exc:
+            return Response({"detail": str(exc), "received": exc.received}, status=exc.status)
+        return Response(SubmissionMediaSerializer(media).data)
+
+    @action(detail=True, methods=["get"])
+    def file(self, request, pk=None):
+        media = self.get_object()
+        derived = request.query_params.get("variant") == "derived"
+        name = media.derived.name if derived else media.file.name
+        if media.status == SubmissionMedia.Status.UPLOADING or not name:
+            return Response({"detail": "Not available yet."}, status=status.HTTP_404_NOT_FOUND)
+        content_type = media.content_type
+        if derived:
+            content_type = "image/jpeg" if name.endswith(".jpg") else "audio/mp4"
+        return ranged_file_response(request, media_path(name), content_type)
+
+
 # -------------------------
 # Progress
 # -------------------------
 class ProgressViewSet(viewsets.ModelViewSet):
-    queryset = Progress.objects.all()
+    queryset = Progress.objects.select_related("student", "lesson")
     serializer_class = ProgressSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = IdKeysetPagination
+
+    @action(detail=False, methods=["post"])
+    def heartbeat(self, request):
+        """
+        Record the student's progress through a lesson.
+
+        Values only ever go up and are coalesced in memory before being
+        written; send ``final: true`` on the last step to write immediately.
+        """
+        ser = ProgressHeartbeatSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        data = ser.validated_data
+        merged = progress_buffer.add(
+            request.user.id, data["lesson"],
+            last_step=data["last_step"], percent=data["percent"], stars=data["stars"],
+        )
+        if data["final"]:
+            progress_buffer.flush()
+        return Response({"lesson": data["lesson"], **merged}, status=status.HTTP_202_ACCEPTED)
 
 
 # -------------------------
@@ -143,7 +324,76 @@ class MeViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
     def list(self, request):
-        return Response(UserSerializer(request.user).data)
+        # request.user is built from token claims and lacks name and email.
+        return Response(UserSerializer(User.objects.get(pk=request.user.pk)).data)
+
+
+# -------------------------
+# Change feed
+# -------------------------
+class ChangeFeedViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """Content created, modified or deleted since ``?since=<watermark>``."""
+        since = request.query_params.get("since")
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response({"since": ["Expected an ISO 8601 timestamp."]}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        return Response(build_change_feed(since or None))
+
+
+# -------------------------
+# Gradebook
+# -------------------------
+class GradebookViewSet(viewsets.ViewSet):
+    """Per-student, per-strand score summary for a class (``?class_name=&start=&end=``)."""
+    permission_classes = [IsAuthenticated, IsTeacher]
+
+    def _params(self, request):
+        params = ReportParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
+    def list(self, request):
+        params = self._params(request)
+        return Response({**params, "rows": list(gradebook_rows(**params))})
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        params = self._params(request)
+        rows = ([row[column] for column in GRADEBOOK_COLUMNS] for row in gradebook_rows(**params))
+        return stream_csv(GRADEBOOK_COLUMNS, rows, f"gradebook-{params['class_name']}.csv")
+
+
+# -------------------------
+# Search
+# -------------------------
+class SearchViewSet(viewsets.ViewSet):
+    """
+    Ranked search over lessons, strands and sub-strands, plus the question
+    bank and the teacher's own lesson plans for teachers
+    (``?q=&type=&limit=&offset=``). Matches are wrapped in ``<mark>``.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        params = SearchParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        resources = data.get("type") or search.RESOURCES
+        if request_role(request) != "teacher":
+            resources = [r for r in resources if r not in search.PRIVATE_RESOURCES]
+        # One extra hit tells whether there is a next page.
+        hits = search.search(data["q"], request.user.pk, resources, data["limit"] + 1, data["offset"])
+        return Response({
+            "query": data["q"],
+            "results": hits[:data["limit"]],
+            "next_offset": data["offset"] + data["limit"] if len(hits) > data["limit"] else None,
+        })
 
 
 # -------------------------
@@ -152,10 +402,11 @@ class MeViewSet(viewsets.ViewSet):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def dashboard_data(request):
+    _, totals = read_counters()
     return Response({
-        "lessonsCount": Lesson.objects.filter(is_active=True).count(),
-        "testsCount": Question.objects.count(),
-        "teachersCount": User.objects.filter(profile__role="teacher").count(),
+        "lessonsCount": totals["active_lessons"],
+        "testsCount": totals["questions"],
+        "teachersCount": totals["teachers"],
     })
 
 
@@ -174,9 +425,19 @@ def add_lesson(request):
 # Results
 # -------------------------
 class ResultViewSet(viewsets.ModelViewSet):
-    queryset = Result.objects.all()
+    queryset = Result.objects.select_related("test")
     serializer_class = ResultSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        student = self.request.query_params.get("student")
+        if student:
+            if not student.isdigit():
+                raise ValidationError({"student": "Expected a student id."})
+            qs = qs.filter(student_id=student)
+        return qs
 
     @action(detail=False, methods=["get"], url_path="pp2")
     def pp2_results(self, request):
@@ -190,10 +451,34 @@ class ResultViewSet(viewsets.ModelViewSet):
 # Tests
 # -------------------------
 class TestViewSet(viewsets.ModelViewSet):
-    queryset = Test.objects.all()
+    queryset = Test.objects.select_related("lesson")
     serializer_class = TestSerializer
     permission_classes = [IsAuthenticated]
 
+    @action(detail=True, methods=["post"], url_path="import-results", permission_classes=[IsAuthenticated, IsTeacher])
+    def import_results(self, request, pk=None):
+        """
+        Import a sheet of marks (CSV, or .xlsx with openpyxl) uploaded as ``file``.
+
+        Columns: ``student_id`` or ``student_name``, ``score`` and optionally
+        ``feedback``. All rows are written or none are.
+        """
+        test = self.get_object()
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"file": ["Upload the sheet as 'file'."]}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            rows = read_rows(upload)
+        except ImportFileError as exc:
+            return Response({"file": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+        report, created = import_results(test, rows)
+        return Response({
+            "test": test.pk,
+            "created": created,
+            "errors": sum(1 for r in report if r["outcome"] == "error"),
+            "results": report,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
     @action(detail=False, methods=["get"], url_path="pp2")
     def pp2_tests(self, request):
         qs = self.get_queryset().filter(lesson__strand__grade="PP2")
@@ -208,16 +493,18 @@ class TestViewSet(viewsets.ModelViewSet):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
+    by_grade, totals = read_counters()
+    pp2 = by_grade.get("PP2", dict.fromkeys(totals, 0))
     return Response({
         "total": {
-            "lessons_count": Lesson.objects.count(),
-            "tests_count": Test.objects.count(),
-            "results_count": Result.objects.count()
+            "lessons_count": totals["lessons"],
+            "tests_count": totals["tests"],
+            "results_count": totals["results"]
         },
         "pp2": {
-            "lessons_count": Lesson.objects.filter(strand__grade="PP2").count(),
-            "tests_count": Test.objects.filter(lesson__strand__grade="PP2").count(),
-            "results_count": Result.objects.filter(test__lesson__strand__grade="PP2").count()
+            "lessons_count": pp2["lessons"],
+            "tests_count": pp2["tests"],
+            "results_count": pp2["results"]
         }
     })
 
@@ -225,18 +512,16 @@ def dashboard_stats(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def teacher_dashboard_stats(request):
-    lessons_count = Lesson.objects.filter(is_active=True).count()
-    tests_count = Test.objects.count()
-    results_count = Result.objects.count()
+    _, totals = read_counters()
 
-    recent_lessons = Lesson.objects.filter(is_active=True).order_by("-date")[:5]
-    recent_tests = Test.objects.order_by("-date")[:5]
-    recent_results = Result.objects.select_related("test", "test__lesson").order_by("-created_at")[:5]
+    recent_lessons = Lesson.objects.filter(is_active=True).order_by("-date").only("id", "title", "date")[:5]
+    recent_tests = Test.objects.select_related("lesson").only("id", "title", "date", "lesson__title").order_by("-date")[:5]
+    recent_results = Result.objects.select_related("test").only("id", "student_name", "score", "test__title").order_by("-created_at")[:5]
 
     return Response({
-        "lessons_count": lessons_count,
-        "tests_count": tests_count,
-        "results_count": results_count,
+        "lessons_count": totals["active_lessons"],
+        "tests_count": totals["tests"],
+        "results_count": totals["results"],
         "recent_lessons": [{"id": l.id, "title": l.title, "date": l.date} for l in recent_lessons],
         "recent_tests": [{"id": t.id, "title": t.title, "lesson": t.lesson.title, "date": t.date} for t in recent_tests],
         "recent_results": [{"id": r.id, "student_name": r.student_name, "test": r.test.title, "score": r.score} for r in recent_results]
@@ -249,12 +534,14 @@ def teacher_dashboard_stats(request):
 class AttendanceViewSet(viewsets.ModelViewSet):
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DateKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
+        qs = Attendance.objects.select_related("student").order_by("-date")
         if hasattr(user, "teacher"):
-            return Attendance.objects.filter(student__enrolled_class=user.teacher.class_assigned).order_by("-date")
-        return Attendance.objects.all().order_by("-date")
+            return qs.filter(student__enrolled_class=user.teacher.class_assigned)
+        return qs
 
     def perform_create(self, serializer):
         serializer.save(teacher=self.request.user)
@@ -265,6 +552,90 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         qs = self.get_queryset().filter(date=today).order_by("student__full_name")
         return Response(self.get_serializer(qs, many=True).data)
 
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsTeacher])
+    def register(self, request):
+        """Stream a CSV register (``?class_name=&start=&end=``); omit class_name for every class."""
+        params = AttendanceRegisterParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        header, rows = attendance_register(**params.validated_data)
+        data = params.validated_data
+        filename = f"register-{data.get('class_name', 'all')}-{data['start']}-{data['end']}.csv"
+        return stream_csv(header, rows, filename)
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsTeacher])
+    def analytics(self, request):
+        """
+        Attendance rates, late counts, absence streaks and chronic absentees
+        (``?class_name=&start=&end=&threshold=``), read from monthly rollups.
+        """
+        params = AttendanceAnalyticsParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(attendance_analytics(**params.validated_data))
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Mark a whole class register for one date in a single transaction.
+
+        Rows are upserted on the ("student", "date") key; invalid rows are
+        reported back and skipped, the rest are written.
+        """
+        payload = AttendanceBulkSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        day = payload.validated_data.get("date") or timezone.localdate()
+        records = payload.validated_data["records"]
+
+        results = [None] * len(records)
+        rows = {}
+        for index, raw in enumerate(records):
+            row = AttendanceBulkRowSerializer(data=raw)
+            if not row.is_valid():
+                results[index] = {"index": index, "student": raw.get("student"), "outcome": "error", "errors": row.errors}
+            elif row.validated_data["student"] in rows:
+                results[index] = {"index": index, "student": raw.get("student"), "outcome": "error",
+                                  "errors": {"student": ["Duplicate student in this register."]}}
+            else:
+                rows[row.validated_data["student"]] = (index, row.validated_data)
+
+        known = set(Student.objects.filter(id__in=rows).values_list("id", flat=True))
+        for student_id in [s for s in rows if s not in known]:
+            index, _ = rows.pop(student_id)
+            results[index] = {"index": index, "student": student_id, "outcome": "error",
+                              "errors": {"student": ["Unknown student."]}}
+
+        if not rows:
+            return Response({"date": day, "results": results}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            existing = set(
+                Attendance.objects.select_for_update()
+                .filter(date=day, student_id__in=rows)
+                .values_list("student_id", flat=True)
+            )
+            Attendance.objects.bulk_create(
+                [
+                    Attendance(student_id=student_id, date=day, teacher=request.user,
+                               status=data["status"], notes=data.get("notes"))
+                    for student_id, (_, data) in rows.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["student", "date"],
+                update_fields=["status", "notes", "teacher"],
+            )
+            refresh_rollups((student_id, day) for student_id in rows)
+
+        for student_id, (index, data) in rows.items():
+            results[index] = {"index": index, "student": student_id, "status": data["status"],
+                              "outcome": "updated" if student_id in existing else "created"}
+
+        return Response({
+            "date": day,
+            "created": sum(1 for r in results if r["outcome"] == "created"),
+            "updated": sum(1 for r in results if r["outcome"] == "updated"),
+            "errors": sum(1 for r in results if r["outcome"] == "error"),
+            "results": results,
+        })
+
 
 # -------------------------
 # Lesson Plans
@@ -274,7 +645,9 @@ class LessonPlanViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return LessonPlan.objects.filter(teacher=self.request.user)
+        return LessonPlan.objects.filter(teacher=self.request.user).select_related("teacher").prefetch_related(
+            Prefetch("assignments", queryset=Assignment.objects.select_related("lesson"))
+        )
 
     def perform_create(self, serializer):
         serializer.save(teacher=self.request.user)